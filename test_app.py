@@ -83,6 +83,1353 @@ def test_csv_format():
         print(f"❌ Chyba při čtení CSV: {e}")
         return False
 
+def test_quota_estimate():
+    """Test odhadu spotřeby kvóty před spuštěním analýzy"""
+    try:
+        from youtube_analyzer.quota import QuotaBudget, QuotaBudgetExceeded, estimate_run_cost
+
+        plan = estimate_run_cost(['v1', 'v2', 'v2'], ['UC%d' % i for i in range(60)])
+        expected = {'videos': 1, 'channels': 2, 'playlistItems': 62}
+        if plan['calls'] != expected or plan['units'] != 65:
+            print(f"❌ Neočekávaný odhad kvóty: {plan}")
+            return False
+
+        budget = QuotaBudget(2)
+        budget.charge('channels')
+        budget.charge('videos')
+        try:
+            budget.charge('playlistItems')
+            print("❌ Rozpočet kvóty nebyl dodržen")
+            return False
+        except QuotaBudgetExceeded:
+            pass
+
+        print("✅ Odhad a rozpočet kvóty fungují")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba při odhadu kvóty: {e}")
+        return False
+
+def test_response_cache():
+    """Test diskového cache odpovědí API (TTL a vyřazování podle velikosti)"""
+    try:
+        import tempfile
+        from youtube_analyzer.cache import ResponseCache, cached_channels
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'), max_bytes=10 ** 6)
+            calls = []
+
+            def fetch(ids, part):
+                calls.append((tuple(ids), part))
+                return {i: {'id': i, 'snippet': {'title': i}, 'statistics': {'viewCount': '1'}} for i in ids}
+
+            cached_channels(cache, ['UC1', 'UC2'], fetch)
+            channels = cached_channels(cache, ['UC1', 'UC2'], fetch)
+            if len(calls) != 1 or channels['UC2']['statistics'] != {'viewCount': '1'}:
+                print(f"❌ Cache kanálů nefunguje: {calls}")
+                return False
+
+            # Prošlé statistiky se obnoví samostatně bez snippetu
+            cache.ttls['channel_statistics'] = -1
+            cached_channels(cache, ['UC1'], fetch)
+            if calls[-1] != (('UC1',), 'statistics'):
+                print(f"❌ Prošlé statistiky se neobnovily: {calls}")
+                return False
+
+            cache.max_bytes = 200
+            cache.set_many('playlist_items', {str(i): 'x' * 50 for i in range(10)})
+            if cache.get('playlist_items', '0') is not None or cache.get('playlist_items', '9') is None:
+                print("❌ Cache nevyřazuje nejstarší záznamy")
+                return False
+            cache.close()
+
+        print("✅ Cache odpovědí API funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v cache odpovědí: {e}")
+        return False
+
+def test_concurrent_engine():
+    """Test souběžného zpracování (pořadí výsledků a omezení rychlosti)"""
+    try:
+        import random
+        import time
+        from youtube_analyzer.concurrency import TokenBucket, run_ordered
+
+        def work(i):
+            time.sleep(random.random() / 100)
+            if i == 3:
+                raise ValueError(i)
+            return i * 2
+
+        results = run_ordered(work, range(20), max_workers=8, return_exceptions=True)
+        if results[:3] != [0, 2, 4] or not isinstance(results[3], ValueError) or results[19] != 38:
+            print(f"❌ Výsledky nejsou ve vstupním pořadí: {results}")
+            return False
+
+        bucket = TokenBucket(rate=50, capacity=5)
+        start = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        if elapsed < 0.15:
+            print(f"❌ Token bucket neomezuje rychlost ({elapsed:.3f} s)")
+            return False
+
+        print("✅ Souběžné zpracování a omezení rychlosti fungují")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v souběžném zpracování: {e}")
+        return False
+
+def test_keyword_matcher():
+    """Test vyhledávání klíčových slov jedním průchodem (shoda s re.findall)"""
+    try:
+        import re
+        from youtube_analyzer.matcher import KeywordMatcher
+
+        words = {
+            'kids': ['kids', 'děti', 'kids', 'pro děti'],
+            'teen': ['teen', 'aa'],
+            'serious': ['news', 'teen']
+        }
+        text = 'kids news pro děti canteen teen aaaa'
+        expected = {
+            category: sum(len(re.findall(re.escape(word), text)) for word in keywords)
+            for category, keywords in words.items()
+        }
+        matcher = KeywordMatcher(words)
+        if matcher.count(text) != expected:
+            print(f"❌ Počty se liší od re.findall: {matcher.count(text)} != {expected}")
+            return False
+
+        bounded = KeywordMatcher(words, word_boundary=True).count(text)
+        if bounded['serious'] != 2 or bounded['teen'] != 1:
+            print(f"❌ Hledání celých slov nefunguje: {bounded}")
+            return False
+
+        print("✅ Vyhledávání klíčových slov funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba ve vyhledávání klíčových slov: {e}")
+        return False
+
+def test_keyword_pack_cache():
+    """Test sdíleného balíčku klasifikačních slov (znovu se sestaví jen po změně souboru)"""
+    try:
+        import tempfile
+        from youtube_analyzer.keywords import invalidate_keyword_pack, load_keyword_pack
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'words.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'kids': ['Kids'], 'teen': ['teen'], 'serious': ['news']}, f)
+
+            pack = load_keyword_pack(path)
+            if load_keyword_pack(path) is not pack or pack.count('kids news') != {'kids': 1, 'teen': 0, 'serious': 1}:
+                print("❌ Balíček slov se sestavuje znovu bez změny souboru")
+                return False
+
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'kids': ['kids', 'toys'], 'teen': ['teen'], 'serious': ['news']}, f)
+            os.utime(path, ns=(0, 0))
+            changed = load_keyword_pack(path)
+            if changed is pack or changed.index.get('toys') != ['kids']:
+                print("❌ Balíček slov se po změně souboru neobnovil")
+                return False
+
+            invalidate_keyword_pack(path)
+            if load_keyword_pack(path) is changed:
+                print("❌ Zneplatnění balíčku slov nefunguje")
+                return False
+
+        print("✅ Sdílený balíček klasifikačních slov funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v balíčku klasifikačních slov: {e}")
+        return False
+
+def test_batch_classification():
+    """Test dávkové klasifikace (stejné výsledky jako klasifikace po jednom kanálu)"""
+    try:
+        import re
+        from youtube_analyzer.scoring import classify_texts
+
+        words = {'kids': ['kids', 'toy'], 'teen': ['gaming', 'teen'], 'serious': ['news']}
+
+        def classify_one(text):
+            scores = {c: sum(len(re.findall(re.escape(w), text)) for w in words[c]) for c in words}
+            total = sum(scores.values()) or 1
+            normalized = {k: round((v / total) * 100) for k, v in scores.items()}
+            if max(normalized.values()) > 40:
+                primary = max(normalized, key=normalized.get).title()
+            else:
+                primary = 'Mixed'
+            return {**normalized, 'primary_category': primary}
+
+        texts = ['kids toy news', 'gaming teen kids news', 'nothing here', 'kids gaming news', 'canteen']
+        expected = [classify_one(text) for text in texts]
+        expected.append({'kids': 0, 'teen': 0, 'serious': 0, 'primary_category': 'Unknown'})
+
+        result = classify_texts(texts + [None], words).to_dict('records')
+        if result != expected:
+            print(f"❌ Dávková klasifikace se liší: {result} != {expected}")
+            return False
+
+        print("✅ Dávková klasifikace funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v dávkové klasifikaci: {e}")
+        return False
+
+def test_cli_reader():
+    """Test čtení URL pro příkazovou řádku (bez Streamlitu)"""
+    try:
+        import importlib
+        import io
+        import sys
+        from youtube_analyzer.cli import build_parser, read_urls
+        from youtube_analyzer.concurrency import batches
+
+        # Analýza z příkazové řádky běží přes pipeline, ani ta nesmí načíst Streamlit
+        importlib.import_module('youtube_analyzer.pipeline')
+        if 'streamlit' in sys.modules:
+            print("❌ Analýza z příkazové řádky načítá Streamlit")
+            return False
+
+        source = io.StringIO("Placement,URL\na,https://youtu.be/abc\nb,\nc, https://www.youtube.com/channel/UC1 \n")
+        urls = list(read_urls(source, 'URL'))
+        if urls != ['https://youtu.be/abc', 'https://www.youtube.com/channel/UC1']:
+            print(f"❌ Špatně načtené URL: {urls}")
+            return False
+
+        if [len(batch) for batch in batches(range(5), 2)] != [2, 2, 1]:
+            print("❌ Špatné dělení na dávky")
+            return False
+
+        args = build_parser().parse_args(['analyze', 'in.csv', '--url-column', 'URL', '-o', 'out.csv'])
+        if (args.input, args.url_column, args.output) != ('in.csv', 'URL', 'out.csv'):
+            print(f"❌ Špatně zpracované argumenty: {args}")
+            return False
+
+        print("✅ Příkazová řádka funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v příkazové řádce: {e}")
+        return False
+
+def test_cli_startup():
+    """Test rychlého startu příkazové řádky (--help nenačítá numpy, pandas, pyarrow ani requests)"""
+    try:
+        import subprocess
+        import sys
+
+        script = (
+            "import runpy, sys\n"
+            "for argv in (['--help'], ['analyze', '--help'], ['history', '--help']):\n"
+            "    sys.argv = ['youtube_analyzer'] + argv\n"
+            "    try:\n"
+            "        runpy.run_module('youtube_analyzer', run_name='__main__', alter_sys=True)\n"
+            "    except SystemExit:\n"
+            "        pass\n"
+            "print('MODULES', ','.join(name for name in ('numpy', 'pandas', 'pyarrow', 'requests')"
+            " if name in sys.modules))\n"
+        )
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                timeout=60, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        loaded = output.rsplit('MODULES ', 1)[-1].strip() if 'MODULES' in output else None
+        if loaded is None:
+            print("❌ Nápověda příkazové řádky selhala")
+            return False
+        if loaded:
+            print(f"❌ Nápověda příkazové řádky načítá těžké knihovny: {loaded}")
+            return False
+
+        print("✅ Nápověda příkazové řádky startuje bez těžkých knihoven")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba při startu příkazové řádky: {e}")
+        return False
+
+def test_url_canonicalization():
+    """Test kanonického tvaru URL a slučování duplicit"""
+    try:
+        from youtube_analyzer.urls import UrlIndex, canonicalize_url
+
+        video = {'id': 'dQw4w9WgXcQ', 'type': 'video'}
+        variants = [
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+            'https://youtu.be/dQw4w9WgXcQ?si=tracking',
+            'm.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&utm_source=ads',
+            'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+            'youtube.com/video/dQw4w9WgXcQ'
+        ]
+        for url in variants:
+            if canonicalize_url(url) != video:
+                print(f"❌ Špatný kanonický tvar: {url} -> {canonicalize_url(url)}")
+                return False
+
+        if canonicalize_url('https://www.youtube.com/@Kanal/videos') != {'id': 'kanal', 'type': 'handle'}:
+            print("❌ Handle nebyl rozpoznán")
+            return False
+        if canonicalize_url('https://example.com/watch?v=dQw4w9WgXcQ') is not None:
+            print("❌ URL mimo YouTube byla přijata")
+            return False
+
+        index = UrlIndex()
+        for url in variants + ['https://www.youtube.com/channel/UC1?si=x', 'youtube.com/channel/UC1', 'neplatná']:
+            index.add(url)
+        if list(index.entities) != ['video:dQw4w9WgXcQ', 'channel:UC1'] or index.duplicates != 5:
+            print(f"❌ Špatně sloučené duplicity: {list(index.entities)}, {index.duplicates}")
+            return False
+
+        # Bez uložených řádků se duplicity počítají stejně
+        streamed = UrlIndex(keep_rows=False)
+        for url in variants + ['https://www.youtube.com/channel/UC1?si=x', 'youtube.com/channel/UC1', 'neplatná']:
+            streamed.add(url)
+        if streamed.rows or streamed.entities != index.entities or streamed.duplicates != 5:
+            print(f"❌ Špatné duplicity bez uložených řádků: {streamed.duplicates}")
+            return False
+
+        fanned = index.fan_out({'video:dQw4w9WgXcQ': 'A', 'channel:UC1': 'B'})
+        if [result for _, result in fanned] != ['A'] * 5 + ['B'] * 2:
+            print(f"❌ Výsledky nebyly rozděleny na všechny řádky: {fanned}")
+            return False
+
+        print("✅ Kanonizace a slučování URL fungují")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v kanonizaci URL: {e}")
+        return False
+
+def test_job_journal():
+    """Test záznamu úlohy (obnovení po přerušení a zhuštění)"""
+    try:
+        import tempfile
+        from youtube_analyzer.journal import JobJournal, list_jobs
+
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = JobJournal.create(['https://youtu.be/a', 'https://youtu.be/b'], jobs_dir=tmp)
+            journal.record_resolved({'video:a': 'UCa', 'video:b': 'UCb'})
+            journal.record_channels({'UCa': {'id': 'UCa'}, 'UCb': {'id': 'UCb'}})
+            journal.record_text('UCb', 'text b')
+            journal.record_results({'video:a': {'Channel Title': 'A'}, 'channel:UCa': {'Channel Title': 'A'}})
+            journal.close()
+
+            # A line cut short by a crash must not break the replay
+            with open(journal.path, 'a', encoding='utf-8') as f:
+                f.write('{"type": "results", "res')
+
+            resumed = JobJournal.open(journal.job_id, tmp)
+            if resumed.urls != ['https://youtu.be/a', 'https://youtu.be/b'] or resumed.texts != {'UCb': 'text b'}:
+                print("❌ Záznam úlohy se neobnovil")
+                return False
+            if set(resumed.results) != {'video:a', 'channel:UCa'} or resumed.resolved['video:b'] != 'UCb':
+                print("❌ Hotová práce se ze záznamu neobnovila")
+                return False
+
+            resumed.finish()
+            compacted = JobJournal.open(journal.job_id, tmp)
+            if compacted.status != 'done' or 'UCa' in compacted.channels or 'UCb' not in compacted.channels:
+                print("❌ Zhuštění záznamu nefunguje")
+                return False
+            if [job['status'] for job in list_jobs(tmp)] != ['done']:
+                print("❌ Seznam úloh nefunguje")
+                return False
+
+        print("✅ Záznam úloh funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v záznamu úloh: {e}")
+        return False
+
+def test_key_pool():
+    """Test rozdělování volání mezi více API klíčů"""
+    try:
+        from youtube_analyzer.keys import KeyPool, split_keys
+        from youtube_analyzer.quota import QuotaExceeded
+
+        if split_keys("a, b\nc\n\n") != ['a', 'b', 'c']:
+            print("❌ Špatně načtené klíče")
+            return False
+
+        pool = KeyPool(['a', 'b', 'a'], daily_quota=250)
+        keys = [pool.acquire('search'), pool.acquire('search'), pool.acquire('channels')]
+        if keys != ['a', 'b', 'a']:
+            print(f"❌ Volání nejdou na klíč s největší rezervou: {keys}")
+            return False
+
+        pool.mark_exhausted('b')
+        if pool.acquire('channels') != 'a' or pool.available != 1:
+            print("❌ Vyčerpaný klíč se dál používá")
+            return False
+
+        pool.mark_exhausted('a')
+        try:
+            pool.acquire('channels')
+            print("❌ Vyčerpání všech klíčů nebylo ohlášeno")
+            return False
+        except QuotaExceeded:
+            pass
+
+        usage = {row['key']: row for row in pool.usage()}
+        if usage['…a']['spent'] != 102 or usage['…b']['spent'] != 100 or not usage['…b']['exhausted']:
+            print(f"❌ Špatné účtování klíčů: {usage}")
+            return False
+
+        print("✅ Rozdělování mezi API klíče funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v rozdělování mezi API klíče: {e}")
+        return False
+
+def test_handle_resolution():
+    """Test převodu @handle na ID kanálu (jeden dotaz, uložený převod)"""
+    try:
+        import tempfile
+        from youtube_analyzer.cache import ResponseCache, cached_channels, cached_handles
+        from youtube_analyzer.quota import estimate_run_cost
+
+        lookups = []
+
+        def fetch(keys):
+            lookups.extend(keys)
+            return {key: {'id': 'UC' + key.split(':')[1], 'snippet': {'title': key}, 'statistics': {}}
+                    for key in keys if key != 'handle:missing'}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'))
+            mapping, channels = cached_handles(cache, ['handle:foo', 'handle:missing', 'handle:foo'], fetch)
+            if mapping != {'handle:foo': 'UCfoo'} or list(channels) != ['UCfoo']:
+                print(f"❌ Špatný převod handle: {mapping}, {list(channels)}")
+                return False
+
+            mapping, channels = cached_handles(cache, ['handle:foo'], fetch)
+            cached = cached_channels(cache, ['UCfoo'], lambda ids, part: lookups.append(ids) or {})
+            cache.close()
+            if mapping != {'handle:foo': 'UCfoo'} or channels or 'UCfoo' not in cached:
+                print("❌ Převod handle ani data kanálu nebyly uloženy")
+                return False
+            if lookups != ['handle:foo', 'handle:missing']:
+                print(f"❌ Zbytečné dotazy: {lookups}")
+                return False
+
+        # Handle bez kanálu se uloží na kratší dobu; neúspěšný dotaz (chybějící klíč) se zopakuje
+        def fetch_answered(keys):
+            lookups.extend(keys)
+            return {key: None for key in keys if key != 'handle:failed'}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'))
+            lookups.clear()
+            for _ in range(2):
+                mapping, _ = cached_handles(cache, ['handle:missing', 'handle:failed'], fetch_answered)
+            expired = ResponseCache(os.path.join(tmp, 'cache.sqlite'), ttls={'channel_handle_missing': 0})
+            cached_handles(expired, ['handle:missing'], fetch_answered)
+            expired.close()
+            cache.close()
+            if mapping or lookups != ['handle:missing', 'handle:failed', 'handle:failed', 'handle:missing']:
+                print(f"❌ Handle bez kanálu se neukládá správně: {lookups}")
+                return False
+
+        plan = estimate_run_cost([], [], handles=['a', 'b'], usernames=['c'])
+        if plan['calls'] != {'videos': 0, 'channels': 4, 'playlistItems': 3}:
+            print(f"❌ Špatný odhad pro handle: {plan}")
+            return False
+
+        print("✅ Převod @handle funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v převodu @handle: {e}")
+        return False
+
+def test_job_runner():
+    """Test úloh na pozadí (průběžné výsledky, zrušení, stav)"""
+    try:
+        import threading
+        import time
+        from youtube_analyzer.jobs import CANCELLED, DONE, Job, JobRunner
+
+        release = threading.Event()
+
+        def work(job):
+            for number in range(3):
+                job.check_cancelled()
+                job.add_results([{'URL': str(number)}], 1)
+                release.wait(5)
+
+        runner = JobRunner(max_concurrent=1)
+        job = runner.submit(Job('a', total=3), work)
+        queued = runner.submit(Job('b', total=3), work)
+        queued.cancel()
+        release.set()
+        deadline = time.time() + 5
+        while not (job.is_finished and queued.is_finished) and time.time() < deadline:
+            time.sleep(0.01)
+        runner.shutdown()
+
+        if job.status != DONE or job.progress != 1.0 or len(job.results) != 3:
+            print(f"❌ Úloha nedoběhla: {job.status}, {job.results}")
+            return False
+        if queued.status != CANCELLED or queued.results:
+            print(f"❌ Zrušená úloha běžela: {queued.status}")
+            return False
+        if [item.id for item in runner.jobs()] != ['b', 'a'] or runner.get('a') is not job:
+            print("❌ Úlohy nejsou dohledatelné podle ID")
+            return False
+
+        print("✅ Úlohy na pozadí fungují")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v úlohách na pozadí: {e}")
+        return False
+
+def test_mock_api():
+    """Test lokální náhrady YouTube Data API (data, kvóta, chyby, účtování jednotek)"""
+    try:
+        from youtube_analyzer.analyzer import YouTubeAnalyzer
+        from youtube_analyzer.keys import KeyPool
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.quota import QuotaExceeded
+        from youtube_analyzer.transport import Transport
+
+        with MockYouTubeAPI(quota_per_key=2) as api:
+            transport = Transport(base_url=api.base_url)
+            analyzer = YouTubeAnalyzer(KeyPool(['a', 'b']), transport=transport)
+            videos = analyzer.get_videos_channel_ids(['v1', 'v2'])
+            channels = analyzer.get_channels_by_ids(list(videos.values()))
+            handles, _ = analyzer.get_channels_by_handles(['handle:foo'])
+            analyzer.get_channels_by_handles(['handle:bar'])
+            try:
+                transport.get('channels', {'part': 'id', 'id': 'UCx'}, keys=analyzer.keys)
+                exhausted = False
+            except QuotaExceeded:
+                exhausted = True
+            transport.close()
+            usage = api.usage()
+
+        if set(videos) != {'v1', 'v2'} or set(channels) != set(videos.values()) or handles != {'handle:foo': api.channel_id('handle:foo')}:
+            print(f"❌ Syntetická data nesedí: {videos}, {list(channels)}, {handles}")
+            return False
+        if not exhausted or usage['keys'] != {'a': 2, 'b': 2} or usage['endpoints']['channels']['quota_errors'] != 2:
+            print(f"❌ Kvóta klíčů se neúčtuje: {usage}")
+            return False
+
+        with MockYouTubeAPI(error_rate=1.0) as api:
+            transport = Transport(base_url=api.base_url)
+            status = transport.get('search', {'part': 'snippet', 'key': 'a'}).status_code
+            transport.close()
+            if status != 500 or api.usage()['units'] != 100:
+                print(f"❌ Simulované chyby nefungují: {status}, {api.usage()}")
+                return False
+
+        print("✅ Lokální náhrada API funguje")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v lokální náhradě API: {e}")
+        return False
+
+def test_metrics():
+    """Test metrik běhu (histogramy, jednotky, mezipaměť, export)"""
+    try:
+        import json
+        from youtube_analyzer.metrics import Metrics
+
+        metrics = Metrics()
+        metrics.record_call('channels', 200, 0.02, 100, 300)
+        metrics.record_call('search', 200, 0.2, 1000, 3000)
+        metrics.record_call('search', 403, 12.0, 50, 50)
+        metrics.record_retry('search', 'quotaExceeded')
+        metrics.record_cache('playlist_items', 3, 1)
+        with metrics.stage('fetch'):
+            pass
+
+        snapshot = json.loads(json.dumps(metrics.snapshot()))
+        totals = snapshot['totals']
+        if (totals['calls'], totals['errors'], totals['retries'], totals['units']) != (3, 1, 1, 201):
+            print(f"❌ Špatné součty: {totals}")
+            return False
+        search = snapshot['endpoints']['search']
+        if search['p50_seconds'] != 0.25 or search['p95_seconds'] is not None or totals['cache_hit_ratio'] != 0.75:
+            print(f"❌ Špatné kvantily nebo úspěšnost mezipaměti: {search}, {totals}")
+            return False
+        if snapshot['stages']['fetch']['count'] != 1:
+            print("❌ Fáze se neměří")
+            return False
+
+        text = metrics.to_prometheus()
+        expected = [
+            'youtube_analyzer_api_calls_total{endpoint="search",status="403"} 1',
+            'youtube_analyzer_api_call_duration_seconds_bucket{endpoint="search",le="+Inf"} 2',
+            'youtube_analyzer_api_retries_total{endpoint="search",reason="quotaExceeded"} 1',
+            'youtube_analyzer_cache_lookups_total{resource="playlist_items",result="miss"} 1'
+        ]
+        missing = [line for line in expected if line not in text.splitlines()]
+        if missing:
+            print(f"❌ V exportu Prometheus chybí: {missing}")
+            return False
+
+        print("✅ Metriky běhu fungují")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v metrikách běhu: {e}")
+        return False
+
+def test_render_stage_once():
+    """Test, že se vykreslení hotové úlohy měří jen jednou, ne při každém překreslení"""
+    try:
+        import youtube_channel_analyzer_streamlit as app
+        from youtube_analyzer.jobs import DONE, Job
+        from youtube_analyzer.metrics import Metrics
+
+        metrics = Metrics()
+        job = Job('render')
+        job.status = DONE
+        job.summary = {'metrics': metrics, 'run': 'run', 'units': 0, 'keys': {},
+                       'traffic': {'calls': 0, 'latency': 0.0, 'wire_bytes': 0, 'body_bytes': 0}}
+        rendered = []
+        display_results, show_diagnostics = app.display_results, app.show_diagnostics
+        app.display_results, app.show_diagnostics = rendered.append, lambda metrics, job_id: None
+        try:
+            # Každé kliknutí na widget znovu spustí skript a úlohu zobrazí znovu
+            for _ in range(3):
+                app.display_job(job)
+        finally:
+            app.display_results, app.show_diagnostics = display_results, show_diagnostics
+
+        count = metrics.snapshot()['stages'].get('render', {}).get('count')
+        if rendered != ['run'] * 3 or count != 1:
+            print(f"❌ Vykreslení změřeno {count}krát při {len(rendered)} zobrazeních")
+            return False
+
+        print("✅ Vykreslení hotové úlohy se měří jen jednou")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba při měření vykreslení: {e}")
+        return False
+
+def test_transport_masks():
+    """Test masek fields, hlaviček sdíleného spojení a počitadel přenosu"""
+    try:
+        from youtube_analyzer.cache import CHANNEL_PARTS
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.transport import Transport, fields_for, pooled_session
+
+        # Pole, která aplikace z odpovědí čte, musí v maskách zůstat
+        required = {
+            ('channels', CHANNEL_PARTS): ['etag', 'items(id,', 'snippet(title,description)',
+                                          'statistics(subscriberCount,videoCount,viewCount)',
+                                          'contentDetails/relatedPlaylists/uploads'],
+            ('channels', 'statistics'): ['etag', 'statistics('],
+            ('videos', 'snippet'): ['etag', 'snippet/channelId'],
+            ('playlistItems', 'snippet'): ['etag', 'snippet(', 'title', 'description', 'publishedAt',
+                                           'resourceId/videoId']
+        }
+        for (endpoint, part), fields in required.items():
+            mask = fields_for(endpoint, part)
+            missing = [field for field in fields if field not in mask]
+            if missing:
+                print(f"❌ Maska {endpoint} ({part}) neobsahuje {missing}: {mask}")
+                return False
+
+        session = pooled_session()
+        headers = dict(session.headers)
+        session.close()
+        if headers.get('Accept-Encoding') != 'gzip' or 'gzip' not in headers.get('User-Agent', ''):
+            print(f"❌ Spojení nežádá komprimované odpovědi: {headers}")
+            return False
+
+        with MockYouTubeAPI() as api:
+            transport = Transport(base_url=api.base_url)
+            ids = ','.join(f"UCmock{number:016d}" for number in range(50))
+            response = transport.get('channels', {'part': CHANNEL_PARTS, 'id': ids, 'key': 'K',
+                                                  'fields': fields_for('channels', CHANNEL_PARTS)})
+            stats = transport.stats.snapshot()
+            transport.close()
+
+        channels = stats.get('channels', {})
+        if response.status_code != 200 or channels.get('calls') != 1 or stats['total']['calls'] != 1:
+            print(f"❌ Volání nebylo započteno: {response.status_code}, {stats}")
+            return False
+        if channels['body_bytes'] != len(response.content) or not 0 < channels['wire_bytes'] < channels['body_bytes']:
+            print(f"❌ Přijaté bajty nesedí (gzip): {channels}, tělo {len(response.content)} B")
+            return False
+        if channels['latency'] <= 0:
+            print(f"❌ Latence nebyla zaznamenána: {channels}")
+            return False
+
+        print("✅ Masky fields, komprimované spojení a počitadla přenosu fungují")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v přenosu: {e}")
+        return False
+
+def test_conditional_requests():
+    """Test podmíněných dotazů s ETag (304 bez stahování a bez nové klasifikace)"""
+    try:
+        import tempfile
+        from youtube_analyzer.analyzer import YouTubeAnalyzer
+        from youtube_analyzer.cache import ResponseCache
+        from youtube_analyzer.keywords import KeywordPack
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.pipeline import analyze_batch
+        from youtube_analyzer.transport import Transport
+
+        words = KeywordPack({'kids': ['kids'], 'teen': ['gaming'], 'serious': ['news']}, digest='test')
+        urls = [f"https://www.youtube.com/channel/UCmock{number:016d}" for number in range(40)]
+
+        with tempfile.TemporaryDirectory() as tmp, MockYouTubeAPI(change_rate=0.3) as api:
+            def run():
+                # Every cached video list has expired, so each one is revalidated
+                cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'), ttls={'playlist_items': 0})
+                transport = Transport(base_url=api.base_url)
+                analyzer = YouTubeAnalyzer('K', transport=transport, cache=cache)
+                rows = analyze_batch(analyzer, urls, words)
+                transport.close()
+                cache.close()
+                return rows, analyzer.metrics.snapshot()
+
+            first, _ = run()
+            api.revision += 1
+            second, snapshot = run()
+
+        outcomes = snapshot['revalidation']['playlist_items']
+        changed = outcomes.get('changed', 0)
+        if outcomes.get('revalidated', 0) + changed != 40 or not 0 < changed < 40:
+            print(f"❌ Špatné výsledky revalidace: {outcomes}")
+            return False
+        if snapshot['totals']['reused_scores'] != outcomes['revalidated']:
+            print(f"❌ Nezměněné kanály se klasifikovaly znovu: {snapshot['totals']}")
+            return False
+        if snapshot['endpoints']['playlistItems']['statuses'].get('304') != outcomes['revalidated']:
+            print(f"❌ Server neodpověděl 304: {snapshot['endpoints']['playlistItems']}")
+            return False
+        if len(first) != len(second) or [row['URL'] for row in first] != [row['URL'] for row in second]:
+            print("❌ Výsledky po revalidaci nesedí")
+            return False
+
+        print(f"✅ Podmíněné dotazy fungují ({outcomes['revalidated']} beze změny, {changed} změněno)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v podmíněných dotazech: {e}")
+        return False
+
+def test_corpus_rescore():
+    """Test přepočtu uložených kanálů po změně klasifikačních slov bez volání API"""
+    try:
+        import tempfile
+        from youtube_analyzer.analyzer import YouTubeAnalyzer
+        from youtube_analyzer.corpus import CorpusStore, rescore_rows
+        from youtube_analyzer.keywords import KeywordPack
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.pipeline import analyze_batch
+        from youtube_analyzer.transport import Transport
+
+        words = KeywordPack({'kids': ['kids', 'cartoon'], 'teen': ['gaming'], 'serious': ['news']})
+        new_words = {'kids': ['kids', 'cartoon'], 'teen': ['gaming', 'prank', 'challenge'], 'serious': ['news']}
+        urls = [f"https://www.youtube.com/channel/UCmock{number:016d}" for number in range(30)]
+        urls += ["https://www.youtube.com/@someone", "https://www.youtube.com/watch?v=abc123"]
+
+        with tempfile.TemporaryDirectory() as tmp, MockYouTubeAPI() as api:
+            corpus = CorpusStore(os.path.join(tmp, 'corpus.sqlite'))
+            transport = Transport(base_url=api.base_url)
+            analyzer = YouTubeAnalyzer('K', transport=transport, corpus=corpus)
+            rows = analyze_batch(analyzer, urls, words)
+            transport.close()
+            calls = api.usage()['calls']
+
+            rescored = {word_boundary: corpus.rescore(new_words, word_boundary) for word_boundary in (True, False)}
+            if api.usage()['calls'] != calls:
+                print("❌ Přepočet volal API")
+                return False
+            for word_boundary, (classifications, changes) in rescored.items():
+                expected = analyze_batch(YouTubeAnalyzer('K', transport=Transport(base_url=api.base_url)),
+                                         urls, new_words, word_boundary)
+                if rescore_rows(rows, classifications, corpus.entity_channels()) != expected:
+                    print(f"❌ Přepočtené výsledky nesedí s novou analýzou (celá slova: {word_boundary})")
+                    return False
+            stored = len(corpus)
+            corpus.close()
+
+        if stored != len({row['Channel Title'] for row in rows}):
+            print(f"❌ Uloženo {stored} kanálů, výsledky jich mají {len({row['Channel Title'] for row in rows})}")
+            return False
+        # The last re-scoring compares to the scores stored by the one before, with the same words
+        if not len(rescored[True][1]) or len(rescored[False][1]):
+            print(f"❌ Špatný přehled změn kategorií: {len(rescored[True][1])}, {len(rescored[False][1])}")
+            return False
+
+        print(f"✅ Přepočet uložených kanálů funguje ({stored} kanálů, {len(rescored[True][1])} změn kategorie)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v přepočtu uložených kanálů: {e}")
+        return False
+
+def test_results_store():
+    """Test úložiště výsledků v Parquet (běhy podle data, export a historie kanálu)"""
+    try:
+        import io
+        import tempfile
+        from datetime import date, datetime
+        import pandas as pd
+        from youtube_analyzer.results_store import ResultsStore
+
+        def rows(category, count=3):
+            return [{'URL': f"https://www.youtube.com/channel/UC{number}", 'Channel Title': f"Kanál {number}",
+                     'Subscribers': 100 * number, 'Videos': number, 'Views': 1000 * number,
+                     'Primary Category': category, 'Kids %': 50, 'Teen %': 30, 'Serious %': 20}
+                    for number in range(count)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ResultsStore(tmp)
+            first = store.write_run('run-1', rows('Kids'), run_at=datetime(2024, 1, 1, 9, 0))
+            store.write_run('run-2', rows('Teen'), run_at=datetime(2024, 2, 1, 9, 0))
+            # A resumed run is stored again under its new date only
+            store.write_run('run-1', rows('Mixed'), run_at=datetime(2024, 3, 1, 9, 0))
+
+            if [handle.run_id for handle in store.runs()] != ['run-1', 'run-2']:
+                print(f"❌ Špatný seznam běhů: {store.runs()}")
+                return False
+            handle = store.handle('run-1')
+            if handle.rows != 3 or 'run_date=2024-03-01' not in handle.path or not os.path.exists(handle.path):
+                print(f"❌ Špatný záznam běhu: {handle}")
+                return False
+            if os.path.exists(first.path):
+                print("❌ Starší uložení obnoveného běhu zůstalo")
+                return False
+
+            expected = pd.DataFrame(rows('Mixed'))
+            if not pd.read_csv(io.BytesIO(store.csv_bytes(handle))).equals(expected):
+                print("❌ CSV export nesedí")
+                return False
+            if not pd.read_parquet(io.BytesIO(store.parquet_bytes(handle)))[expected.columns].equals(expected):
+                print("❌ Parquet export nesedí")
+                return False
+
+            history = store.history('Kanál 1')
+            if history['Primary Category'].tolist() != ['Teen', 'Mixed']:
+                print(f"❌ Špatná historie kanálu: {history['Primary Category'].tolist()}")
+                return False
+            if store.history('Kanál 1', since=date(2024, 2, 15))['Run ID'].tolist() != ['run-1']:
+                print("❌ Filtr podle data nefunguje")
+                return False
+
+            large = store.write_run('large', [rows(category, 1)[0] for category in ['Kids', 'Teen', 'Serious'] * 500])
+            if store.category_counts(large) != {'Kids': 500, 'Teen': 500, 'Serious': 500}:
+                print(f"❌ Špatné souhrnné počty: {store.category_counts(large)}")
+                return False
+            page, matched = store.page(large, ['Teen', 'Serious'], 'kanál 0', 'Primary Category', True,
+                                       page=4, page_size=200)
+            if matched != 1000 or len(page) != 200 or set(page['Primary Category']) != {'Serious'}:
+                print(f"❌ Špatná stránka výsledků: {matched} nalezeno, {len(page)} na stránce")
+                return False
+
+        print("✅ Úložiště výsledků funguje (běhy podle data, CSV/Parquet export, historie kanálu, stránkování)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v úložišti výsledků: {e}")
+        return False
+
+def test_gapi_client():
+    """Test klienta googleapiclient z přibaleného popisu API nad sdíleným spojením"""
+    try:
+        from googleapiclient.errors import HttpError
+    except ImportError:
+        print("⚠️ google-api-python-client není nainstalován, test přeskočen")
+        return True
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        from youtube_analyzer.gapi import build_client
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+
+        with MockYouTubeAPI() as api:
+            # Sestavení nepotřebuje síť, discovery dokument je přibalený
+            youtube = build_client('K', api_endpoint=api.base_url.rsplit('/youtube/v3', 1)[0] + '/')
+
+            def channel_title(number):
+                response = youtube.channels().list(part='snippet', id=f"UCmock{number:016d}").execute()
+                return response['items'][0]['snippet']['title']
+
+            # Jeden klient sdílený více vlákny
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                titles = list(executor.map(channel_title, range(40)))
+            if titles != [f"Channel {number:06d}" for number in range(40)]:
+                print("❌ Souběžná volání vrátila špatné kanály")
+                return False
+
+            request = youtube.playlistItems().list(part='snippet', playlistId='UUmock0000000000000001')
+            etag = request.execute()['etag']
+            request = youtube.playlistItems().list(part='snippet', playlistId='UUmock0000000000000001')
+            request.headers['If-None-Match'] = etag
+            try:
+                request.execute()
+                print("❌ Podmíněný dotaz nevrátil 304")
+                return False
+            except HttpError as e:
+                if e.resp.status != 304:
+                    print(f"❌ Podmíněný dotaz vrátil {e.resp.status}")
+                    return False
+
+        print("✅ Klient googleapiclient funguje (statický popis API, sdílené spojení, 304)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v klientovi googleapiclient: {e}")
+        return False
+
+def test_id_batching():
+    """Test dávkování ID po 50 na jedno volání API (videa i kanály)"""
+    try:
+        import youtube_channel_analyzer as app
+
+        class StubRequest:
+            def __init__(self, calls, endpoint, items, kwargs):
+                calls.append((endpoint, kwargs['id'].split(',')))
+                self.response = {'items': [items[item_id] for item_id in kwargs['id'].split(',') if item_id in items]}
+
+            def execute(self):
+                return self.response
+
+        class StubResource:
+            def __init__(self, calls, endpoint, items):
+                self.calls, self.endpoint, self.items = calls, endpoint, items
+
+            def list(self, **kwargs):
+                return StubRequest(self.calls, self.endpoint, self.items, kwargs)
+
+        class StubYouTube:
+            def __init__(self, videos, channels):
+                self.calls = []
+                self.video_items, self.channel_items = videos, channels
+
+            def videos(self):
+                return StubResource(self.calls, 'videos', self.video_items)
+
+            def channels(self):
+                return StubResource(self.calls, 'channels', self.channel_items)
+
+        # 120 videí ze 40 kanálů; každé desáté video neexistuje
+        video_ids = [f"v{number:010d}" for number in range(120)]
+        expected = {video_id: (f"UC{number % 40:022d}" if number % 10 else None)
+                    for number, video_id in enumerate(video_ids)}
+        videos = {video_id: {'id': video_id, 'snippet': {'channelId': channel_id}}
+                  for video_id, channel_id in expected.items() if channel_id}
+        channels = {f"UC{number:022d}": {'id': f"UC{number:022d}",
+                                         'snippet': {'title': f"Kanál {number}", 'description': ''},
+                                         'statistics': {'subscriberCount': str(number)}}
+                    for number in range(120) if number % 10}
+        youtube = StubYouTube(videos, channels)
+
+        # Vstupní řádky včetně opakovaných ID
+        rows = video_ids + video_ids[:30] + video_ids[::7]
+        video_channels = app.get_channels_from_videos(youtube, rows)
+        sizes = [len(ids) for endpoint, ids in youtube.calls]
+        if sizes != [50, 50, 20]:
+            print(f"❌ Videa načtena po dávkách {sizes}, očekáváno [50, 50, 20]")
+            return False
+        if [video_channels.get(video_id) for video_id in rows] != [expected[video_id] for video_id in rows]:
+            print("❌ Řádky videí nejsou přiřazeny ke správným kanálům")
+            return False
+
+        youtube.calls.clear()
+        channel_rows = [f"UC{number:022d}" for number in range(120)] + [f"UC{number:022d}" for number in range(0, 120, 3)]
+        channels_data = app.get_channels_data(youtube, channel_rows)
+        sizes = [len(ids) for endpoint, ids in youtube.calls]
+        if [endpoint for endpoint, _ in youtube.calls] != ['channels'] * 3 or sizes != [50, 50, 20]:
+            print(f"❌ Kanály načteny po dávkách {sizes}, očekáváno [50, 50, 20]")
+            return False
+        titles = [channels_data[channel_id]['title'] if channel_id in channels_data else None for channel_id in channel_rows]
+        if titles != [channels[channel_id]['snippet']['title'] if channel_id in channels else None for channel_id in channel_rows]:
+            print("❌ Řádky kanálů nejsou přiřazeny ke správným kanálům")
+            return False
+
+        print("✅ ID se načítají po dávkách 50 a každý řádek dostane svůj kanál")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v dávkování ID: {e}")
+        return False
+
+def test_budget_partial_results():
+    """Test, že vyčerpaný rozpočet kvóty zachová výsledky kanálů načtených do té doby"""
+    import importlib.util
+    if importlib.util.find_spec('googleapiclient') is None:
+        print("⚠️ google-api-python-client není nainstalován, test přeskočen")
+        return True
+    try:
+        import tempfile
+        import youtube_channel_analyzer as app
+        from youtube_analyzer.cache import ResponseCache
+        from youtube_analyzer.gapi import build_client
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+
+        urls = [
+            'https://www.youtube.com/channel/UCmock0000000000000001',
+            'https://www.youtube.com/watch?v=abcdefghijk',
+            'https://www.youtube.com/@someone',
+            'https://www.youtube.com/channel/UCmock0000000000000001'
+        ]
+        words = app.DEFAULT_CLASSIFICATION_WORDS
+        get_response_cache = app.get_response_cache
+        with MockYouTubeAPI() as api, tempfile.TemporaryDirectory() as tmp:
+            youtube = build_client('K', api_endpoint=api.base_url.rsplit('/youtube/v3', 1)[0] + '/')
+            cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'))
+            app.get_response_cache = lambda: cache
+            try:
+                # Video, handle, dávka kanálů a poslední videa dvou ze tří kanálů se vejdou;
+                # kanál bez posledních videí se nevyhodnotí jen z názvu a popisu
+                channel_url = 'https://www.youtube.com/channel/{}'.format
+                expected = [urls[0], channel_url(api.channel_id('video:abcdefghijk')), urls[0]]
+                results = app.process_urls(youtube, urls, words, quota_budget=5)
+                if list(results['URL']) != expected:
+                    print(f"❌ Po vyčerpání rozpočtu nesedí výsledky: {list(results['URL'])}")
+                    return False
+
+                # Bez rozpočtu zůstanou kanály celé načtené v cache, i přímé odkazy na kanál
+                results = app.process_urls(youtube, urls + ['https://www.youtube.com/watch?v=kjihgfedcba'],
+                                           words, quota_budget=0)
+                if list(results['URL']) != expected:
+                    print(f"❌ Bez rozpočtu nesedí výsledky z cache: {list(results['URL'])}")
+                    return False
+            finally:
+                app.get_response_cache = get_response_cache
+                cache.close()
+
+        print("✅ Vyčerpaný rozpočet zachová výsledky načtené do té doby")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba při vyčerpání rozpočtu: {e}")
+        return False
+
+def test_single_flight():
+    """Test slučování souběžných stejných dotazů z více relací"""
+    try:
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from youtube_analyzer.analyzer import YouTubeAnalyzer
+        from youtube_analyzer.benchmark import synthetic_urls
+        from youtube_analyzer.cache import CHANNEL_PARTS
+        from youtube_analyzer.keys import KeyPool
+        from youtube_analyzer.keywords import DEFAULT_CLASSIFICATION_WORDS, KeywordPack
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.pipeline import analyze_batch
+        from youtube_analyzer.singleflight import SingleFlight
+        from youtube_analyzer.transport import Transport
+
+        channel_ids = [f"UCmock{number:016d}" for number in range(120)]
+        with MockYouTubeAPI(latency=0.05) as api:
+            transport = Transport(base_url=api.base_url, pool_size=16)
+            flights = SingleFlight()
+
+            def session(ids):
+                analyzer = YouTubeAnalyzer(KeyPool(['K']), transport=transport, flights=flights)
+                barrier.wait()
+                return analyzer.get_channels_by_ids(ids)
+
+            # Šest relací se ptá na tytéž kanály ve stejnou chvíli: 3 volání po 50 ID místo 18
+            barrier = threading.Barrier(6)
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                results = list(executor.map(session, [channel_ids] * 6))
+            calls = api.usage()['endpoints']['channels']['calls']
+            if calls != 3 or any(sorted(result) != channel_ids for result in results):
+                print(f"❌ Souběžné relace poslaly {calls} volání místo 3")
+                return False
+
+            # Hotové výsledky se berou z LRU bez dalšího volání
+            barrier = threading.Barrier(1)
+            session(channel_ids[:10] + ['UCmock9999999999999999'])
+            if api.usage()['endpoints']['channels']['calls'] != 4:
+                print("❌ Nedávné výsledky se načetly znovu")
+                return False
+
+            # Když volání vlastníka selže, čekající relace si ID načte sama
+            slow = threading.Event()
+            owner = YouTubeAnalyzer(KeyPool(['K']), transport=transport, flights=SingleFlight())
+
+            def failing(ids):
+                slow.wait()
+                raise RuntimeError("výpadek")
+
+            waiter = YouTubeAnalyzer(KeyPool(['K']), transport=transport, flights=owner.flights)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                failed = executor.submit(owner.flights.fetch_many, ('channels', CHANNEL_PARTS), channel_ids[:5],
+                                         failing)
+                while owner.flights.stats()['in_flight'] < 5:
+                    time.sleep(0.01)
+                joined = executor.submit(waiter._fetch_channels, channel_ids[:5], CHANNEL_PARTS)
+                while owner.flights.stats()['joined'] < 5:
+                    time.sleep(0.01)
+                slow.set()
+                if sorted(joined.result()) != channel_ids[:5] or not isinstance(failed.exception(), RuntimeError):
+                    print("❌ Selhání vlastníka se nepřeneslo správně")
+                    return False
+
+            # Celé analýzy čtyř relací: žádné ID se nenačte dvakrát
+            words = KeywordPack(DEFAULT_CLASSIFICATION_WORDS)
+            lists = [synthetic_urls(300, seed=0)[offset:offset + 200] for offset in (0, 50, 100, 0)]
+
+            def analyze(urls, flights):
+                analyzer = YouTubeAnalyzer(KeyPool(['K']), transport=transport, flights=flights)
+                return analyze_batch(analyzer, urls, words)
+
+            solo = SingleFlight()
+            expected = [analyze(urls, solo) for urls in lists]
+            shared = SingleFlight()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                concurrent = list(executor.map(analyze, lists, [shared] * 4))
+            transport.close()
+        if concurrent != expected:
+            print("❌ Souběžné analýzy vrátily jiné výsledky")
+            return False
+        if shared.stats()['fetched'] != solo.stats()['fetched'] or not shared.stats()['joined']:
+            print(f"❌ Duplicitní načtení ID: {shared.stats()} oproti {solo.stats()}")
+            return False
+
+        print(f"✅ Souběžné dotazy se slučují ({shared.stats()['joined']} ID převzato, žádné načteno dvakrát)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba ve slučování dotazů: {e}")
+        return False
+
+def test_retry_policy():
+    """Test opakování dočasných chyb, Retry-After, jističe a vrácení jen neúspěšných řádků"""
+    try:
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from youtube_analyzer.analyzer import YouTubeAnalyzer
+        from youtube_analyzer.benchmark import synthetic_urls
+        from youtube_analyzer.keys import KeyPool
+        from youtube_analyzer.keywords import DEFAULT_CLASSIFICATION_WORDS, KeywordPack
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.pipeline import analyze_batch
+        from youtube_analyzer.retry import CircuitBreaker, RetryBudget, RetryPolicy
+        from youtube_analyzer.transport import Transport
+
+        budget = RetryBudget(ratio=0.5, reserve=2)
+        spent = [budget.withdraw() for _ in range(3)]
+        budget.deposit()
+        budget.deposit()
+        if spent != [True, True, False] or not budget.withdraw():
+            print(f"❌ Rozpočet opakování nefunguje: {spent}")
+            return False
+
+        words = KeywordPack(DEFAULT_CLASSIFICATION_WORDS)
+        urls = synthetic_urls(150, seed=3)
+
+        def analyze(api, urls, retry=None, failed=None):
+            transport = Transport(base_url=api.base_url, retry=retry)
+            analyzer = YouTubeAnalyzer(KeyPool(['K']), transport=transport, on_error=lambda message: None)
+            try:
+                return analyze_batch(analyzer, urls, words, failed=failed), analyzer
+            finally:
+                transport.close()
+
+        with MockYouTubeAPI() as api:
+            expected, _ = analyze(api, urls)
+
+        # Každé třetí volání selže s 503, opakování dodá všechny řádky; pořadí chyb mezi vlákny je
+        # náhodné a při výchozích 4 opakováních by některé ze stovek volání občas vzdalo
+        with MockYouTubeAPI(error_rate=0.3, error_status=503, seed=1) as api:
+            rows, analyzer = analyze(api, urls, RetryPolicy(max_retries=12, base_delay=0.001, budget_reserve=1000))
+        if rows != expected or not analyzer.metrics.snapshot()['totals']['retries']:
+            print("❌ Opakování nedodalo stejné výsledky jako běh bez chyb")
+            return False
+
+        # Retry-After se dodrží i při kratší vypočtené pauze
+        with MockYouTubeAPI(error_rate=1.0, error_status=429, retry_after=1) as api:
+            transport = Transport(base_url=api.base_url, retry=RetryPolicy(max_retries=1, base_delay=0.001))
+            start = time.perf_counter()
+            status = transport.get('videos', {'part': 'snippet', 'id': 'v'}).status_code
+            elapsed = time.perf_counter() - start
+            transport.close()
+            if status != 429 or elapsed < 1 or api.usage()['calls'] != 2:
+                print(f"❌ Retry-After se nedodržel: {status}, {elapsed:.2f} s, {api.usage()['calls']} volání")
+                return False
+
+        # Jistič při výpadku pozastaví všechna volání místo zahlcení API
+        with MockYouTubeAPI() as api:
+            breaker = CircuitBreaker(threshold=4, window=8, cooldown=0.2)
+            transport = Transport(base_url=api.base_url, breaker=breaker, pool_size=8)
+            api.outage(0.5)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                statuses = list(executor.map(
+                    lambda number: transport.get('channels', {'part': 'id', 'id': f"UC{number}"}).status_code,
+                    range(80)
+                ))
+            transport.close()
+            errors = api.usage()['endpoints']['channels']['errors']
+        if not breaker.trips or errors > 20 or statuses.count(200) < 60 or breaker.state != 'closed':
+            print(f"❌ Jistič nezastavil volání: {errors} chyb, {statuses.count(200)} úspěšných")
+            return False
+
+        # Bez opakování: neúspěšné řádky se vrátí k opakování, nikdy jako prázdné výsledky
+        failed = []
+        with MockYouTubeAPI(error_rate=0.3, seed=2) as api:
+            rows, _ = analyze(api, urls, failed=failed)
+        succeeded = [row['URL'] for row in rows]
+        if not failed or set(failed) & set(succeeded) or sorted(failed + succeeded) != sorted(r['URL'] for r in expected):
+            print(f"❌ Neúspěšné řádky nesedí: {len(failed)} neúspěšných, {len(succeeded)} hotových")
+            return False
+        if any(row not in expected for row in rows):
+            print("❌ Řádek s chybějícími daty se vydával za hotový výsledek")
+            return False
+        with MockYouTubeAPI() as api:
+            retried, _ = analyze(api, failed)
+        if sorted(row['URL'] for row in retried) != sorted(failed):
+            print("❌ Opakování neúspěšných řádků nedokončilo analýzu")
+            return False
+
+        print(f"✅ Dočasné chyby se opakují a jistič chrání API ({len(failed)} řádků vráceno k opakování)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v opakování volání: {e}")
+        return False
+
+def test_streaming_pipeline():
+    """Test proudového zpracování (fáze ve vláknech, výsledky po dávkách, omezená paměť úlohy)"""
+    try:
+        import itertools
+        import threading
+        from youtube_analyzer.analyzer import YouTubeAnalyzer
+        from youtube_analyzer.concurrency import batches, run_stages
+        from youtube_analyzer.jobs import RECENT_ROWS, Job
+        from youtube_analyzer.keywords import KeywordPack
+        from youtube_analyzer.mock_api import MockYouTubeAPI
+        from youtube_analyzer.pipeline import analyze_batch, analyze_job
+        from youtube_analyzer.transport import Transport
+
+        if list(run_stages(range(10), [lambda x: x * 2, lambda x: x + 1])) != [x * 2 + 1 for x in range(10)]:
+            print("❌ Fáze nezachovaly pořadí")
+            return False
+        try:
+            list(run_stages(range(10), [lambda x: 1 // (x - 3)]))
+            print("❌ Chyba fáze se neprojevila")
+            return False
+        except ZeroDivisionError:
+            pass
+        stream = run_stages(itertools.count(), [lambda x: x, lambda x: x])
+        next(stream)
+        stream.close()
+        if any(thread.name.startswith('stage-') for thread in threading.enumerate()):
+            print("❌ Vlákna fází po uzavření běží dál")
+            return False
+
+        words = KeywordPack({'kids': ['kids', 'cartoon'], 'teen': ['gaming'], 'serious': ['news']})
+        # Repeats across batches, the way placement lists repeat popular channels
+        urls = [f"https://www.youtube.com/watch?v=v{number % 300}" for number in range(500)]
+        urls += [f"https://www.youtube.com/@handle{number % 40}" for number in range(100)]
+
+        with MockYouTubeAPI(latency=0.002, channel_count=120) as api:
+            analyzer = YouTubeAnalyzer('K', transport=Transport(base_url=api.base_url))
+            known = {}
+            expected = [row for batch in batches(urls, 100) for row in analyze_batch(analyzer, batch, words, known=known)]
+            sequential_calls = api.usage()['calls']
+
+            api.reset()
+            analyzer = YouTubeAnalyzer('K', transport=Transport(base_url=api.base_url))
+            job = Job('stream', total=len(urls))
+            written = []
+            analyze_job(job, analyzer, iter(urls), words, batch_size=100, sink=written.extend)
+            streaming_calls = api.usage()['calls']
+
+        if written != expected:
+            print(f"❌ Proudové výsledky nesedí s postupnou analýzou ({len(written)} vs. {len(expected)} řádků)")
+            return False
+        if job.done != len(urls) or job.rows != len(expected) or sum(job.categories.values()) != job.rows:
+            print(f"❌ Špatné počty úlohy: {job.done}, {job.rows}, {job.categories}")
+            return False
+        if len(job.results) > RECENT_ROWS or job.results != expected[-RECENT_ROWS:]:
+            print(f"❌ Úloha drží {len(job.results)} řádků místo posledních {RECENT_ROWS}")
+            return False
+        if streaming_calls > sequential_calls:
+            print(f"❌ Proudové zpracování volalo API víckrát: {streaming_calls} vs. {sequential_calls}")
+            return False
+
+        print(f"✅ Proudové zpracování funguje ({job.rows} řádků, {streaming_calls} volání API)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba v proudovém zpracování: {e}")
+        return False
+
+def test_csv_ingestion():
+    """Test čtení velkých CSV po částech (jen vybraný sloupec, gzip/zip, URL rovnou do deníku úlohy)"""
+    try:
+        import codecs
+        import gzip
+        import io
+        import tempfile
+        import tracemalloc
+        import zipfile
+        from youtube_analyzer.ingest import read_column, sniff_csv
+        from youtube_analyzer.journal import JobJournal
+
+        def report(rows):
+            # A Google Ads export: title lines above the header, a summary line below the rows
+            return ("Placement report\nJanuary 1, 2024 - March 31, 2024\nPlacement,Placement URL,Clicks,Cost\n"
+                    + "".join(f"Channel {number},https://www.youtube.com/channel/UC{number:022d},{number},1.5\n"
+                              for number in range(rows))
+                    + "Total,,5\n")
+
+        text = report(1000)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as f:
+            f.writestr('export/report.csv', text)
+        uploads = {
+            'csv': text.encode(),
+            'gzip': gzip.compress(text.encode()),
+            'zip': archive.getvalue(),
+            'utf-16': text.replace(',', '\t').encode('utf-16'),
+            'utf-8 BOM': codecs.BOM_UTF8 + text.encode()
+        }
+        expected = [f"https://www.youtube.com/channel/UC{number:022d}" for number in range(1000)]
+        for name, data in uploads.items():
+            layout = sniff_csv(data)
+            if layout.columns != ['Placement', 'Placement URL', 'Clicks', 'Cost'] or len(layout.preview) != 5:
+                print(f"❌ Špatně rozpoznaná hlavička ({name}): {layout.columns}")
+                return False
+            if list(read_column(data, 'Placement URL', layout)) != expected:
+                print(f"❌ Špatně načtený sloupec ({name})")
+                return False
+
+            # Nahraný soubor (např. UploadedFile) se čte na místě, od začátku, a zůstane otevřený
+            upload = io.BytesIO(data)
+            upload.read(10)
+            reads = [list(read_column(upload, 'Placement URL', sniff_csv(upload))) for _ in range(2)]
+            if reads != [expected, expected]:
+                print(f"❌ Nahraný soubor nebyl přečten celý a znovu ({name})")
+                return False
+
+        # Peak memory follows the chunk size, not the file size
+        peaks = []
+        for rows in (50000, 200000):
+            data = gzip.compress(report(rows).encode())
+            layout = sniff_csv(data)
+            tracemalloc.start()
+            count = sum(1 for _ in read_column(data, 'Placement URL', layout))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            if count != rows:
+                print(f"❌ Načteno {count} URL z {rows}")
+                return False
+        if peaks[1] > peaks[0] * 1.5:
+            print(f"❌ Paměť roste s velikostí souboru: {peaks}")
+            return False
+
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = JobJournal.create(read_column(data, 'Placement URL', layout), source='report.csv.gz',
+                                        jobs_dir=tmp)
+            journal.finish()
+            resumed = JobJournal.open(journal.job_id, tmp)
+            if resumed.header['total'] != 200000 or sum(1 for _ in resumed.iter_urls()) != 200000:
+                print(f"❌ Deník úlohy ztratil URL: {resumed.header}")
+                return False
+
+        print(f"✅ Velká CSV se čtou po částech (špička {max(peaks) / 1e6:.1f} MB pro 200 000 řádků)")
+        return True
+    except Exception as e:
+        print(f"❌ Chyba při čtení CSV: {e}")
+        return False
+
 def main():
     """Spustí všechny testy"""
     print("🧪 Spouštím testy aplikace...")
@@ -92,7 +1439,34 @@ def main():
         test_file_structure,
         test_api_key_template, 
         test_streamlit_secrets,
-        test_csv_format
+        test_csv_format,
+        test_quota_estimate,
+        test_response_cache,
+        test_concurrent_engine,
+        test_keyword_matcher,
+        test_keyword_pack_cache,
+        test_batch_classification,
+        test_cli_reader,
+        test_cli_startup,
+        test_url_canonicalization,
+        test_job_journal,
+        test_key_pool,
+        test_handle_resolution,
+        test_job_runner,
+        test_mock_api,
+        test_metrics,
+        test_render_stage_once,
+        test_transport_masks,
+        test_conditional_requests,
+        test_corpus_rescore,
+        test_results_store,
+        test_gapi_client,
+        test_id_batching,
+        test_budget_partial_results,
+        test_single_flight,
+        test_retry_policy,
+        test_streaming_pipeline,
+        test_csv_ingestion
     ]
 
     passed = 0
@@ -0,0 +1,331 @@
+"""YouTube Data API client and channel classification without Streamlit"""
+import logging
+
+import requests
+
+from youtube_analyzer.cache import (
+    CHANNEL_PARTS, NOT_MODIFIED, cached_channels, cached_handles, conditional_read, read_through
+)
+from youtube_analyzer.concurrency import DEFAULT_MAX_WORKERS, run_ordered
+from youtube_analyzer.keys import KeyPool
+from youtube_analyzer.keywords import keyword_matcher
+from youtube_analyzer.metrics import Metrics
+from youtube_analyzer.quota import (
+    MAX_IDS_PER_REQUEST, QUOTA_EXCEEDED_MESSAGE, QuotaBudgetExceeded, QuotaExceeded
+)
+from youtube_analyzer.retry import TransientError, retry_reason
+from youtube_analyzer.transport import Transport, fields_for
+from youtube_analyzer.urls import canonical_key, canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+# Entity type of the IDs sent to each list endpoint
+ENDPOINT_TYPES = {'channels': 'channel', 'videos': 'video'}
+
+
+def chunked(items, size=MAX_IDS_PER_REQUEST):
+    """Split a list into consecutive chunks of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class YouTubeAnalyzer:
+    """YouTube Data API client resolving URLs to channels, batched and cached"""
+
+    def __init__(self, api_key, transport=None, budget=None, cache=None,
+                 max_workers=DEFAULT_MAX_WORKERS, on_error=None, metrics=None, corpus=None, flights=None):
+        # A single key or a KeyPool shared with other runs
+        self.keys = api_key if isinstance(api_key, KeyPool) else KeyPool([api_key])
+        self.transport = transport or Transport(pool_size=max_workers)
+        self.budget = budget
+        self.cache = cache
+        # CorpusStore keeping classified channel texts for re-scoring without API calls
+        self.corpus = corpus
+        # SingleFlight shared with other runs, so an ID another run is fetching isn't fetched again
+        self.flights = flights
+        self.max_workers = max_workers
+        # Worker threads can't draw Streamlit elements, so callers may collect errors instead
+        self.on_error = on_error or logger.error
+        # Calls, cache lookups and stage timings of this run
+        self.metrics = metrics or Metrics()
+        # Set once every key's daily quota is spent; later calls fail fast
+        self.quota_exceeded = False
+        # Keys ('video:…', 'channel:…', 'handle:…') of entities whose calls failed transiently, see failed_urls
+        self.failed = set()
+        self._reported = set()
+
+    def extract_channel_info(self, url):
+        """Extract channel ID, video ID, handle or username from various YouTube URL formats"""
+        return canonicalize_url(url)
+
+    def report_quota(self, error):
+        """Report a quota exception through on_error, each distinct message once"""
+        message = f"⚠️ {error}"
+        if message not in self._reported:
+            self._reported.add(message)
+            self.on_error(message)
+
+    def report_transient(self, error, keys):
+        """Report a call that failed transiently and remember the entities it left without data"""
+        self.failed.update(keys)
+        self.on_error(f"🚨 **{error}** · k opakování: {len(keys)}")
+
+    def _api_get(self, endpoint, params, silent=False, etag=None):
+        """Call a YouTube Data API endpoint and return parsed JSON, or None on error
+
+        With an `etag` the call is conditional and NOT_MODIFIED is returned
+        when the server answers 304.
+
+        Raises QuotaBudgetExceeded before a call over the run's budget and
+        QuotaExceeded once the daily quota of every key is spent, so the
+        unfinished work can be resumed instead of being recorded as empty.
+        Raises TransientError when the call still fails with a 5xx, a rate
+        limit or a connection error after the transport's retries, so its
+        rows are offered for a retry instead of being recorded as not found.
+        """
+        if self.quota_exceeded:
+            raise QuotaExceeded(QUOTA_EXCEEDED_MESSAGE)
+        if self.budget:
+            self.budget.charge(endpoint)
+
+        try:
+            response = self.transport.get(endpoint, {
+                **params,
+                'fields': fields_for(endpoint, params['part'])
+            }, keys=self.keys, metrics=self.metrics, budget=self.budget,
+                headers={'If-None-Match': etag} if etag else None)
+
+            if response.status_code == 304:
+                return NOT_MODIFIED
+            if retry_reason(response):
+                raise TransientError(f"YouTube API chyba {response.status_code}")
+
+            # Check for API errors
+            # quotaExceeded never gets here, the transport switches keys or raises QuotaExceeded
+            if response.status_code == 403:
+                error_data = response.json()
+                if silent:
+                    return None
+                else:
+                    self.on_error(f"🚨 **API chyba 403:** {error_data.get('error', {}).get('message', 'Neznámá chyba')}")
+                    return None
+            elif silent and response.status_code != 200:
+                return None
+            elif response.status_code == 400:
+                error_data = response.json()
+                self.on_error(f"🚨 **Neplatná URL nebo parametry:** {error_data.get('error', {}).get('message', 'Zkontrolujte formát URL')}")
+                return None
+            elif response.status_code != 200:
+                self.on_error(f"🚨 **YouTube API chyba {response.status_code}:** Zkuste to později")
+                return None
+
+            return response.json()
+        except QuotaExceeded:
+            self.quota_exceeded = True
+            raise
+        except (QuotaBudgetExceeded, TransientError):
+            raise
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise TransientError(f"Chyba připojení: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            self.on_error(f"🚨 **Chyba připojení:** {str(e)}")
+            return None
+        except Exception as e:
+            self.on_error(f"🚨 **Neočekávaná chyba:** {str(e)}")
+            return None
+
+    def _coalesced(self, namespace, ids, fetch):
+        """fetch(ids) -> ({id: value}, failed IDs) through the shared SingleFlight, if any"""
+        if self.flights is None:
+            return fetch(ids)[0]
+        return self.flights.fetch_many(namespace, ids, fetch, self.metrics)
+
+    def _fetch_chunks(self, endpoint, ids, part):
+        """Call a list endpoint for 50 IDs at a time, chunks in parallel
+
+        Returns the items of all chunks that succeeded and the IDs of the
+        chunks that failed; a quota exception is reported and the IDs of its
+        chunks are left out, to be fetched later. IDs of chunks that failed
+        transiently are added to `failed`.
+        """
+        chunks = list(chunked(ids))
+        responses = run_ordered(
+            lambda chunk: self._api_get(endpoint, {'part': part, 'id': ','.join(chunk)}),
+            chunks, self.max_workers, return_exceptions=True
+        )
+        items = []
+        failed = set()
+        for chunk, data in zip(chunks, responses):
+            if isinstance(data, QuotaBudgetExceeded):
+                self.report_quota(data)
+                failed.update(chunk)
+            elif isinstance(data, TransientError):
+                self.report_transient(data, [canonical_key({'id': entry_id, 'type': ENDPOINT_TYPES[endpoint]})
+                                             for entry_id in chunk])
+                failed.update(chunk)
+            elif isinstance(data, Exception):
+                raise data
+            elif data is not None:
+                items.extend(data.get('items', []))
+            else:
+                failed.update(chunk)
+        return items, failed
+
+    def _fetch_channels(self, channel_ids, part):
+        """Fetch channels.list items, 50 IDs per API call, chunks in parallel"""
+        def fetch(ids):
+            items, failed = self._fetch_chunks('channels', ids, part)
+            return {item['id']: item for item in items}, failed
+        return self._coalesced(('channels', part), channel_ids, fetch)
+
+    def _fetch_video_channels(self, video_ids):
+        """Fetch channel IDs of videos, 50 IDs per API call, chunks in parallel"""
+        def fetch(ids):
+            items, failed = self._fetch_chunks('videos', ids, 'snippet')
+            return {item['id']: item['snippet']['channelId'] for item in items}, failed
+        return self._coalesced(('videos',), video_ids, fetch)
+
+    def _fetch_handle(self, key):
+        """(channels.list item or None, whether every lookup was answered) of a 'handle:…' or 'username:…' key
+
+        1 unit per lookup. A name is known to have no channel only when no
+        lookup failed.
+        """
+        kind, name = key.split(':', 1)
+        # /c/ and /user/ names are legacy usernames or, for newer channels, equal to the handle
+        lookups = ['forHandle'] if kind == 'handle' else ['forUsername', 'forHandle']
+        answered = True
+        for lookup in lookups:
+            data = self._api_get('channels', {'part': CHANNEL_PARTS, lookup: name})
+            if data is None:
+                answered = False
+                continue
+            items = data.get('items', [])
+            if items:
+                return items[0], True
+        return None, answered
+
+    def _fetch_handles(self, keys):
+        """Look up handles and usernames in parallel, one channels.list call each"""
+        def fetch(keys):
+            outcomes = run_ordered(self._fetch_handle, keys, self.max_workers, return_exceptions=True)
+            channels = {}
+            failed = set()
+            for key, outcome in zip(keys, outcomes):
+                if isinstance(outcome, QuotaBudgetExceeded):
+                    self.report_quota(outcome)
+                    failed.add(key)
+                elif isinstance(outcome, TransientError):
+                    self.report_transient(outcome, [key])
+                    failed.add(key)
+                elif isinstance(outcome, Exception):
+                    raise outcome
+                else:
+                    item, answered = outcome
+                    # None marks a name without a channel, cached as such
+                    if item is not None or answered:
+                        channels[key] = item
+            return channels, failed
+        return self._coalesced(('channels', 'handle'), keys, fetch)
+
+    def get_channels_by_handles(self, keys):
+        """Resolve handle and username keys to channel IDs without the 100-unit search
+
+        Returns ({key: channel_id}, {channel_id: item}); the items come from
+        the lookup responses themselves, so those channels need no second call.
+        """
+        return cached_handles(self.cache, keys, self._fetch_handles, self.metrics)
+
+    def get_channels_by_ids(self, channel_ids):
+        """Get channel data for many channel IDs, 50 IDs per API call"""
+        return cached_channels(self.cache, channel_ids, self._fetch_channels, self.metrics)
+
+    def get_videos_channel_ids(self, video_ids):
+        """Map many video IDs to their channel IDs, 50 IDs per API call"""
+        return read_through(self.cache, 'video_channel', video_ids, self._fetch_video_channels, self.metrics)
+
+    def get_channel_by_id(self, channel_id):
+        """Get channel data by channel ID"""
+        return self.get_channels_by_ids([channel_id]).get(channel_id)
+
+    def get_video_info(self, video_id):
+        """Get video data and extract channel ID"""
+        return self.get_videos_channel_ids([video_id]).get(video_id)
+
+    def get_channel_videos(self, channel_data, max_results=5):
+        """Get recent videos from the channel's uploads playlist (1 unit instead of 100 for search)"""
+        return self.fetch_channel_videos(channel_data, max_results)[0]
+
+    def fetch_channel_videos(self, channel_data, max_results=5):
+        """Recent videos of a channel and the outcome of reading them, see conditional_read
+
+        An expired cached list is revalidated with its ETag, so a 304 costs
+        no download and marks the channel's videos as unchanged. Raises
+        TransientError rather than returning no videos when the call keeps
+        failing transiently.
+        """
+        uploads = channel_data.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads')
+        if not uploads:
+            return [], 'failed'
+
+        def fetch(etag):
+            data = self._api_get('playlistItems', {
+                'part': 'snippet',
+                'playlistId': uploads,
+                'maxResults': max_results
+            }, silent=True, etag=etag)
+            if data is None or data is NOT_MODIFIED:
+                return data
+            return data.get('items', []), data.get('etag')
+
+        def shared_fetch(etag):
+            # Only callers sending the same If-None-Match share a call
+            def fetch_one(keys):
+                data = fetch(etag)
+                return ({}, set(keys)) if data is None else ({key: data}, set())
+            return self._coalesced(('playlistItems', etag), [key], fetch_one).get(key)
+
+        key = f"{uploads}/{max_results}"
+        videos, outcome = conditional_read(self.cache, 'playlist_items', key, shared_fetch, self.metrics)
+        return videos or [], outcome
+
+
+def channel_text(channel_data, videos):
+    """Lowercased text of a channel's title, description and recent videos"""
+    text_parts = [
+        channel_data['snippet']['title'],
+        channel_data['snippet']['description']
+    ]
+
+    for video in videos:
+        text_parts.append(video['snippet']['title'])
+        text_parts.append(video['snippet']['description'])
+
+    return ' '.join(text_parts).lower()
+
+
+def classify_channel(channel_data, videos, classification_words, word_boundary=False):
+    """Classify channel based on content"""
+    if not channel_data:
+        return {'kids': 0, 'teen': 0, 'serious': 0, 'primary_category': 'Unknown'}
+
+    # Combine text from channel and videos
+    text = channel_text(channel_data, videos)
+
+    # Count keyword matches of all categories in one pass over the text
+    counts = keyword_matcher(classification_words, word_boundary).count(text)
+    scores = {category: counts.get(category, 0) for category in ['kids', 'teen', 'serious']}
+
+    # Normalize scores
+    total = sum(scores.values()) or 1
+    normalized_scores = {k: round((v / total) * 100) for k, v in scores.items()}
+
+    # Determine primary category
+    max_score = max(normalized_scores.values())
+    if max_score > 40:
+        primary_category = max(normalized_scores, key=normalized_scores.get).title()
+    else:
+        primary_category = 'Mixed'
+
+    return {**normalized_scores, 'primary_category': primary_category}
@@ -0,0 +1,168 @@
+"""End-to-end throughput benchmark against the local mock API
+
+    python -m youtube_analyzer benchmark --sizes 100 1000 10000 --output benchmarks.jsonl
+
+Each size runs the headless pipeline (parse, resolve, fetch, classify) over
+a synthetic placement list with the realistic mix of channel, video and
+@handle URLs and repeats, against a MockYouTubeAPI and an empty cache.
+The analysis of each size runs in a fresh process, so the mock server
+doesn't compete with it for the GIL and its peak memory is its own.
+Reported per size: URLs per second, p50/p95 API call latency, quota units
+per URL (as charged by the mock server) and peak resident memory. With
+--output every run is appended as one JSON line, so results can be
+compared across changes.
+"""
+import json
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not reported
+    resource = None
+
+from youtube_analyzer.mock_api import MockYouTubeAPI
+from youtube_analyzer.transport import Transport
+
+DEFAULT_SIZES = (100, 1000, 10000)
+BENCHMARK_BATCH_SIZE = 500
+
+
+def synthetic_urls(count, seed=0):
+    """Placement-list-like URLs: mostly channels and videos, some handles, ~30% repeats"""
+    rng = random.Random(seed)
+    urls = []
+    for number in range(count):
+        if urls and rng.random() < 0.3:
+            urls.append(rng.choice(urls))
+            continue
+        kind = rng.random()
+        if kind < 0.45:
+            urls.append(f"https://www.youtube.com/channel/UCmock{rng.randrange(count * 2):016d}")
+        elif kind < 0.85:
+            urls.append(f"https://www.youtube.com/watch?v=vid{number:08d}")
+        elif kind < 0.95:
+            urls.append(f"https://www.youtube.com/@handle{rng.randrange(count)}")
+        else:
+            urls.append(f"https://www.youtube.com/user/legacy{rng.randrange(count)}")
+    return urls
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers, 0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class TimedTransport(Transport):
+    """Transport that keeps the latency of every call for percentiles"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def _send(self, endpoint, params, metrics=None, headers=None):
+        start = time.perf_counter()
+        response = super()._send(endpoint, params, metrics, headers)
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process so far, or None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / 2 ** 20 if peak > 2 ** 32 else peak / 2 ** 10, 1)
+
+
+def run_size(base_url, count, words, max_workers, requests_per_second=None,
+             batch_size=BENCHMARK_BATCH_SIZE, seed=0):
+    """Analyze `count` synthetic URLs against the API at `base_url` and return the measurements"""
+    from youtube_analyzer.analyzer import YouTubeAnalyzer
+    from youtube_analyzer.concurrency import TokenBucket
+    from youtube_analyzer.keys import KeyPool
+    from youtube_analyzer.keywords import KeywordPack
+    from youtube_analyzer.pipeline import stream_batches
+    from youtube_analyzer.quota import QuotaBudget
+
+    urls = synthetic_urls(count, seed)
+    classification_words = KeywordPack(words)
+    transport = TimedTransport(base_url=base_url, pool_size=max_workers,
+                               rate_limiter=TokenBucket(requests_per_second) if requests_per_second else None)
+    errors = []
+    analyzer = YouTubeAnalyzer(KeyPool(['benchmark']), transport=transport, budget=QuotaBudget(10 ** 9),
+                               max_workers=max_workers, on_error=errors.append)
+
+    rows = 0
+    start = time.perf_counter()
+    try:
+        for _, results in stream_batches(analyzer, urls, classification_words, batch_size=batch_size):
+            rows += len(results)
+        elapsed = time.perf_counter() - start
+    finally:
+        transport.close()
+
+    return {
+        'urls': count,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'urls_per_second': round(count / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(transport.latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(transport.latencies, 0.95) * 1000, 2),
+        'peak_memory_mb': peak_memory_mb(),
+        'errors': len(errors)
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, latency=0.02, jitter=0.0, error_rate=0.0, max_workers=8,
+                  requests_per_second=None, classification_words=None, on_result=None):
+    """Run every size against one mock server, calling on_result(result) after each"""
+    from youtube_analyzer.keywords import DEFAULT_CLASSIFICATION_WORDS
+
+    words = classification_words.words if classification_words else DEFAULT_CLASSIFICATION_WORDS
+    settings = {'latency': latency, 'jitter': jitter, 'error_rate': error_rate,
+                'workers': max_workers, 'rps': requests_per_second}
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with MockYouTubeAPI(latency=latency, jitter=jitter, error_rate=error_rate) as api:
+        for count in sizes:
+            api.reset()
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                measured = executor.submit(run_size, api.base_url, count, words, max_workers,
+                                           requests_per_second).result()
+            usage = api.usage()
+            result = {
+                'date': datetime.now().isoformat(timespec='seconds'),
+                **settings,
+                **measured,
+                'calls': usage['calls'],
+                'units': usage['units'],
+                'units_per_url': round(usage['units'] / count, 4)
+            }
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def format_result(result):
+    """One line of the benchmark report"""
+    return (f"{result['urls']:>6} URL  {result['urls_per_second']:>8.1f} URL/s  "
+            f"p50 {result['p50_ms']:>6.1f} ms  p95 {result['p95_ms']:>6.1f} ms  "
+            f"{result['units_per_url']:.3f} jednotek/URL  {result['peak_memory_mb'] or '?':>7} MB  "
+            f"({result['calls']} volání, {result['errors']} chyb)")
+
+
+def append_results(path, results):
+    """Append results as JSON lines for comparison over time"""
+    with open(path, 'a', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
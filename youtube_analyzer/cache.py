@@ -0,0 +1,328 @@
+"""Persistent SQLite cache of YouTube Data API resources"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = 'youtube_cache.sqlite'
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+DAY = 24 * 60 * 60
+
+# Time to live of each cached resource type in seconds
+CACHE_TTLS = {
+    'channel_snippet': 30 * DAY,      # title, description, uploads playlist
+    'channel_statistics': DAY,        # subscriber, video and view counts
+    'video_channel': 365 * DAY,       # a video never moves to another channel
+    'channel_handle': 30 * DAY,       # @handle or legacy username -> channel ID
+    'channel_handle_missing': DAY,    # @handle or username with no channel, which may yet be claimed
+    'playlist_items': DAY,            # recent uploads of a channel
+    'channel_scores': 30 * DAY        # classification of a channel's text
+}
+
+# Returned by a conditional fetch when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+
+CHANNEL_PARTS = 'snippet,statistics,contentDetails'
+
+
+class ResponseCache:
+    """Single-file cache keyed by resource type and ID
+
+    One connection is shared by all threads behind a lock, so a single
+    instance can serve every Streamlit session of the process. When the
+    stored bodies grow over `max_bytes`, least recently read entries are
+    evicted first.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttls = {**CACHE_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    resource TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    etag TEXT,
+                    PRIMARY KEY (resource, id)
+                )
+            ''')
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(responses)')]
+            if 'etag' not in columns:
+                # Cache files written before ETags were stored
+                self._conn.execute('ALTER TABLE responses ADD COLUMN etag TEXT')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+
+    def get_many(self, resource, ids):
+        """Return {id: body} for the fresh entries among `ids`"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+
+        now = time.time()
+        oldest = now - self.ttls.get(resource, DAY)
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT id, body FROM responses WHERE resource = ? AND fetched_at >= ? AND id IN ({placeholders})',
+                    [resource, oldest, *chunk]
+                ).fetchall()
+                for entry_id, body in rows:
+                    found[entry_id] = json.loads(body)
+                if rows:
+                    self._conn.execute(
+                        f'UPDATE responses SET accessed_at = ? WHERE resource = ? AND id IN ({",".join("?" * len(rows))})',
+                        [now, resource, *(entry_id for entry_id, _ in rows)]
+                    )
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        return found
+
+    def get(self, resource, entry_id):
+        return self.get_many(resource, [entry_id]).get(entry_id)
+
+    def get_entry(self, resource, entry_id):
+        """(body, etag, fresh) of an entry even after its TTL, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, etag, fetched_at FROM responses WHERE resource = ? AND id = ?',
+                [resource, entry_id]
+            ).fetchone()
+        if row is None:
+            return None
+        body, etag, fetched_at = row
+        return json.loads(body), etag, fetched_at >= time.time() - self.ttls.get(resource, DAY)
+
+    def set_many(self, resource, items, etags=None):
+        """Store {id: body} entries, with {id: etag} if known, and evict old ones when over the size limit"""
+        if not items:
+            return
+
+        now = time.time()
+        etags = etags or {}
+        rows = []
+        for entry_id, body in items.items():
+            encoded = json.dumps(body, ensure_ascii=False)
+            rows.append((resource, entry_id, encoded, len(encoded), now, now, etags.get(entry_id)))
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO responses (resource, id, body, size, fetched_at, accessed_at, etag) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self._evict()
+
+    def revalidate(self, resource, entry_id):
+        """Restart the TTL of an entry the server confirmed unchanged"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE resource = ? AND id = ?',
+                [now, now, resource, entry_id]
+            )
+
+    def set(self, resource, entry_id, body):
+        self.set_many(resource, {entry_id: body})
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Free a little more than needed so eviction doesn't run on every write
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for rowid, size in self._conn.execute('SELECT rowid, size FROM responses ORDER BY accessed_at'):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany('DELETE FROM responses WHERE rowid = ?', victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _record(metrics, resource, hits, misses):
+    if metrics is not None:
+        metrics.record_cache(resource, hits, misses)
+
+
+def read_through(cache, resource, ids, fetch, metrics=None):
+    """Return {id: body} for `ids`, calling fetch(missing_ids) only for cache misses"""
+    ids = list(dict.fromkeys(ids))
+    if cache is None:
+        return fetch(ids) if ids else {}
+
+    found = cache.get_many(resource, ids)
+    missing = [entry_id for entry_id in ids if entry_id not in found]
+    _record(metrics, resource, len(found), len(missing))
+    if missing:
+        fetched = fetch(missing)
+        cache.set_many(resource, fetched)
+        found.update(fetched)
+    return found
+
+
+def conditional_read(cache, resource, entry_id, fetch, metrics=None):
+    """Return (body, outcome) of one entry, revalidating an expired one with its ETag
+
+    fetch(etag) sends If-None-Match when `etag` isn't None and returns
+    NOT_MODIFIED on 304, (body, etag) otherwise, or None on failure. outcome
+    is 'cached' (fresh, no call), 'revalidated' (304, the stored body is
+    served and kept), 'changed' (expired and different), 'new' or 'failed'.
+    """
+    entry = cache.get_entry(resource, entry_id) if cache is not None else None
+    if entry is not None and entry[2]:
+        _record(metrics, resource, 1, 0)
+        return entry[0], 'cached'
+    _record(metrics, resource, 0, 1)
+
+    stored_body, stored_etag = (entry[0], entry[1]) if entry is not None else (None, None)
+    fetched = fetch(stored_etag)
+    if fetched is NOT_MODIFIED:
+        cache.revalidate(resource, entry_id)
+        outcome, body = 'revalidated', stored_body
+    elif fetched is None:
+        return None, 'failed'
+    else:
+        body, etag = fetched
+        if cache is not None:
+            cache.set_many(resource, {entry_id: body}, {entry_id: etag})
+        outcome = 'new' if entry is None else 'changed'
+    if metrics is not None:
+        metrics.record_revalidation(resource, outcome)
+    return body, outcome
+
+
+def text_digest(text, *salt):
+    """Short stable digest of a text and the settings it was scored with"""
+    return hashlib.sha1('\0'.join([*map(str, salt), text]).encode('utf-8')).hexdigest()
+
+
+def cached_scores(cache, texts, settings_key, classify, unchanged=()):
+    """Scores of channels by ID, re-scoring only texts that changed
+
+    Channels in `unchanged` (e.g. whose videos were revalidated with a 304)
+    reuse their stored scores when their text digest matches. The rest are
+    passed to classify({channel_id: text}) -> {channel_id: scores} and
+    stored for the next run. Without a settings key nothing is stored.
+    """
+    reused = {}
+    if cache is not None and settings_key is not None and unchanged:
+        stored = cache.get_many('channel_scores', [channel_id for channel_id in texts if channel_id in unchanged])
+        reused = {
+            channel_id: entry['scores'] for channel_id, entry in stored.items()
+            if entry['digest'] == text_digest(texts[channel_id], settings_key)
+        }
+
+    pending = {channel_id: text for channel_id, text in texts.items() if channel_id not in reused}
+    scored = classify(pending) if pending else {}
+    if cache is not None and settings_key is not None:
+        cache.set_many('channel_scores', {
+            channel_id: {'digest': text_digest(pending[channel_id], settings_key), 'scores': scores}
+            for channel_id, scores in scored.items()
+        })
+    return {channel_id: reused.get(channel_id) or scored[channel_id] for channel_id in texts
+            if channel_id in reused or channel_id in scored}, len(reused)
+
+
+def store_channels(cache, items):
+    """Cache full channels.list items by ID as separate snippet and statistics entries"""
+    snippets = {
+        channel_id: {key: value for key, value in item.items() if key != 'statistics'}
+        for channel_id, item in items.items()
+    }
+    statistics = {channel_id: item.get('statistics', {}) for channel_id, item in items.items()}
+    cache.set_many('channel_snippet', snippets)
+    cache.set_many('channel_statistics', statistics)
+    return snippets, statistics
+
+
+def cached_handles(cache, keys, fetch, metrics=None):
+    """Resolve handle keys to channel IDs, looking up only names not mapped yet
+
+    fetch(keys) must return {key: channels.list item} of the channels it
+    found and {key: None} of the names the API answered without a channel;
+    keys it leaves out (failed or skipped lookups) are looked up next time.
+    Names without a channel are remembered for a day, so repeated runs don't
+    pay for them again. Returns ({key: channel_id}, {channel_id: item})
+    where the items are the channels fetched by this call, so they need no
+    second request; their snippets and statistics are cached as well.
+    """
+    keys = list(dict.fromkeys(keys))
+    if cache is None:
+        fetched = {key: item for key, item in (fetch(keys) if keys else {}).items() if item is not None}
+        return {key: item['id'] for key, item in fetched.items()}, {item['id']: item for item in fetched.values()}
+
+    mapping = cache.get_many('channel_handle', keys)
+    unclaimed = cache.get_many('channel_handle_missing', [key for key in keys if key not in mapping])
+    missing = [key for key in keys if key not in mapping and key not in unclaimed]
+    _record(metrics, 'channel_handle', len(mapping) + len(unclaimed), len(missing))
+    channels = {}
+    if missing:
+        fetched = fetch(missing)
+        found = {key: item for key, item in fetched.items() if item is not None}
+        new_mapping = {key: item['id'] for key, item in found.items()}
+        channels = {item['id']: item for item in found.values()}
+        cache.set_many('channel_handle', new_mapping)
+        cache.set_many('channel_handle_missing', {key: True for key, item in fetched.items() if item is None})
+        store_channels(cache, channels)
+        mapping.update(new_mapping)
+    return mapping, channels
+
+
+def cached_channels(cache, channel_ids, fetch, metrics=None):
+    """Return {channel_id: channels.list item} using cached snippets and statistics
+
+    fetch(ids, part) must return {channel_id: item}. Channels without a fresh
+    snippet are fetched with all parts, channels whose statistics alone have
+    expired are refreshed with part=statistics only.
+    """
+    ids = list(dict.fromkeys(channel_ids))
+    if cache is None:
+        return fetch(ids, CHANNEL_PARTS) if ids else {}
+
+    snippets = cache.get_many('channel_snippet', ids)
+    statistics = cache.get_many('channel_statistics', ids)
+    _record(metrics, 'channel_snippet', len(snippets), len(ids) - len(snippets))
+    _record(metrics, 'channel_statistics', len(statistics), len(ids) - len(statistics))
+
+    missing = [channel_id for channel_id in ids if channel_id not in snippets]
+    if missing:
+        new_snippets, new_statistics = store_channels(cache, fetch(missing, CHANNEL_PARTS))
+        snippets.update(new_snippets)
+        statistics.update(new_statistics)
+
+    stale = [channel_id for channel_id in ids if channel_id in snippets and channel_id not in statistics]
+    if stale:
+        fetched = fetch(stale, 'statistics')
+        new_statistics = {channel_id: item.get('statistics', {}) for channel_id, item in fetched.items()}
+        cache.set_many('channel_statistics', new_statistics)
+        statistics.update(new_statistics)
+
+    return {
+        channel_id: {**snippets[channel_id], 'statistics': statistics[channel_id]}
+        for channel_id in ids
+        if channel_id in snippets and channel_id in statistics
+    }
@@ -0,0 +1,355 @@
+"""Headless batch analysis from the command line
+
+    python -m youtube_analyzer analyze placements.csv --url-column URL -o out.csv
+
+Input rows are read and analyzed in batches and result rows are written
+as soon as each batch is classified, so memory stays flat for any file
+size and a stopped run keeps everything written so far.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+API_KEY_ENV = 'YOUTUBE_API_KEY'
+API_KEY_PLACEHOLDER = 'YOUR_YOUTUBE_DATA_API_KEY_HERE'
+DEFAULT_BATCH_SIZE = 500
+
+
+def _warn(message):
+    print(message, file=sys.stderr)
+
+
+def load_api_keys(path='api_key.txt'):
+    """API keys from the environment or api_key.txt, as the apps load them"""
+    from youtube_analyzer.keys import split_keys
+
+    keys = split_keys(os.environ.get(API_KEY_ENV, ''))
+    if keys:
+        return keys
+    try:
+        with open(path, 'r') as f:
+            return [key for key in split_keys(f.read()) if key != API_KEY_PLACEHOLDER]
+    except OSError:
+        return []
+
+
+def read_urls(f, url_column=None):
+    """Yield stripped URLs from a CSV column, or from every line without a column"""
+    if url_column is None:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+        return
+
+    reader = csv.DictReader(f)
+    if reader.fieldnames is None or url_column not in reader.fieldnames:
+        raise SystemExit(f"Sloupec '{url_column}' v souboru není (sloupce: {', '.join(reader.fieldnames or [])})")
+    for row in reader:
+        url = (row.get(url_column) or '').strip()
+        if url and url != 'nan':
+            yield url
+
+
+def _open_input(path):
+    if path == '-':
+        return sys.stdin
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def _open_output(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def write_metrics(path, metrics):
+    """Write run metrics as Prometheus text for a .prom or .txt path, JSON otherwise"""
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith(('.prom', '.txt')):
+            f.write(metrics.to_prometheus())
+        else:
+            json.dump(metrics.snapshot(), f, indent=2)
+
+
+def analyze_command(args):
+    # Imported here so `--help` doesn't pay for pandas, numpy and requests
+    from youtube_analyzer.analyzer import YouTubeAnalyzer
+    from youtube_analyzer.cache import ResponseCache
+    from youtube_analyzer.concurrency import TokenBucket
+    from youtube_analyzer.corpus import CorpusStore
+    from youtube_analyzer.journal import JobJournal
+    from youtube_analyzer.keys import KeyPool
+    from youtube_analyzer.keywords import DEFAULT_CLASSIFICATION_WORDS, load_keyword_pack
+    from youtube_analyzer.pipeline import RESULT_COLUMNS, stream_batches
+    from youtube_analyzer.quota import QuotaBudget
+    from youtube_analyzer.retry import CircuitBreaker, RetryPolicy
+    from youtube_analyzer.transport import Transport
+    from youtube_analyzer.urls import canonical_key, canonicalize_url
+
+    api_keys = args.api_key or load_api_keys()
+    if not api_keys:
+        _warn(f"⚠️ Chybí API klíč: použijte --api-key, proměnnou {API_KEY_ENV} nebo api_key.txt")
+        return 2
+
+    if args.job:
+        try:
+            journal = JobJournal.open(args.job, args.jobs_dir)
+        except FileNotFoundError:
+            _warn(f"⚠️ Úloha {args.job} neexistuje")
+            return 2
+        if not args.quiet:
+            _warn(f"♻️ Pokračuji v úloze {journal.job_id}, hotové výsledky se znovu nenačítají")
+    else:
+        journal = JobJournal.create(source=os.path.abspath(args.input) if args.input != '-' else None,
+                                    jobs_dir=args.jobs_dir)
+        if not args.quiet:
+            _warn(f"Úloha {journal.job_id}")
+
+    classification_words = load_keyword_pack(args.words, DEFAULT_CLASSIFICATION_WORDS)
+    budget = QuotaBudget(args.quota_budget)
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    corpus = None if args.no_corpus else CorpusStore(args.corpus)
+    transport = Transport(base_url=args.api_url, pool_size=args.workers, rate_limiter=TokenBucket(args.rps),
+                          retry=RetryPolicy(max_retries=args.retries) if args.retries else None,
+                          breaker=CircuitBreaker())
+    key_pool = KeyPool(api_keys)
+    analyzer = YouTubeAnalyzer(key_pool, transport=transport, budget=budget, cache=cache,
+                               max_workers=args.workers, on_error=_warn, corpus=corpus)
+
+    source = _open_input(args.input)
+    sink = _open_output(args.output)
+    run = None
+    if args.results_dir:
+        from youtube_analyzer.results_store import ResultsStore
+        run = ResultsStore(args.results_dir).writer(journal.job_id)
+    written = 0
+    failed = []
+    # Batches overlap: one is written while the next ones are fetched and resolved. Results of
+    # every entity finished so far live in the journal, so a repeat in a later batch or a
+    # resumed run costs nothing
+    stream = stream_batches(analyzer, read_urls(source, args.url_column), classification_words,
+                            args.whole_words, args.batch_size, on_warning=_warn, journal=journal, failed=failed)
+    try:
+        writer = csv.DictWriter(sink, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        for number, (urls, results) in enumerate(stream, start=1):
+            writer.writerows(results)
+            sink.flush()
+            if run is not None:
+                run.write(results)
+            written += len(results)
+            if not args.quiet:
+                _warn(f"Dávka {number}: {len(results)}/{len(urls)} URL analyzováno, "
+                      f"spotřebováno {budget.spent} jednotek kvóty")
+            if budget.exhausted or analyzer.quota_exceeded:
+                _warn(f"⚠️ Kvóta vyčerpána, analýza zastavena. Pokračujte později s --job {journal.job_id}")
+                return 3
+        journal.finish()
+    finally:
+        # Stop the stages before the journal they record to is closed
+        stream.close()
+        # Rows that failed in one batch may have succeeded in a later one
+        failed = [url for url in failed if canonical_key(canonicalize_url(url)) not in journal.results]
+        if args.failed:
+            with open(args.failed, 'w', encoding='utf-8') as f:
+                f.writelines(f"{url}\n" for url in failed)
+        journal.close()
+        if run is not None:
+            run.close()
+        # Written for stopped runs too, they are the ones worth a look
+        if args.metrics:
+            write_metrics(args.metrics, analyzer.metrics)
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        transport.close()
+        if cache is not None:
+            cache.close()
+        if corpus is not None:
+            corpus.close()
+
+    if not args.quiet:
+        if len(key_pool.keys) > 1:
+            for usage in key_pool.usage():
+                _warn(f"Klíč {usage['key']}: {usage['spent']} jednotek, {usage['calls']} volání"
+                      f"{', vyčerpán' if usage['exhausted'] else ''}")
+        outcomes = analyzer.metrics.snapshot()['revalidation'].get('playlist_items', {})
+        if outcomes.get('revalidated') or outcomes.get('changed'):
+            _warn(f"♻️ Videa kanálů: {outcomes.get('revalidated', 0)} beze změny (304), "
+                  f"{outcomes.get('changed', 0)} změněno")
+        if failed:
+            _warn(f"⚠️ {len(failed)} URL selhalo kvůli dočasným chybám API"
+                  + (f", jsou v {args.failed} pro nové spuštění" if args.failed else ", uložte je pomocí --failed"))
+        _warn(f"✅ Hotovo: {written} řádků, {budget.spent} jednotek kvóty, úloha {journal.job_id}")
+    return 0
+
+
+def rescore_command(args):
+    import time
+
+    from youtube_analyzer.corpus import CorpusStore
+    from youtube_analyzer.keywords import DEFAULT_CLASSIFICATION_WORDS, load_keyword_pack
+
+    if not os.path.exists(args.corpus):
+        _warn(f"⚠️ Uložené texty kanálů {args.corpus} neexistují, nejdřív spusťte analyze")
+        return 2
+    corpus = CorpusStore(args.corpus)
+    try:
+        start = time.perf_counter()
+        classifications, changes = corpus.rescore(load_keyword_pack(args.words, DEFAULT_CLASSIFICATION_WORDS),
+                                                  args.whole_words)
+        elapsed = time.perf_counter() - start
+    finally:
+        corpus.close()
+
+    changes.to_csv(sys.stdout if args.output == '-' else args.output, index=False)
+    if not args.quiet:
+        _warn(f"✅ Přepočítáno {len(classifications)} kanálů za {elapsed * 1000:.0f} ms, "
+              f"kategorie se změnila u {len(changes)}")
+    return 0
+
+
+def history_command(args):
+    from datetime import date
+
+    from youtube_analyzer.results_store import ResultsStore
+
+    store = ResultsStore(args.results_dir)
+    if args.channel is None:
+        for handle in store.runs():
+            print(f"{handle.run_at:%Y-%m-%d %H:%M}  {handle.run_id}  {handle.rows} řádků")
+        return 0
+    since = date.fromisoformat(args.since) if args.since else None
+    history = store.history(args.channel, since)
+    history.to_csv(sys.stdout if args.output == '-' else args.output, index=False)
+    if not args.quiet:
+        _warn(f"{len(history)} řádků z {history['Run ID'].nunique()} běhů")
+    return 0
+
+
+def mock_api_command(args):
+    from youtube_analyzer.mock_api import MockYouTubeAPI
+
+    api = MockYouTubeAPI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                         quota_per_key=args.quota_per_key, channel_count=args.channels,
+                         error_status=args.error_status, retry_after=args.retry_after)
+    _warn(f"Mock YouTube Data API na http://{args.host}:{args.port}/youtube/v3 (ukončení Ctrl+C)")
+    try:
+        api.serve_forever(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    usage = api.usage()
+    _warn(f"Obslouženo {usage['calls']} volání za {usage['units']} jednotek kvóty")
+    return 0
+
+
+def benchmark_command(args):
+    from youtube_analyzer.benchmark import append_results, format_result, run_benchmark
+    from youtube_analyzer.keywords import DEFAULT_CLASSIFICATION_WORDS, load_keyword_pack
+
+    results = run_benchmark(args.sizes, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            max_workers=args.workers, requests_per_second=args.rps,
+                            classification_words=load_keyword_pack(args.words, DEFAULT_CLASSIFICATION_WORDS),
+                            on_result=lambda result: print(format_result(result), flush=True))
+    if args.output:
+        append_results(args.output, results)
+    return 0
+
+
+def build_parser():
+    from youtube_analyzer.cache import DEFAULT_CACHE_PATH
+    from youtube_analyzer.concurrency import DEFAULT_MAX_WORKERS, DEFAULT_REQUESTS_PER_SECOND
+    # Defaults only from modules without third-party imports, so `--help` stays fast
+    from youtube_analyzer.defaults import API_BASE_URL, DEFAULT_CORPUS_PATH, DEFAULT_MAX_RETRIES, DEFAULT_RESULTS_DIR
+    from youtube_analyzer.journal import JOBS_DIR
+    from youtube_analyzer.keywords import CLASSIFICATION_WORDS_PATH
+    from youtube_analyzer.quota import DAILY_QUOTA
+
+    parser = argparse.ArgumentParser(prog='python -m youtube_analyzer',
+                                     description="YouTube Channel Analyzer bez webového rozhraní")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help="Analyzovat URL z CSV souboru")
+    analyze.add_argument('input', help="Vstupní CSV soubor, '-' pro stdin")
+    analyze.add_argument('--url-column', help="Sloupec s YouTube URL (bez něj: jedna URL na řádek)")
+    analyze.add_argument('-o', '--output', default='-', help="Výstupní CSV soubor, '-' pro stdout")
+    analyze.add_argument('--api-key', action='append',
+                         help=f"YouTube Data API klíč, lze opakovat (jinak {API_KEY_ENV} nebo api_key.txt)")
+    analyze.add_argument('--words', default=CLASSIFICATION_WORDS_PATH, help="Soubor s klasifikačními slovy")
+    analyze.add_argument('--whole-words', action='store_true', help="Počítat jen celá slova")
+    analyze.add_argument('--quota-budget', type=int, default=DAILY_QUOTA, help="Rozpočet kvóty (jednotky)")
+    analyze.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help="Souběžné požadavky")
+    analyze.add_argument('--rps', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                         help="Limit požadavků za sekundu")
+    analyze.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                         help="Počet URL analyzovaných a zapsaných najednou")
+    analyze.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Soubor mezipaměti odpovědí API")
+    analyze.add_argument('--no-cache', action='store_true', help="Nepoužívat mezipaměť odpovědí")
+    analyze.add_argument('--corpus', default=DEFAULT_CORPUS_PATH,
+                         help="Soubor s texty kanálů pro přepočet bez volání API (příkaz rescore)")
+    analyze.add_argument('--no-corpus', action='store_true', help="Neukládat texty kanálů")
+    analyze.add_argument('--results-dir', nargs='?', const=DEFAULT_RESULTS_DIR,
+                         help=f"Uložit výsledky i jako Parquet do úložiště běhů (výchozí {DEFAULT_RESULTS_DIR}/)")
+    analyze.add_argument('--job', help="Pokračovat v přerušené úloze s tímto ID")
+    analyze.add_argument('--jobs-dir', default=JOBS_DIR, help="Adresář se záznamy úloh")
+    analyze.add_argument('--api-url', default=API_BASE_URL,
+                         help="Adresa API, např. lokální náhrady z příkazu mock-api")
+    analyze.add_argument('--retries', type=int, default=DEFAULT_MAX_RETRIES,
+                         help="Opakování volání při dočasných chybách API (0 = neopakovat)")
+    analyze.add_argument('--failed', help="Zapsat URL řádků, které selhaly kvůli dočasným chybám, do souboru")
+    analyze.add_argument('--metrics', help="Zapsat metriky běhu do souboru (.json, nebo .prom pro Prometheus)")
+    analyze.add_argument('-q', '--quiet', action='store_true', help="Nevypisovat průběh")
+    analyze.set_defaults(handler=analyze_command)
+
+    rescore = commands.add_parser('rescore', help="Přepočítat uložené kanály s novými klasifikačními slovy")
+    rescore.add_argument('--words', default=CLASSIFICATION_WORDS_PATH, help="Soubor s klasifikačními slovy")
+    rescore.add_argument('--whole-words', action='store_true', help="Počítat jen celá slova")
+    rescore.add_argument('--corpus', default=DEFAULT_CORPUS_PATH, help="Soubor s texty kanálů z analyze")
+    rescore.add_argument('-o', '--output', default='-',
+                         help="CSV kanálů se změněnou kategorií, '-' pro stdout")
+    rescore.add_argument('-q', '--quiet', action='store_true', help="Nevypisovat souhrn")
+    rescore.set_defaults(handler=rescore_command)
+
+    history = commands.add_parser('history', help="Uložené běhy a kategorie kanálu v čase")
+    history.add_argument('--channel', help="Přesný název kanálu nebo URL (bez něj: seznam běhů)")
+    history.add_argument('--since', help="Jen běhy od data RRRR-MM-DD")
+    history.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR, help="Adresář úložiště běhů")
+    history.add_argument('-o', '--output', default='-', help="Výstupní CSV soubor, '-' pro stdout")
+    history.add_argument('-q', '--quiet', action='store_true', help="Nevypisovat souhrn")
+    history.set_defaults(handler=history_command)
+
+    mock_api = commands.add_parser('mock-api', help="Spustit lokální náhradu YouTube Data API")
+    mock_api.add_argument('--host', default='127.0.0.1')
+    mock_api.add_argument('--port', type=int, default=8765)
+    mock_api.add_argument('--channels', type=int, default=1000, help="Počet syntetických kanálů")
+    mock_api.add_argument('--quota-per-key', type=int, help="Denní kvóta každého klíče (jinak neomezeno)")
+    _add_simulation_arguments(mock_api)
+    mock_api.add_argument('--error-status', type=int, choices=[500, 503, 429], default=500,
+                          help="Stav simulovaných chyb")
+    mock_api.add_argument('--retry-after', type=int, help="Hlavička Retry-After (s) u chyb 503 a 429")
+    mock_api.set_defaults(handler=mock_api_command)
+
+    benchmark = commands.add_parser('benchmark', help="Změřit propustnost proti lokální náhradě API")
+    benchmark.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help="Počty URL")
+    benchmark.add_argument('--words', default=CLASSIFICATION_WORDS_PATH, help="Soubor s klasifikačními slovy")
+    benchmark.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help="Souběžné požadavky")
+    benchmark.add_argument('--rps', type=float, help="Limit požadavků za sekundu (jinak bez limitu)")
+    benchmark.add_argument('-o', '--output', help="Připojit výsledky jako JSON řádky do souboru")
+    _add_simulation_arguments(benchmark, latency=0.02)
+    benchmark.set_defaults(handler=benchmark_command)
+    return parser
+
+
+def _add_simulation_arguments(parser, latency=0.0):
+    parser.add_argument('--latency', type=float, default=latency, help="Zpoždění každé odpovědi (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Náhodné zpoždění navíc, až (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Podíl chybových odpovědí (0–1)")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
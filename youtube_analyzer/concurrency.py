@@ -0,0 +1,163 @@
+"""Bounded thread pool execution, token-bucket rate limiting and staged pipelines"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_REQUESTS_PER_SECOND = 10
+
+# Items waiting between two pipeline stages
+DEFAULT_QUEUE_SIZE = 2
+
+# Marks the end of a stage's output
+_END = object()
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second
+
+    Up to `capacity` tokens accumulate while idle, so short bursts are not
+    delayed while the long-run rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """Change the long-run rate, e.g. when the setting of a shared limiter changes"""
+        with self._lock:
+            self.rate = rate
+            self.capacity = max(rate, 1)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` tokens are available and take them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def run_ordered(func, items, max_workers=DEFAULT_MAX_WORKERS, on_progress=None, return_exceptions=False):
+    """Run func(item) on a bounded thread pool and return the results in input order
+
+    on_progress(done, total) is called from the calling thread, so it may
+    update Streamlit elements. With return_exceptions=True a failed item's
+    exception is returned in its place, otherwise the first failure is raised
+    and pending items are cancelled.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    try:
+        futures = {executor.submit(func, item): index for index, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[index] = e
+            if on_progress:
+                on_progress(done, len(items))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results
+
+
+def batches(items, size):
+    """Consecutive lists of at most `size` items from any iterable"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _Failure:
+    """Exception of a stage, passed down to the consumer in place of an item"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def run_stages(source, stages, maxsize=DEFAULT_QUEUE_SIZE):
+    """Pass every item of `source` through `stages` in order, each stage on its own thread
+
+    Stages are connected by queues of at most `maxsize` items, so a fast
+    stage waits for a slow one instead of piling up work, and memory stays
+    bounded however long `source` is; `source` itself is read lazily by the
+    first stage. Yields the output of the last stage in source order. The
+    first exception of a stage or of `source` is raised here; closing the
+    generator stops every stage after its current item.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=maxsize) for _ in stages]
+
+    def put(outbox, item):
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(inbox):
+        while True:
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return _END
+
+    def work(position, stage):
+        outbox = queues[position]
+        try:
+            items = iter(source) if position == 0 else None
+            while not stop.is_set():
+                item = next(items, _END) if position == 0 else get(queues[position - 1])
+                if item is _END or isinstance(item, _Failure):
+                    put(outbox, item)
+                    return
+                if not put(outbox, stage(item)):
+                    return
+        except BaseException as e:
+            put(outbox, _Failure(e))
+
+    threads = [
+        threading.Thread(target=work, args=(position, stage), daemon=True,
+                         name=f"stage-{getattr(stage, '__name__', position)}")
+        for position, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
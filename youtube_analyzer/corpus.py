@@ -0,0 +1,240 @@
+"""Compact store of analyzed channel texts for re-scoring without API calls
+
+Every analyzed channel keeps its classification text (zlib-compressed),
+title and current scores, and every canonical entity key keeps the channel
+it resolved to. When the classification words change, rescore() scores
+all stored texts again and reports which channels changed category, and
+rescore_rows() refreshes existing result rows by URL.
+
+Occurrences of every keyword counted so far are kept in memory per channel,
+so after an edit only the added keywords are counted, with str.count (or
+one regex per keyword with word boundaries) instead of a pass of the
+matcher over every text. Only texts not counted yet (first re-scoring in a
+process, new channels) get the full matcher pass.
+"""
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from youtube_analyzer.cache import DAY
+from youtube_analyzer.defaults import DEFAULT_CORPUS_PATH
+from youtube_analyzer.keywords import keyword_matcher
+from youtube_analyzer.scoring import TermCounts, classify_scores, score_matrix
+from youtube_analyzer.urls import canonical_key, canonicalize_url
+
+# Channels not seen in any run for this long are dropped
+CORPUS_MAX_AGE = 90 * DAY
+
+# With more keywords to count than this, one matcher pass beats counting each
+MAX_SEPARATE_KEYWORDS = 8
+
+CHANGE_COLUMNS = ['Channel ID', 'Channel Title', 'Old Category', 'New Category']
+
+SCORE_COLUMNS = {
+    'kids': 'Kids %',
+    'teen': 'Teen %',
+    'serious': 'Serious %',
+    'primary_category': 'Primary Category'
+}
+
+
+@lru_cache(maxsize=4096)
+def keyword_counter(keyword, word_boundary=False):
+    """Function counting non-overlapping occurrences of a keyword in lowercased text, as KeywordMatcher does"""
+    if not word_boundary:
+        return lambda text: text.count(keyword)
+    # \w is exactly str.isalnum() or '_', the matcher's word characters
+    pattern = re.compile(r'(?<!\w)' + re.escape(keyword) + r'(?!\w)')
+    return lambda text: len(pattern.findall(text)) if keyword in text else 0
+
+
+class _Terms:
+    """Keyword occurrences counted in one stored text: the keywords counted and the non-zero counts"""
+
+    __slots__ = ('updated_at', 'length', 'counted', 'counts')
+
+    def __init__(self, updated_at, length):
+        self.updated_at = updated_at
+        self.length = length
+        self.counted = frozenset()
+        self.counts = {}
+
+
+class CorpusStore:
+    """SQLite store of channel texts shared by all threads behind a lock"""
+
+    def __init__(self, path=DEFAULT_CORPUS_PATH, max_age=CORPUS_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._rescore_lock = threading.Lock()
+        self._terms = {}        # {(channel_id, word_boundary): _Terms}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS channels (
+                    channel_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    text BLOB NOT NULL,
+                    kids INTEGER NOT NULL,
+                    teen INTEGER NOT NULL,
+                    serious INTEGER NOT NULL,
+                    primary_category TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS entities (
+                    key TEXT PRIMARY KEY,
+                    channel_id TEXT NOT NULL
+                )
+            ''')
+
+    def record(self, entity_channels, channels, texts, classifications):
+        """Store the texts and scores of classified channels and the entities resolved to them"""
+        now = time.time()
+        rows = []
+        for channel_id, text in texts.items():
+            classification = classifications.get(channel_id)
+            if classification is None:
+                continue
+            rows.append((
+                channel_id, channels[channel_id]['snippet']['title'], zlib.compress(text.encode('utf-8')),
+                int(classification['kids']), int(classification['teen']), int(classification['serious']),
+                classification['primary_category'], now
+            ))
+        entities = [(key, channel_id) for key, channel_id in entity_channels.items() if channel_id in classifications]
+        if not rows and not entities:
+            return
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('INSERT OR REPLACE INTO channels VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.executemany('INSERT OR REPLACE INTO entities VALUES (?, ?)', entities)
+            self._conn.execute('DELETE FROM channels WHERE updated_at < ?', [now - self.max_age])
+            self._conn.execute('DELETE FROM entities WHERE channel_id NOT IN (SELECT channel_id FROM channels)')
+            self._conn.execute('COMMIT')
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM channels').fetchone()[0]
+
+    def entity_channels(self):
+        """{entity key: channel_id} of every stored entity"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT key, channel_id FROM entities').fetchall())
+
+    def rescore(self, classification_words, word_boundary=False):
+        """Score every stored text with new words, store the scores and return them
+
+        Returns ({channel_id: classification}, changes) where `changes` is a
+        DataFrame of channels whose primary category changed.
+        """
+        matcher = keyword_matcher(classification_words, word_boundary)
+        wanted = frozenset(matcher.keywords)
+        columns = {keyword: column for column, keyword in enumerate(matcher.keywords)}
+        with self._lock:
+            stored = self._conn.execute(
+                'SELECT channel_id, title, primary_category, updated_at, text FROM channels'
+            ).fetchall()
+        if not stored:
+            return {}, pd.DataFrame(columns=CHANGE_COLUMNS)
+
+        with self._rescore_lock:
+            lengths = self._count_missing(stored, matcher, wanted)
+            rows, cols, counts = [], [], []
+            for row, (channel_id, *_) in enumerate(stored):
+                for keyword, occurrences in self._terms[channel_id, word_boundary].counts.items():
+                    column = columns.get(keyword)
+                    if column is not None:
+                        rows.append(row)
+                        cols.append(column)
+                        counts.append(occurrences)
+
+        matrix = TermCounts(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                            np.asarray(counts, dtype=np.int64), (len(stored), len(matcher.keywords)))
+        channel_ids = [row[0] for row in stored]
+        scored = classify_scores(score_matrix(matrix, matcher, lengths), np.ones(len(stored), dtype=bool))
+        scored.index = channel_ids
+
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                'UPDATE channels SET kids = ?, teen = ?, serious = ?, primary_category = ? WHERE channel_id = ?',
+                zip(scored['kids'].tolist(), scored['teen'].tolist(), scored['serious'].tolist(),
+                    scored['primary_category'].tolist(), channel_ids)
+            )
+            self._conn.execute('COMMIT')
+
+        changes = pd.DataFrame({
+            'Channel ID': channel_ids,
+            'Channel Title': [row[1] for row in stored],
+            'Old Category': [row[2] for row in stored],
+            'New Category': scored['primary_category'].tolist()
+        })
+        changes = changes[changes['Old Category'] != changes['New Category']].reset_index(drop=True)
+        return scored.to_dict('index'), changes
+
+    def _count_missing(self, stored, matcher, wanted):
+        """Count the wanted keywords not yet counted in each stored text; returns the text lengths"""
+        word_boundary = matcher.word_boundary
+        lengths = np.zeros(len(stored), dtype=np.int64)
+        # Texts counted together share their frozenset of counted keywords
+        unions = {}
+        for row, (channel_id, _, _, updated_at, blob) in enumerate(stored):
+            terms = self._terms.get((channel_id, word_boundary))
+            text = None
+            if terms is None or terms.updated_at != updated_at:
+                # New channel or a text replaced by a later run
+                text = zlib.decompress(blob).decode('utf-8').lower()
+                terms = self._terms[channel_id, word_boundary] = _Terms(updated_at, len(text))
+            lengths[row] = terms.length
+            missing = wanted - terms.counted
+            if missing:
+                if text is None:
+                    text = zlib.decompress(blob).decode('utf-8').lower()
+                if len(missing) > MAX_SEPARATE_KEYWORDS:
+                    for keyword_id, occurrences in matcher.keyword_counts(text).items():
+                        if matcher.keywords[keyword_id] in missing:
+                            terms.counts[matcher.keywords[keyword_id]] = occurrences
+                else:
+                    for keyword in missing:
+                        occurrences = keyword_counter(keyword, word_boundary)(text)
+                        if occurrences:
+                            terms.counts[keyword] = occurrences
+                counted = terms.counted | missing
+                terms.counted = unions.setdefault(counted, counted)
+
+        # Forget channels pruned from the store
+        present = {row[0] for row in stored}
+        for key in [key for key in self._terms if key[0] not in present]:
+            del self._terms[key]
+        return lengths
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def rescore_rows(rows, classifications, entity_channels):
+    """Result rows with the scores of their channels replaced by new classifications
+
+    Rows are matched to channels by their canonical URL; rows of channels
+    that aren't in the store are returned unchanged.
+    """
+    rescored = []
+    for row in rows:
+        extracted = canonicalize_url(row['URL'])
+        channel_id = entity_channels.get(canonical_key(extracted)) if extracted else None
+        classification = classifications.get(channel_id)
+        if classification is None:
+            rescored.append(row)
+            continue
+        rescored.append({**row, **{column: classification[name] for name, column in SCORE_COLUMNS.items()}})
+    return rescored
@@ -0,0 +1,13 @@
+"""Default paths and settings shared by the modules and the command line
+
+Kept free of third-party imports, so building the argument parser doesn't
+load numpy, pandas, pyarrow or requests.
+"""
+
+API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+DEFAULT_MAX_RETRIES = 4
+
+DEFAULT_CORPUS_PATH = 'channel_corpus.sqlite'
+
+DEFAULT_RESULTS_DIR = 'results'
@@ -0,0 +1,46 @@
+"""googleapiclient YouTube client built once, offline, on a pooled HTTP session
+
+build() normally parses a discovery document and creates a new httplib2
+stack for every client, and httplib2.Http objects must not be shared
+between threads. build_client() builds from the discovery document bundled
+with google-api-python-client (no network) and sends every request through
+PooledHttp, an httplib2-compatible adapter over a thread-safe requests
+Session, so one client per API key can serve all sessions and threads.
+"""
+import httplib2
+from googleapiclient.discovery import build
+
+from youtube_analyzer.concurrency import DEFAULT_MAX_WORKERS
+from youtube_analyzer.transport import pooled_session
+
+
+class PooledHttp:
+    """The part of httplib2.Http that googleapiclient uses, over a keep-alive connection pool"""
+
+    def __init__(self, pool_size=DEFAULT_MAX_WORKERS, timeout=30):
+        self.timeout = timeout
+        self.session = pooled_session(pool_size)
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout,
+                                        allow_redirects=redirections > 0)
+        content = response.content
+        # requests has already decoded gzip, so the content is passed on as plain bytes
+        info = {name.lower(): value for name, value in response.headers.items()
+                if name.lower() not in ('content-encoding', 'content-length')}
+        info['content-length'] = str(len(content))
+        info['status'] = str(response.status_code)
+        return httplib2.Response(info), content
+
+    def close(self):
+        self.session.close()
+
+
+def build_client(api_key, http=None, api_endpoint=None):
+    """YouTube Data API v3 client from the bundled discovery document
+
+    `api_endpoint` points the client elsewhere, e.g. at MockYouTubeAPI.
+    """
+    return build('youtube', 'v3', developerKey=api_key, http=http or PooledHttp(),
+                 static_discovery=True, cache_discovery=False,
+                 client_options={'api_endpoint': api_endpoint} if api_endpoint else None)
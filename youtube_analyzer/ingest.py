@@ -0,0 +1,125 @@
+"""Column-projected reading of large, possibly compressed CSV uploads
+
+Google Ads placement reports run to hundreds of megabytes with dozens of
+columns. sniff_csv() reads only the start of a file to find the delimiter,
+the encoding, the header row below any report title lines, and a preview.
+read_column() then parses the file in chunks of rows and converts only the
+chosen column (usecols), so memory follows the chunk size rather than the
+file size. Uploads may be plain CSV or gzip or zip compressed, and are
+decompressed as they are read. An upload is bytes or a seekable binary file,
+such as Streamlit's UploadedFile, which is read in place rather than copied.
+
+pandas' C parser is used rather than pyarrow's streaming reader: fed from a
+decompressing stream, the latter reads ahead of a slower consumer without
+bound.
+"""
+import codecs
+import csv
+import gzip
+import io
+import zipfile
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Rows parsed at a time
+CHUNK_ROWS = 20000
+
+# Bytes looked at to find the layout
+SNIFF_BYTES = 64 * 1024
+
+PREVIEW_ROWS = 5
+
+# Leading lines looked at to find the delimiter and the header
+SNIFF_LINES = 50
+
+DELIMITERS = ',;\t|'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+
+# How to parse an upload, found from its first block
+CsvLayout = namedtuple('CsvLayout', ['columns', 'preview', 'delimiter', 'skip_rows', 'encoding'])
+
+
+@contextmanager
+def open_upload(upload):
+    """Binary stream of an upload's CSV content from its start; gzip and zip uploads are decompressed on the fly
+
+    A file upload is left open, so it can be read again.
+    """
+    if isinstance(upload, (bytes, bytearray)):
+        upload = io.BytesIO(upload)
+    upload.seek(0)
+    magic = upload.read(4)
+    upload.seek(0)
+    if magic[:2] == GZIP_MAGIC:
+        with gzip.GzipFile(fileobj=upload) as f:
+            yield f
+    elif magic == ZIP_MAGIC:
+        archive = zipfile.ZipFile(upload)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if not members:
+            raise ValueError("Archiv ZIP je prázdný")
+        # The first CSV member, or the first file of an archive without one
+        csv_members = [info for info in members if info.filename.lower().endswith('.csv')]
+        with archive.open((csv_members or members)[0]) as f:
+            yield f
+    else:
+        yield upload
+
+
+def _encoding(head):
+    # Excel-flavoured Google Ads exports are UTF-16 with a BOM; a UTF-8 BOM is skipped by the parser
+    return 'utf-16' if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) else 'utf-8'
+
+
+def _sniff_layout(lines):
+    """(delimiter, header line number): the delimiter splitting most lines into the same number of fields
+
+    Report exports start with a title and a date range above the header;
+    the header is the first line with that number of fields.
+    """
+    best = (0, ',', 0)
+    for delimiter in DELIMITERS:
+        widths = [len(row) for row in csv.reader(lines, delimiter=delimiter)]
+        counts = Counter(width for width in widths if width > 1)
+        if counts:
+            width, lines_of_width = counts.most_common(1)[0]
+            if lines_of_width > best[0]:
+                best = (lines_of_width, delimiter, widths.index(width))
+    return best[1], best[2]
+
+
+def _read_csv(stream, layout, **options):
+    # Summary lines of reports have fewer fields and come out empty; lines with extra fields are skipped
+    return pd.read_csv(stream, sep=layout.delimiter, skiprows=layout.skip_rows, encoding=layout.encoding,
+                       dtype=str, on_bad_lines='skip', **options)
+
+
+def sniff_csv(upload, preview_rows=PREVIEW_ROWS):
+    """CsvLayout of an upload with its column names and first rows, reading only its start"""
+    with open_upload(upload) as f:
+        head = f.read(SNIFF_BYTES)
+    encoding = _encoding(head)
+    text = head.decode('utf-16' if encoding == 'utf-16' else 'utf-8-sig', errors='ignore')
+    lines = text.splitlines()
+    if len(head) == SNIFF_BYTES:
+        lines = lines[:-1]      # cut short
+    delimiter, skip_rows = _sniff_layout(lines[:SNIFF_LINES])
+    layout = CsvLayout(None, None, delimiter, skip_rows, encoding)
+    with open_upload(upload) as f:
+        preview = _read_csv(f, layout, nrows=preview_rows)
+    return layout._replace(columns=list(preview.columns), preview=preview)
+
+
+def read_column(upload, column, layout, chunk_rows=CHUNK_ROWS):
+    """Stripped, non-empty values of one column, parsed `chunk_rows` rows at a time"""
+    with open_upload(upload) as f:
+        for chunk in _read_csv(f, layout, usecols=[column], chunksize=chunk_rows):
+            for value in chunk[column].tolist():
+                if isinstance(value, str):
+                    value = value.strip()
+                    if value and value != 'nan':
+                        yield value
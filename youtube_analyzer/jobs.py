@@ -0,0 +1,143 @@
+"""Process-wide background runner for analysis jobs
+
+Jobs run on the runner's own threads, so a Streamlit rerun, a widget click
+or a browser reconnect doesn't stop them. Any session can look a job up by
+ID, poll its progress and partial results, or cancel it.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+PAUSED = 'paused'          # stopped by quota, resumable from its journal
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+FINISHED = {DONE, PAUSED, CANCELLED, FAILED}
+
+# Partial result rows a job keeps for display; all rows go to the job's sink
+RECENT_ROWS = 200
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation was requested"""
+
+
+class Job:
+    """State of one background job, written by its thread and read by any session"""
+
+    def __init__(self, job_id, label='', total=0):
+        self.id = job_id
+        self.label = label
+        self.status = QUEUED
+        self.stage = ''
+        self.total = total
+        self.done = 0
+        # The most recent result rows, and counts over all of them
+        self.results = []
+        self.rows = 0
+        self.categories = {}
+        self.errors = []
+        # URLs of rows left without a result by transient API failures, to be analyzed again
+        self.failed = []
+        self.summary = {}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 0.0
+
+    def cancel(self):
+        """Ask the job to stop at its next check"""
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def add_results(self, results, done):
+        """Count partial results, keep the most recent ones and count `done` more input rows as processed"""
+        with self._lock:
+            # New objects, so readers on other threads never see them change
+            self.results = (self.results + list(results))[-RECENT_ROWS:]
+            categories = dict(self.categories)
+            for row in results:
+                category = row.get('Primary Category')
+                if category is not None:
+                    categories[category] = categories.get(category, 0) + 1
+            self.categories = categories
+            self.rows += len(results)
+            self.done += done
+
+
+class JobRunner:
+    """Queue of jobs run `max_concurrent` at a time on background threads
+
+    Only the last `keep` finished jobs are kept in memory; their journals
+    stay on disk.
+    """
+
+    def __init__(self, max_concurrent=2, keep=20):
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='analysis-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job, target):
+        """Queue target(job); the job's status is managed around the call"""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_old()
+        self._executor.submit(self._run, job, target)
+        return job
+
+    def _run(self, job, target):
+        if job._cancel.is_set():
+            job.status = CANCELLED
+            job.finished = time.time()
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            target(job)
+            if job.status == RUNNING:
+                job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.errors.append(f"❌ Úloha selhala: {str(e)}")
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _forget_old(self):
+        finished = sorted((job for job in self._jobs.values() if job.is_finished), key=lambda job: job.created)
+        for job in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """All known jobs, newest first"""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created, reverse=True)
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,235 @@
+"""Append-only journals of analysis jobs, resumable by job ID
+
+Each job is one JSON-lines file in `jobs/`. Every stage appends what it
+finished as soon as it finishes: video -> channel resolutions, fetched
+channels, channel texts (built from the fetched recent videos) and result
+rows. Replaying the file restores all of it, so a run stopped by quota
+exhaustion continues the next day at the first unfinished entity and never
+pays for finished work again. A finished job is compacted to its header
+and result rows.
+
+The input URLs are stored in chunks and read back from the file by
+iter_urls(), so a job over millions of rows never holds them in memory.
+"""
+import json
+import os
+import secrets
+import threading
+from datetime import datetime
+
+from youtube_analyzer.concurrency import batches
+
+JOBS_DIR = 'jobs'
+
+# URLs per journal record
+URL_CHUNK_SIZE = 10000
+
+# Prefix of URL records as json.dumps writes them, so reading them back skips other lines unparsed
+URLS_PREFIX = '{"type": "urls"'
+
+
+def new_job_id():
+    """Sortable, unique job ID such as 20240131-142501-a3f9c2"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def journal_path(job_id, jobs_dir=JOBS_DIR):
+    return os.path.join(jobs_dir, f"{job_id}.jsonl")
+
+
+class JobJournal:
+    """Replayed state of one job plus an append handle for new records
+
+    `results` maps canonical entity keys to result rows and can be passed
+    to analyze_rows as `known`. Records are appended by worker threads, so
+    writes are serialized by a lock and flushed one line at a time.
+    """
+
+    def __init__(self, job_id, jobs_dir=JOBS_DIR):
+        self.job_id = job_id
+        self.path = journal_path(job_id, jobs_dir)
+        self.header = {}
+        self.has_urls = False
+        self.status = 'running'
+        self.resolved = {}      # entity key -> channel ID
+        self.channels = {}      # channel ID -> channels.list item
+        self.texts = {}         # channel ID -> channel text
+        self.results = {}       # entity key -> result row without URL
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def create(cls, urls=None, source=None, jobs_dir=JOBS_DIR, job_id=None):
+        """Start a new job; `urls` are stored so the job can be resumed without its input
+
+        `urls` may be any iterable, such as a column streamed from a file; it
+        is read once, a chunk at a time.
+        """
+        os.makedirs(jobs_dir, exist_ok=True)
+        journal = cls(job_id or new_job_id(), jobs_dir)
+        journal.header = {
+            'type': 'job', 'id': journal.job_id, 'created': datetime.now().isoformat(timespec='seconds'),
+            'source': source, 'total': None
+        }
+        journal._append(journal.header)
+        if urls is not None:
+            journal.record_urls(urls)
+        return journal
+
+    def record_urls(self, urls):
+        """Store the job's input URLs chunk by chunk, then the header again with their count
+
+        Replaying takes the last header, so the count is known without
+        counting the URL records.
+        """
+        total = 0
+        for chunk in batches(urls, URL_CHUNK_SIZE):
+            self._append({'type': 'urls', 'urls': chunk})
+            total += len(chunk)
+        self.has_urls = True
+        self.header = {**self.header, 'total': total}
+        self._append(self.header)
+
+    def iter_urls(self):
+        """The job's input URLs, read back from the journal a chunk at a time"""
+        if not self.has_urls:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(URLS_PREFIX):
+                    yield from json.loads(line)['urls']
+
+    @property
+    def urls(self):
+        """All input URLs as a list, or None when the job has none stored"""
+        return list(self.iter_urls()) if self.has_urls else None
+
+    @classmethod
+    def open(cls, job_id, jobs_dir=JOBS_DIR):
+        """Replay an existing job's journal, raising FileNotFoundError for an unknown ID"""
+        journal = cls(job_id, jobs_dir)
+        with open(journal.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash is dropped, its work is redone
+                    continue
+                journal._apply(record)
+        return journal
+
+    def _apply(self, record):
+        kind = record.get('type')
+        if kind == 'job':
+            self.header = record
+        elif kind == 'urls':
+            # Left on disk, see iter_urls()
+            self.has_urls = True
+        elif kind == 'resolved':
+            self.resolved.update(record['entities'])
+        elif kind == 'channels':
+            self.channels.update(record['channels'])
+        elif kind == 'text':
+            self.texts[record['channel_id']] = record['text']
+        elif kind == 'results':
+            self.results.update(record['results'])
+        elif kind == 'status':
+            self.status = record['status']
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+
+    def record_resolved(self, entity_channels):
+        """Entity keys resolved to channel IDs"""
+        if entity_channels:
+            self.resolved.update(entity_channels)
+            self._append({'type': 'resolved', 'entities': entity_channels})
+
+    def record_channels(self, channels):
+        """Fetched channels.list items by channel ID"""
+        if channels:
+            self.channels.update(channels)
+            self._append({'type': 'channels', 'channels': channels})
+
+    def record_text(self, channel_id, text):
+        """Text of a channel whose recent videos were fetched"""
+        self.texts[channel_id] = text
+        self._append({'type': 'text', 'channel_id': channel_id, 'text': text})
+
+    def record_results(self, results):
+        """Classified result rows by entity key"""
+        if results:
+            self.results.update(results)
+            self._append({'type': 'results', 'results': results})
+
+    def finish(self):
+        """Mark the job done and compact its journal"""
+        self.status = 'done'
+        self.compact()
+
+    def compact(self):
+        """Rewrite the journal as header, URLs, results and only the partial work still needed"""
+        finished_channels = {key.split(':', 1)[1] for key in self.results if key.startswith('channel:')}
+        records = [self.header]
+        pending = {key: channel_id for key, channel_id in self.resolved.items() if key not in self.results}
+        if pending:
+            records.append({'type': 'resolved', 'entities': pending})
+        channels = {cid: item for cid, item in self.channels.items() if cid not in finished_channels}
+        if channels:
+            records.append({'type': 'channels', 'channels': channels})
+        for channel_id, text in self.texts.items():
+            if channel_id not in finished_channels:
+                records.append({'type': 'text', 'channel_id': channel_id, 'text': text})
+        if self.results:
+            records.append({'type': 'results', 'results': self.results})
+        records.append({'type': 'status', 'status': self.status})
+
+        temporary = self.path + '.tmp'
+        with self._lock:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(records[0], ensure_ascii=False) + '\n')
+                # URL records are copied line by line, never parsed
+                if self.has_urls:
+                    with open(self.path, 'r', encoding='utf-8') as journal_file:
+                        f.writelines(line for line in journal_file if line.startswith(URLS_PREFIX))
+                for record in records[1:]:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(temporary, self.path)
+        self.resolved = pending
+        self.channels = channels
+        self.texts = {cid: text for cid, text in self.texts.items() if cid not in finished_channels}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def list_jobs(jobs_dir=JOBS_DIR):
+    """Headers of all journaled jobs, newest first, each with its 'status'"""
+    if not os.path.isdir(jobs_dir):
+        return []
+    jobs = []
+    for name in sorted(os.listdir(jobs_dir), reverse=True):
+        if not name.endswith('.jsonl'):
+            continue
+        header, status = None, 'running'
+        with open(os.path.join(jobs_dir, name), 'r', encoding='utf-8') as f:
+            for line in f:
+                # Only the small header and status records are parsed
+                if line.startswith('{"type": "job"'):
+                    header = json.loads(line)
+                elif line.startswith('{"type": "status"'):
+                    status = json.loads(line)['status']
+        if header:
+            jobs.append({**header, 'status': status})
+    return jobs
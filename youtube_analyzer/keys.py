@@ -0,0 +1,97 @@
+"""Pool of API keys with per-key daily quota accounting and rotation"""
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from youtube_analyzer.quota import DAILY_QUOTA, QUOTA_EXCEEDED_MESSAGE, QuotaExceeded, call_cost
+
+# YouTube Data API quotas reset at midnight Pacific Time
+try:
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except ZoneInfoNotFoundError:
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+def quota_day():
+    """Date of the current quota day"""
+    return datetime.now(QUOTA_TIMEZONE).date()
+
+
+def mask_key(key):
+    """Show only the end of a key, e.g. '…x7Qa'"""
+    return f"…{key[-4:]}"
+
+
+class KeyPool:
+    """API keys of several projects, each with its own daily quota
+
+    Every call is routed to the key with the most estimated headroom and
+    charged the endpoint's known cost. A key answered with quotaExceeded is
+    set aside until the next quota day, so throughput grows with each key.
+    One pool is meant to be shared by all sessions of a process.
+    """
+
+    def __init__(self, keys, daily_quota=DAILY_QUOTA):
+        self.keys = list(dict.fromkeys(key for key in keys if key))
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._reset(quota_day())
+
+    def _reset(self, day):
+        self._day = day
+        self._spent = {key: 0 for key in self.keys}
+        self._calls = {key: 0 for key in self.keys}
+        self._exhausted = set()
+
+    def _roll_over(self):
+        day = quota_day()
+        if day != self._day:
+            self._reset(day)
+
+    def acquire(self, endpoint):
+        """Pick the key with the most headroom for one call and charge it
+
+        Raises QuotaExceeded when every key has run out for today.
+        """
+        cost = call_cost(endpoint)
+        with self._lock:
+            self._roll_over()
+            available = [key for key in self.keys if key not in self._exhausted]
+            if not available:
+                raise QuotaExceeded(QUOTA_EXCEEDED_MESSAGE)
+            key = max(available, key=lambda key: self.daily_quota - self._spent[key])
+            self._spent[key] += cost
+            self._calls[key] += 1
+        return key
+
+    def mark_exhausted(self, key):
+        """Set a key aside for the rest of the quota day"""
+        with self._lock:
+            self._roll_over()
+            self._exhausted.add(key)
+
+    @property
+    def available(self):
+        with self._lock:
+            self._roll_over()
+            return len(self.keys) - len(self._exhausted)
+
+    def usage(self):
+        """Per-key estimated usage for today, in pool order"""
+        with self._lock:
+            self._roll_over()
+            return [
+                {
+                    'key': mask_key(key),
+                    'calls': self._calls[key],
+                    'spent': self._spent[key],
+                    'remaining': 0 if key in self._exhausted else max(self.daily_quota - self._spent[key], 0),
+                    'exhausted': key in self._exhausted
+                }
+                for key in self.keys
+            ]
+
+
+def split_keys(text):
+    """API keys from text with one key per line or comma-separated"""
+    return [key.strip() for line in text.splitlines() for key in line.split(',') if key.strip()]
@@ -0,0 +1,103 @@
+"""Compiled classification keyword packs shared by all sessions of a process"""
+import hashlib
+import json
+import os
+import threading
+
+from youtube_analyzer.matcher import KeywordMatcher, compile_matcher, flatten_keywords
+
+CLASSIFICATION_WORDS_PATH = 'classification_words.json'
+
+# Used when the words file is missing or unreadable
+DEFAULT_CLASSIFICATION_WORDS = {
+    'kids': ['kids', 'children', 'toys', 'cartoon', 'animation', 'disney', 'nursery', 'děti', 'dětský', 'hračky', 'pohádky', 'animace', 'animovaný', 'kreslený', 'detský', 'rozprávky', 'detské'],
+    'teen': ['teen', 'gaming', 'minecraft', 'fortnite', 'tiktok', 'challenge', 'prank', 'vlog', 'youtuberi', 'youtuber', 'gaming', 'hry', 'challenge', 'výzva', 'teenage', 'teenageři', 'mladí', 'mládež'],
+    'serious': ['news', 'business', 'science', 'technology', 'education', 'documentary', 'research', 'university', 'zprávy', 'věda', 'technologie', 'vzdělávání', 'univerzita', 'výzkum', 'business', 'správy', 'veda', 'technológie', 'vzdelávanie', 'univerzita', 'výskum']
+}
+
+
+class KeywordPack:
+    """Classification words compiled once: normalized keywords, matchers and a category index"""
+
+    def __init__(self, words, digest=None):
+        self.words = words
+        self.digest = digest
+        self.keywords = {
+            category: [keyword.lower() for keyword in keywords]
+            for category, keywords in flatten_keywords(words).items()
+        }
+        self.index = {}
+        for category, keywords in self.keywords.items():
+            for keyword in keywords:
+                categories = self.index.setdefault(keyword, [])
+                if category not in categories:
+                    categories.append(category)
+        self._matchers = {False: KeywordMatcher(self.keywords)}
+        self._lock = threading.Lock()
+
+    def matcher(self, word_boundary=False):
+        if word_boundary not in self._matchers:
+            with self._lock:
+                if word_boundary not in self._matchers:
+                    self._matchers[word_boundary] = KeywordMatcher(self.keywords, word_boundary)
+        return self._matchers[word_boundary]
+
+    def count(self, text, word_boundary=False):
+        """Keyword occurrences per category in lowercased text"""
+        return self.matcher(word_boundary).count(text)
+
+
+def keyword_matcher(classification_words, word_boundary=False):
+    """Matcher for a KeywordPack or a plain {category: keywords} dict"""
+    if isinstance(classification_words, KeywordPack):
+        return classification_words.matcher(word_boundary)
+    return compile_matcher(classification_words, word_boundary)
+
+
+# path -> ((mtime_ns, size) or None, KeywordPack)
+_packs = {}
+_packs_lock = threading.Lock()
+
+
+def load_keyword_pack(path=CLASSIFICATION_WORDS_PATH, default_words=None):
+    """Return the compiled pack for a words file, rebuilt only when the file changes
+
+    The file is re-read only when its mtime or size differs from the cached
+    pack, and recompiled only when its content hash differs too. A missing
+    or unreadable file yields a pack of `default_words`.
+    """
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        stamp = None
+
+    with _packs_lock:
+        cached = _packs.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        pack = None
+        if stamp is not None:
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()
+                if cached and cached[1].digest == digest:
+                    pack = cached[1]
+                else:
+                    pack = KeywordPack(json.loads(content.decode('utf-8')), digest)
+            except (OSError, ValueError):
+                pack = None
+
+        if pack is None:
+            pack = KeywordPack(default_words or {})
+
+        _packs[path] = (stamp, pack)
+        return pack
+
+
+def invalidate_keyword_pack(path=CLASSIFICATION_WORDS_PATH):
+    """Drop the cached pack so the next load recompiles the file"""
+    with _packs_lock:
+        _packs.pop(path, None)
@@ -0,0 +1,144 @@
+"""Aho-Corasick multi-keyword matching for channel classification"""
+from collections import deque
+from functools import lru_cache
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def flatten_keywords(classification_words):
+    """Return {category: [keyword, ...]}, merging per-language lists if present"""
+    categories = {}
+    for category, keywords in classification_words.items():
+        if isinstance(keywords, dict):
+            keywords = [keyword for language_keywords in keywords.values() for keyword in language_keywords]
+        categories[category] = list(keywords)
+    return categories
+
+
+class KeywordMatcher:
+    """Finds the keywords of all categories in a single pass over a text
+
+    Keywords are lowercased and compiled into one automaton. A keyword listed
+    twice, or in two categories, counts once for every listing, exactly like
+    looping over the keyword lists. Occurrences of one keyword are counted
+    without overlaps, as re.findall does. With word_boundary=True a match only
+    counts when it is not part of a longer word ("teen" in "canteen").
+    """
+
+    def __init__(self, categories, word_boundary=False):
+        self.categories = list(categories)
+        self.word_boundary = word_boundary
+        self.keywords = []
+        self.weights = []
+        self.empty_weights = {}
+
+        index = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    self.empty_weights[category] = self.empty_weights.get(category, 0) + 1
+                    continue
+                if keyword not in index:
+                    index[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self.weights.append({})
+                weights = self.weights[index[keyword]]
+                weights[category] = weights.get(category, 0) + 1
+
+        self._build()
+
+    def _build(self):
+        # Trie of all keywords
+        goto = [{}]
+        outputs = [[]]
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(keyword_id)
+
+        # Failure links in breadth-first order, folded into a complete
+        # transition table so matching needs one dict lookup per character
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0) if state else 0
+                queue.append(child)
+
+        self._delta = delta
+        self._outputs = [tuple(keyword_ids) for keyword_ids in outputs]
+
+    def keyword_counts(self, text):
+        """Return {keyword_id: occurrences} for the keywords found in lowercased text"""
+        delta = self._delta
+        outputs = self._outputs
+        keywords = self.keywords
+        next_start = {}
+        counts = {}
+        state = 0
+
+        for position, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            for keyword_id in outputs[state]:
+                start = position - len(keywords[keyword_id]) + 1
+                if start < next_start.get(keyword_id, 0):
+                    continue
+                if self.word_boundary and (
+                    (start > 0 and _is_word_char(text[start - 1]))
+                    or (position + 1 < len(text) and _is_word_char(text[position + 1]))
+                ):
+                    continue
+                counts[keyword_id] = counts.get(keyword_id, 0) + 1
+                next_start[keyword_id] = position + 1
+        return counts
+
+    def count(self, text):
+        """Total keyword occurrences per category in lowercased text"""
+        scores = {category: 0 for category in self.categories}
+        for keyword_id, occurrences in self.keyword_counts(text).items():
+            for category, weight in self.weights[keyword_id].items():
+                scores[category] += occurrences * weight
+        if not self.word_boundary:
+            # re.findall('') matches at every position
+            for category, weight in self.empty_weights.items():
+                scores[category] += (len(text) + 1) * weight
+        return scores
+
+    def count_present(self, text):
+        """Number of listed keywords per category that occur in lowercased text"""
+        scores = {category: 0 for category in self.categories}
+        for keyword_id in self.keyword_counts(text):
+            for category, weight in self.weights[keyword_id].items():
+                scores[category] += weight
+        if not self.word_boundary:
+            for category, weight in self.empty_weights.items():
+                scores[category] += weight
+        return scores
+
+
+@lru_cache(maxsize=32)
+def _compile(frozen_categories, word_boundary):
+    return KeywordMatcher({category: list(keywords) for category, keywords in frozen_categories}, word_boundary)
+
+
+def compile_matcher(classification_words, word_boundary=False):
+    """Return a KeywordMatcher for the keyword set, built once per distinct set"""
+    frozen = tuple(
+        (category, tuple(keywords))
+        for category, keywords in flatten_keywords(classification_words).items()
+    )
+    return _compile(frozen, word_boundary)
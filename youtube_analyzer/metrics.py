@@ -0,0 +1,235 @@
+"""Per-run instrumentation of API calls, cache lookups and pipeline stages
+
+One Metrics object is created per run and passed along with the analyzer.
+It counts calls, response bytes, estimated quota units and retries per
+endpoint, keeps latency histograms per endpoint and per stage (resolve,
+fetch, classify, render), cache hits per resource, the outcomes of
+conditional (ETag) reads and IDs answered by other sessions' calls
+(see singleflight). snapshot() is
+JSON-ready and to_prometheus() renders the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from youtube_analyzer.quota import call_cost
+
+# Upper bounds in seconds, Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of observations per latency bucket, plus their sum; not locked itself"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)      # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            position = len(self.buckets)
+        self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile, e.g. 0.95 for p95
+
+        None when the quantile lies beyond the last bucket.
+        """
+        if not self.count:
+            return 0.0
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                break
+        return self.buckets[position] if position < len(self.buckets) else None
+
+    def to_dict(self):
+        return {
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts)),
+            'sum': round(self.sum, 6),
+            'count': self.count
+        }
+
+
+def _endpoint_counters():
+    return {'calls': 0, 'errors': 0, 'statuses': {}, 'wire_bytes': 0, 'body_bytes': 0,
+            'units': 0, 'shared': 0, 'retries': {}, 'latency': Histogram()}
+
+
+class Metrics:
+    """Thread-safe counters and histograms of one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._endpoints = {}
+        self._cache = {}
+        self._stages = {}
+        self._revalidation = {}
+        self._reused_scores = 0
+
+    def record_call(self, endpoint, status, latency, wire_bytes, body_bytes):
+        """One API call as sent; its estimated quota cost is charged here"""
+        with self._lock:
+            counters = self._endpoints.setdefault(endpoint, _endpoint_counters())
+            counters['calls'] += 1
+            counters['statuses'][status] = counters['statuses'].get(status, 0) + 1
+            if status >= 400:
+                counters['errors'] += 1
+            counters['wire_bytes'] += wire_bytes
+            counters['body_bytes'] += body_bytes
+            counters['units'] += call_cost(endpoint)
+            counters['latency'].observe(latency)
+
+    def record_retry(self, endpoint, reason):
+        """A call that is sent again, e.g. with the next key after quotaExceeded"""
+        with self._lock:
+            retries = self._endpoints.setdefault(endpoint, _endpoint_counters())['retries']
+            retries[reason] = retries.get(reason, 0) + 1
+
+    def record_shared(self, endpoint, count):
+        """IDs answered by another session's call in flight or just finished, without a call of this run"""
+        with self._lock:
+            self._endpoints.setdefault(endpoint, _endpoint_counters())['shared'] += count
+
+    def record_cache(self, resource, hits, misses):
+        """Result of one cache lookup of several IDs"""
+        with self._lock:
+            counters = self._cache.setdefault(resource, {'hits': 0, 'misses': 0})
+            counters['hits'] += hits
+            counters['misses'] += misses
+
+    def record_revalidation(self, resource, outcome):
+        """Outcome of a conditional read: 'revalidated' (304), 'changed' or 'new'"""
+        with self._lock:
+            counters = self._revalidation.setdefault(resource, {})
+            counters[outcome] = counters.get(outcome, 0) + 1
+
+    def record_reused_scores(self, count):
+        """Channels whose stored classification was reused instead of re-scoring"""
+        with self._lock:
+            self._reused_scores += count
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage: `with metrics.stage('fetch'): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stages.setdefault(name, Histogram()).observe(elapsed)
+
+    def snapshot(self):
+        """All counters as plain data, ready for json.dumps"""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    **{key: value for key, value in counters.items() if key not in ('latency', 'statuses', 'retries')},
+                    'statuses': {str(status): count for status, count in counters['statuses'].items()},
+                    'retries': dict(counters['retries']),
+                    'latency_seconds': counters['latency'].to_dict(),
+                    'p50_seconds': counters['latency'].quantile(0.5),
+                    'p95_seconds': counters['latency'].quantile(0.95)
+                }
+                for endpoint, counters in self._endpoints.items()
+            }
+            cache = {
+                resource: {**counters, 'hit_ratio': round(counters['hits'] / (counters['hits'] + counters['misses']), 4)
+                           if counters['hits'] + counters['misses'] else 0.0}
+                for resource, counters in self._cache.items()
+            }
+            stages = {name: histogram.to_dict() for name, histogram in self._stages.items()}
+            revalidation = {resource: dict(counters) for resource, counters in self._revalidation.items()}
+            reused_scores = self._reused_scores
+
+        lookups = sum(counters['hits'] + counters['misses'] for counters in cache.values())
+        return {
+            'started': self.started,
+            'endpoints': endpoints,
+            'cache': cache,
+            'stages': stages,
+            'revalidation': revalidation,
+            'totals': {
+                'calls': sum(counters['calls'] for counters in endpoints.values()),
+                'errors': sum(counters['errors'] for counters in endpoints.values()),
+                'retries': sum(sum(counters['retries'].values()) for counters in endpoints.values()),
+                'units': sum(counters['units'] for counters in endpoints.values()),
+                'shared': sum(counters['shared'] for counters in endpoints.values()),
+                'wire_bytes': sum(counters['wire_bytes'] for counters in endpoints.values()),
+                'body_bytes': sum(counters['body_bytes'] for counters in endpoints.values()),
+                'reused_scores': reused_scores,
+                'cache_hit_ratio': round(sum(counters['hits'] for counters in cache.values()) / lookups, 4)
+                if lookups else 0.0
+            }
+        }
+
+    def to_prometheus(self, prefix='youtube_analyzer'):
+        """Prometheus text exposition format of all counters and histograms"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {value}" if labels
+                             else f"{prefix}_{name}{suffix} {value}")
+
+        def histogram_samples(histograms, label):
+            samples = []
+            for name, histogram in histograms.items():
+                cumulative = 0
+                for bound, count in histogram['buckets'].items():
+                    cumulative += count
+                    samples.append(('_bucket', {label: name, 'le': bound}, cumulative))
+                samples.append(('_sum', {label: name}, histogram['sum']))
+                samples.append(('_count', {label: name}, histogram['count']))
+            return samples
+
+        endpoints = snapshot['endpoints']
+        metric('api_calls_total', 'counter', "API calls by endpoint and HTTP status", [
+            ('', {'endpoint': endpoint, 'status': status}, count)
+            for endpoint, counters in endpoints.items() for status, count in counters['statuses'].items()
+        ])
+        metric('api_call_duration_seconds', 'histogram', "API call latency", histogram_samples(
+            {endpoint: counters['latency_seconds'] for endpoint, counters in endpoints.items()}, 'endpoint'
+        ))
+        metric('api_response_bytes_total', 'counter', "Response bytes on the wire and decoded", [
+            ('', {'endpoint': endpoint, 'encoding': encoding}, counters[f'{encoding}_bytes'])
+            for endpoint, counters in endpoints.items() for encoding in ('wire', 'body')
+        ])
+        metric('api_quota_units_total', 'counter', "Estimated quota units spent", [
+            ('', {'endpoint': endpoint}, counters['units']) for endpoint, counters in endpoints.items()
+        ])
+        metric('api_retries_total', 'counter', "API calls sent again", [
+            ('', {'endpoint': endpoint, 'reason': reason}, count)
+            for endpoint, counters in endpoints.items() for reason, count in counters['retries'].items()
+        ])
+        metric('shared_ids_total', 'counter', "IDs answered by another session's call instead of a call", [
+            ('', {'endpoint': endpoint}, counters['shared']) for endpoint, counters in endpoints.items()
+        ])
+        metric('cache_lookups_total', 'counter', "Response cache lookups by result", [
+            ('', {'resource': resource, 'result': result}, counters[counter])
+            for resource, counters in snapshot['cache'].items()
+            for result, counter in (('hit', 'hits'), ('miss', 'misses'))
+        ])
+        metric('conditional_reads_total', 'counter', "Expired entries refetched with If-None-Match by outcome", [
+            ('', {'resource': resource, 'outcome': outcome}, count)
+            for resource, counters in snapshot['revalidation'].items() for outcome, count in counters.items()
+        ])
+        metric('reused_scores_total', 'counter', "Unchanged channels whose stored classification was reused",
+               [('', {}, snapshot['totals']['reused_scores'])])
+        metric('stage_duration_seconds', 'histogram', "Duration of pipeline stages",
+               histogram_samples(snapshot['stages'], 'stage'))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,262 @@
+"""Local stand-in for the YouTube Data API with synthetic data
+
+    python -m youtube_analyzer mock-api --port 8765 --latency 0.05 --quota-per-key 2000
+
+Serves channels, videos, search and playlistItems list calls under
+/youtube/v3/ so a Transport pointed at `base_url` runs unchanged. Every
+video, handle and username maps deterministically to one of
+`channel_count` synthetic channels, so repeated inputs collapse the way real
+placement lists do. Latency, random backend errors and a per-key daily
+quota (403 quotaExceeded once spent) are configurable, and every call is
+charged its real unit cost per endpoint and per key. Injected errors can be
+503 or 429 answers with a Retry-After header, and outage() fails every call
+for a while, as a sustained backend problem does. Responses carry
+ETags and a matching If-None-Match is answered 304; bumping `revision`
+changes the uploads of a `change_rate` share of channels.
+"""
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from youtube_analyzer.quota import QUOTA_COSTS
+
+API_PATH = '/youtube/v3/'
+
+# Words of synthetic titles, a mix of all classification categories
+VOCABULARY = [
+    'kids', 'cartoon', 'nursery', 'toys', 'lego', 'gaming', 'minecraft', 'fortnite', 'challenge',
+    'prank', 'news', 'finance', 'tutorial', 'review', 'podcast', 'music', 'vlog', 'cooking'
+]
+
+
+def _error(code, reason, message, domain='youtube.api'):
+    return {'error': {'code': code, 'message': message,
+                      'errors': [{'reason': reason, 'domain': domain, 'message': message}]}}
+
+
+# Bodies of injected errors by status
+ERRORS = {
+    500: _error(500, 'backendError', 'Backend Error'),
+    503: _error(503, 'backendError', 'The service is currently unavailable.'),
+    429: _error(429, 'rateLimitExceeded', 'Too many requests.', domain='usageLimits')
+}
+
+
+class MockYouTubeAPI:
+    """Synthetic YouTube Data API served over HTTP on a background thread"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota_per_key=None,
+                 channel_count=1000, change_rate=0.0, seed=0, error_status=500, retry_after=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Status of injected errors (500, 503 or 429) and the Retry-After seconds sent with 503 and 429
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self._outage_until = 0.0
+        self.quota_per_key = quota_per_key
+        self.channel_count = channel_count
+        self.change_rate = change_rate
+        self.revision = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.reset()
+
+    def outage(self, seconds):
+        """Fail every call with `error_status` for the next `seconds`"""
+        self._outage_until = time.monotonic() + seconds
+
+    def reset(self):
+        """Zero the call and unit counters and every key's spent quota"""
+        with self._lock:
+            self._endpoints = {}
+            self._keys = {}
+
+    # Synthetic fixtures
+
+    def channel_id(self, name):
+        """Channel that a video ID, handle or username belongs to"""
+        return f"UCmock{zlib.crc32(name.encode()) % self.channel_count:016d}"
+
+    def _words(self, seed, count):
+        return ' '.join(VOCABULARY[(seed + i * 7) % len(VOCABULARY)] for i in range(count))
+
+    def channel(self, channel_id):
+        seed = zlib.crc32(channel_id.encode())
+        return {
+            'id': channel_id,
+            'snippet': {'title': f"Channel {channel_id[-6:]}", 'description': self._words(seed, 12)},
+            'statistics': {'subscriberCount': str(seed % 1000000), 'videoCount': str(seed % 500),
+                           'viewCount': str(seed % 100000000)},
+            'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}}
+        }
+
+    def video(self, video_id):
+        return {'id': video_id, 'snippet': {'channelId': self.channel_id(f"video:{video_id}")}}
+
+    def playlist_item(self, channel_id, number):
+        seed = zlib.crc32(f"{channel_id}/{number}".encode())
+        if zlib.crc32(channel_id.encode()) % 1000 < self.change_rate * 1000:
+            # A channel that uploads: its recent videos differ in every revision
+            seed = zlib.crc32(f"{channel_id}/{number}/{self.revision}".encode())
+        return {'snippet': {'title': self._words(seed, 6), 'description': self._words(seed >> 3, 20),
+                            'publishedAt': '2024-01-01T00:00:00Z',
+                            'resourceId': {'videoId': f"mock{seed % 10 ** 7:07d}"}}}
+
+    def _list(self, endpoint, params):
+        """(status, body) of one list call"""
+        max_results = min(int(params.get('maxResults', 5)), 50)
+        if endpoint == 'channels':
+            if 'id' in params:
+                ids = [cid for cid in params['id'].split(',') if cid.startswith('UC')]
+            elif 'forHandle' in params:
+                ids = [self.channel_id(f"handle:{params['forHandle'].lstrip('@').lower()}")]
+            elif 'forUsername' in params:
+                ids = [self.channel_id(f"username:{params['forUsername'].lower()}")]
+            else:
+                return 400, _error(400, 'missingRequiredParameter', 'No filter selected.')
+            return 200, {'items': [self.channel(cid) for cid in ids]}
+        if endpoint == 'videos':
+            return 200, {'items': [self.video(vid) for vid in params.get('id', '').split(',') if vid]}
+        if endpoint == 'playlistItems':
+            channel_id = 'UC' + params.get('playlistId', 'UU')[2:]
+            return 200, {'items': [self.playlist_item(channel_id, n) for n in range(max_results)]}
+        if endpoint == 'search':
+            channel_id = params.get('channelId', '')
+            return 200, {'items': [self.playlist_item(channel_id, n) for n in range(max_results)]}
+        return 404, _error(404, 'notFound', 'Unknown endpoint.')
+
+    # Accounting
+
+    def handle(self, endpoint, params, if_none_match=None):
+        """Status and body of one call, after latency, quota and error injection
+
+        The body is None for 304 Not Modified.
+        """
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        key = params.get('key', '')
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {'calls': 0, 'units': 0, 'errors': 0, 'quota_errors': 0})
+            stats['calls'] += 1
+            if self.quota_per_key is not None and self._keys.get(key, 0) + cost > self.quota_per_key:
+                stats['quota_errors'] += 1
+                return 403, _error(403, 'quotaExceeded', 'The request cannot be completed because you '
+                                   'have exceeded your quota.', domain='youtube.quota')
+            # Like the real API, a call that was processed costs its units even when it fails
+            stats['units'] += cost
+            self._keys[key] = self._keys.get(key, 0) + cost
+            failed = (self.error_rate and self._random.random() < self.error_rate) \
+                or time.monotonic() < self._outage_until
+            if failed:
+                stats['errors'] += 1
+        if failed:
+            return self.error_status, ERRORS[self.error_status]
+        status, data = self._list(endpoint, params)
+        if status != 200:
+            return status, data
+        etag = '"' + hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest() + '"'
+        if if_none_match == etag:
+            with self._lock:
+                stats['not_modified'] = stats.get('not_modified', 0) + 1
+            return 304, None
+        return status, {'etag': etag, **data}
+
+    def usage(self):
+        """{'endpoints': {endpoint: counters}, 'keys': {key: units}, 'units', 'calls'}"""
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+            keys = dict(self._keys)
+        return {
+            'endpoints': endpoints,
+            'keys': keys,
+            'units': sum(stats['units'] for stats in endpoints.values()),
+            'calls': sum(stats['calls'] for stats in endpoints.values())
+        }
+
+    # Server
+
+    @property
+    def base_url(self):
+        """API base URL to pass to Transport"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PATH.rstrip('/')}"
+
+    def _bind(self, host, port):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+
+    def start(self, host='127.0.0.1', port=0):
+        """Serve on a background thread; port 0 picks a free port"""
+        self._bind(host, port)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-youtube-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self, host='127.0.0.1', port=0):
+        """Serve on the calling thread until interrupted"""
+        self._bind(host, port)
+        try:
+            self._server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start() if self._server is None else self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.startswith(API_PATH):
+            params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+            status, data = self.server.api.handle(parts.path[len(API_PATH):], params,
+                                                  self.headers.get('If-None-Match'))
+        else:
+            status, data = 404, _error(404, 'notFound', 'Not found.')
+
+        if data is None:
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        if status in (429, 503) and self.server.api.retry_after is not None:
+            self.send_header('Retry-After', str(self.server.api.retry_after))
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Thousands of calls per benchmark; stay quiet
+        pass
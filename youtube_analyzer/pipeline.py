@@ -0,0 +1,344 @@
+"""Analysis stages shared by the Streamlit app and the command line"""
+from youtube_analyzer.analyzer import channel_text
+from youtube_analyzer.cache import cached_scores
+from youtube_analyzer.concurrency import DEFAULT_QUEUE_SIZE, batches, run_ordered, run_stages
+from youtube_analyzer.jobs import PAUSED
+from youtube_analyzer.quota import QuotaBudgetExceeded
+from youtube_analyzer.retry import TransientError
+from youtube_analyzer.scoring import classify_texts
+from youtube_analyzer.urls import UrlIndex, canonical_key, canonicalize_url
+
+# URLs analyzed per step of a background job, so partial results appear early
+JOB_BATCH_SIZE = 200
+
+RESULT_COLUMNS = [
+    'URL', 'Channel Title', 'Subscribers', 'Videos', 'Views',
+    'Primary Category', 'Kids %', 'Teen %', 'Serious %'
+]
+
+
+def _ignore(*args):
+    pass
+
+
+def parse_urls(urls, on_warning=_ignore, keep_rows=True):
+    """Canonicalize all URLs into a UrlIndex of unique entities, warning about invalid ones"""
+    index = UrlIndex(keep_rows)
+    for url in urls:
+        extracted = index.add(url)
+        if not extracted:
+            on_warning(f"⚠️ Neplatná URL: {url}")
+    return index
+
+
+def resolve_channels(analyzer, index, on_status=_ignore, known=None, journal=None):
+    """Resolve the unique entities of an index to channel IDs and fetch all their channels
+
+    Entities already in `known` are skipped, resolutions and channels already
+    in `journal` are reused and new ones are recorded there.
+    Returns ({key: channel_id}, channels).
+    """
+    known = known or {}
+    entities = {key: extracted for key, extracted in index.entities.items() if key not in known}
+    resolved = journal.resolved if journal else {}
+
+    # Resolve video URLs to channel IDs, 50 videos per call
+    on_status("Zjišťuji kanály videí...")
+    video_ids = [
+        extracted['id'] for key, extracted in entities.items()
+        if extracted['type'] == 'video' and key not in resolved
+    ]
+    video_channels = analyzer.get_videos_channel_ids(video_ids) if video_ids else {}
+
+    # Resolve @handles and usernames with 1-unit lookups that return the channel too
+    handle_keys = [
+        key for key, extracted in entities.items()
+        if extracted['type'] in ['handle', 'username'] and key not in resolved
+    ]
+    handle_channels, prefetched = analyzer.get_channels_by_handles(handle_keys) if handle_keys else ({}, {})
+
+    entity_channels = {}
+    for key, extracted in entities.items():
+        if key in resolved:
+            channel_id = resolved[key]
+        elif extracted['type'] == 'video':
+            channel_id = video_channels.get(extracted['id'])
+        elif extracted['type'] == 'channel':
+            channel_id = extracted['id']
+        else:
+            channel_id = handle_channels.get(key)
+        if channel_id:
+            entity_channels[key] = channel_id
+    if journal:
+        journal.record_resolved({
+            key: channel_id for key, channel_id in entity_channels.items()
+            if key not in resolved and entities[key]['type'] != 'channel'
+        })
+
+    # Fetch all remaining channels, 50 channels per call
+    on_status("Načítám data kanálů...")
+    journaled = journal.channels if journal else {}
+    channels = {channel_id: journaled[channel_id] for channel_id in entity_channels.values() if channel_id in journaled}
+    fetched = dict(prefetched)
+    fetched.update(analyzer.get_channels_by_ids([
+        channel_id for channel_id in entity_channels.values()
+        if channel_id not in channels and channel_id not in prefetched
+    ]))
+    channels.update(fetched)
+    if journal:
+        journal.record_channels(fetched)
+    return entity_channels, channels
+
+
+def fetch_texts(analyzer, channels, channel_ids, on_progress=None, journal=None):
+    """Get recent videos of each channel once, channels in parallel
+
+    Texts already in `journal` are reused, each new one is recorded there as
+    soon as its videos arrive. Returns ({channel_id: text}, unchanged) where
+    `unchanged` holds channels whose videos were revalidated with a 304.
+    """
+    texts = {channel_id: journal.texts[channel_id] for channel_id in channel_ids
+             if journal and channel_id in journal.texts}
+    pending = [channel_id for channel_id in channel_ids if channel_id not in texts]
+    unchanged = set()
+
+    def fetch_channel_text(channel_id):
+        channel_data = channels[channel_id]
+        videos, outcome = analyzer.fetch_channel_videos(channel_data)
+        if outcome == 'revalidated':
+            unchanged.add(channel_id)
+        text = channel_text(channel_data, videos)
+        if journal:
+            journal.record_text(channel_id, text)
+        return text
+
+    outcomes = run_ordered(fetch_channel_text, pending, analyzer.max_workers, on_progress,
+                           return_exceptions=True)
+    for channel_id, outcome in zip(pending, outcomes):
+        if isinstance(outcome, QuotaBudgetExceeded):
+            analyzer.report_quota(outcome)
+        elif isinstance(outcome, TransientError):
+            analyzer.report_transient(outcome, [canonical_key({'id': channel_id, 'type': 'channel'})])
+        elif isinstance(outcome, Exception):
+            analyzer.on_error(f"❌ Chyba při analýze kanálu {channel_id}: {str(outcome)}")
+        else:
+            texts[channel_id] = outcome
+    return {channel_id: texts[channel_id] for channel_id in channel_ids if channel_id in texts}, unchanged
+
+
+def classify_changed(analyzer, texts, unchanged, classification_words, word_boundary=False):
+    """{channel_id: classification} of all texts, re-scoring only channels not in `unchanged`"""
+    def classify(pending):
+        scored = classify_texts(list(pending.values()), classification_words, word_boundary, index=list(pending))
+        return scored.to_dict('index')
+
+    # Stored scores are valid only for the same keyword file and matching mode
+    digest = getattr(classification_words, 'digest', None)
+    settings_key = f"{digest}:{word_boundary}" if digest else None
+    classifications, reused = cached_scores(analyzer.cache, texts, settings_key, classify, unchanged)
+    analyzer.metrics.record_reused_scores(reused)
+    return classifications
+
+
+def build_results(entity_channels, channels, classifications):
+    """Result row (without URL) of every entity whose channel was classified
+
+    Each classified channel is also keyed as a channel entity, so a later
+    /channel/ URL of a channel first seen through a video costs nothing.
+    """
+    results = {}
+    for key, channel_id in entity_channels.items():
+        if channel_id not in classifications:
+            continue
+        channel_data = channels[channel_id]
+        classification = classifications[channel_id]
+        results[key] = results[canonical_key({'id': channel_id, 'type': 'channel'})] = {
+            'Channel Title': channel_data['snippet']['title'],
+            'Subscribers': int(channel_data['statistics'].get('subscriberCount', 0)),
+            'Videos': int(channel_data['statistics'].get('videoCount', 0)),
+            'Views': int(channel_data['statistics'].get('viewCount', 0)),
+            'Primary Category': classification['primary_category'],
+            'Kids %': classification['kids'],
+            'Teen %': classification['teen'],
+            'Serious %': classification['serious']
+        }
+    return results
+
+
+def failed_urls(analyzer, index, entity_channels, known):
+    """URLs of the rows left without a result because calls for them failed transiently
+
+    Entities of a failed channel are marked failed too, so later batches that
+    skip them as already dispatched still report their rows.
+    """
+    for key, channel_id in entity_channels.items():
+        if canonical_key({'id': channel_id, 'type': 'channel'}) in analyzer.failed:
+            analyzer.failed.add(key)
+    return [url for url, key in index.rows if key is not None and key not in known and key in analyzer.failed]
+
+
+class Batch:
+    """URLs of one batch and what the stages found out about them so far"""
+
+    def __init__(self, urls, index, skip):
+        self.urls = urls
+        self.index = index
+        # Entities analyzed by earlier batches; their rows are fanned out from `known`
+        self.skip = skip
+        self.entity_channels = {}
+        self.channels = {}
+        self.texts = {}
+        self.unchanged = set()
+
+
+class AnalysisStages:
+    """Parse, resolve, fetch and classify steps of an analysis, run in turn or as a pipeline
+
+    Every step takes and returns a Batch; classify() returns the batch's URLs
+    and result rows. Results go to `known` (or to the journal, whose results
+    then serve as `known`), so each unique entity is analyzed once however
+    many batches it appears in.
+    """
+
+    def __init__(self, analyzer, classification_words, word_boundary=False, on_warning=_ignore,
+                 on_status=_ignore, on_progress=None, known=None, journal=None, failed=None):
+        self.analyzer = analyzer
+        self.classification_words = classification_words
+        self.word_boundary = word_boundary
+        self.on_warning = on_warning
+        self.on_status = on_status
+        self.on_progress = on_progress
+        if journal is not None:
+            known = journal.results
+        self.known = {} if known is None else known
+        self.journal = journal
+        self.failed = failed
+        # Entities handed to resolve() by any batch; a later batch leaves them to the first one
+        self.dispatched = set()
+
+    def parse(self, urls):
+        index = parse_urls(urls, self.on_warning)
+        skip = {key for key in index.entities if key in self.known or key in self.dispatched}
+        self.dispatched.update(index.entities)
+        return Batch(urls, index, skip)
+
+    def resolve(self, batch):
+        with self.analyzer.metrics.stage('resolve'):
+            batch.entity_channels, batch.channels = resolve_channels(
+                self.analyzer, batch.index, self.on_status, batch.skip, self.journal
+            )
+        return batch
+
+    def fetch(self, batch):
+        channel_ids = list(dict.fromkeys(
+            channel_id for channel_id in batch.entity_channels.values() if channel_id in batch.channels
+        ))
+        with self.analyzer.metrics.stage('fetch'):
+            batch.texts, batch.unchanged = fetch_texts(self.analyzer, batch.channels, channel_ids,
+                                                       self.on_progress, self.journal)
+        return batch
+
+    def classify(self, batch):
+        """Classify all changed channels of a batch at once and return (urls, result rows)"""
+        analyzer = self.analyzer
+        with analyzer.metrics.stage('classify'):
+            # Unchanged channels keep their stored scores
+            classifications = classify_changed(analyzer, batch.texts, batch.unchanged,
+                                               self.classification_words, self.word_boundary)
+            results = build_results(batch.entity_channels, batch.channels, classifications)
+            if analyzer.corpus is not None:
+                analyzer.corpus.record(batch.entity_channels, batch.channels, batch.texts, classifications)
+        if self.journal is not None:
+            self.journal.record_results(results)
+        else:
+            self.known.update(results)
+        if self.failed is not None:
+            self.failed.extend(failed_urls(analyzer, batch.index, batch.entity_channels, self.known))
+        return batch.urls, [{'URL': url, **result} for url, result in batch.index.fan_out(self.known)]
+
+
+def analyze_rows(analyzer, index, classification_words, word_boundary=False,
+                 on_status=_ignore, on_progress=None, known=None, journal=None, failed=None):
+    """Resolve, fetch and classify each unique entity once and fan results out to all rows
+
+    Errors go to analyzer.on_error. Pass the same `known` dict to successive
+    calls to reuse results of entities analyzed in earlier batches. With a
+    JobJournal every finished stage is recorded and its results serve as
+    `known`, so a resumed job only works on unfinished entities. URLs of
+    rows that failed transiently are appended to the `failed` list, so only
+    they need to be analyzed again.
+    """
+    stages = AnalysisStages(analyzer, classification_words, word_boundary, on_status=on_status,
+                            on_progress=on_progress, known=known, journal=journal, failed=failed)
+    batch = Batch(None, index, {key for key in index.entities if key in stages.known})
+    return stages.classify(stages.fetch(stages.resolve(batch)))[1]
+
+
+def analyze_batch(analyzer, urls, classification_words, word_boundary=False,
+                  on_warning=_ignore, on_status=_ignore, on_progress=None, known=None, journal=None,
+                  failed=None):
+    """Analyze a batch of URLs end to end and return result rows in input order"""
+    index = parse_urls(urls, on_warning)
+    return analyze_rows(analyzer, index, classification_words, word_boundary,
+                        on_status, on_progress, known, journal, failed)
+
+
+def stream_batches(analyzer, urls, classification_words, word_boundary=False, batch_size=JOB_BATCH_SIZE,
+                   on_warning=_ignore, on_status=_ignore, on_progress=None, known=None, journal=None,
+                   failed=None, queue_size=DEFAULT_QUEUE_SIZE):
+    """Analyze URLs batch by batch with the stages overlapping and yield (urls, rows) per batch
+
+    Each stage runs on its own thread, so one batch is classified while the
+    next one is fetched and a third resolved. Batches are read lazily from
+    `urls` and at most `queue_size` wait between two stages, so memory stays
+    flat however many URLs there are. Rows match analyze_batch() over the
+    same batches; an entity seen in several batches is analyzed once. Close
+    the generator to stop early.
+    """
+    stages = AnalysisStages(analyzer, classification_words, word_boundary, on_warning, on_status,
+                            on_progress, known, journal, failed)
+    return run_stages(batches(urls, batch_size),
+                      [stages.parse, stages.resolve, stages.fetch, stages.classify], queue_size)
+
+
+def analyze_job(job, analyzer, urls, classification_words, word_boundary=False, journal=None,
+                batch_size=JOB_BATCH_SIZE, sink=None):
+    """Body of a background analysis job: stream URLs through the stages into job and `sink`
+
+    Rows of every batch are counted in the job, which keeps only the most
+    recent ones, and passed to sink(rows) as soon as the batch is classified.
+    Cancellation is honoured between batches and between channels. When the
+    quota runs out the job is paused with its journal left open for resuming.
+    Rows that failed transiently and didn't succeed in a later batch end up
+    in job.failed.
+    """
+    known = {}
+    failed = []
+
+    def show_progress(done, total):
+        job.check_cancelled()
+        job.set_stage(f"Analyzuji kanál {done}/{total} (zpracováno {job.done}/{job.total} URL)...")
+
+    stream = stream_batches(analyzer, urls, classification_words, word_boundary, batch_size,
+                            on_status=job.set_stage, on_progress=show_progress,
+                            known=known, journal=journal, failed=failed)
+    try:
+        for batch, results in stream:
+            job.check_cancelled()
+            if sink is not None:
+                sink(results)
+            job.add_results(results, len(batch))
+
+            if analyzer.quota_exceeded or (analyzer.budget and analyzer.budget.exhausted):
+                job.status = PAUSED
+                return
+
+        if journal is not None:
+            journal.finish()
+    finally:
+        # Stop the stages before the journal they record to is closed
+        stream.close()
+        finished = journal.results if journal is not None else known
+        job.failed = [url for url in failed if canonical_key(canonicalize_url(url)) not in finished]
+        if journal is not None:
+            journal.close()
@@ -0,0 +1,86 @@
+"""Quota cost table, pre-flight run estimates and per-run unit budgets"""
+import math
+import threading
+
+# Default daily quota of one Google Cloud project
+DAILY_QUOTA = 10000
+
+# YouTube Data API accepts at most 50 comma-separated IDs per list call
+MAX_IDS_PER_REQUEST = 50
+
+# Quota units charged per call of each list endpoint
+# https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {
+    'channels': 1,
+    'videos': 1,
+    'playlistItems': 1,
+    'search': 100
+}
+
+
+class QuotaBudgetExceeded(Exception):
+    """Raised when a call would push a run over its unit budget"""
+
+
+QUOTA_EXCEEDED_MESSAGE = "Kvóta YouTube API byla vyčerpána u všech klíčů! Zkuste to zítra nebo přidejte další API klíč."
+
+
+class QuotaExceeded(QuotaBudgetExceeded):
+    """Raised when the API has answered 403 quotaExceeded for every key"""
+
+
+def call_cost(endpoint, calls=1):
+    """Return quota units charged for `calls` calls of an endpoint"""
+    return QUOTA_COSTS.get(endpoint, 1) * calls
+
+
+def estimate_run_cost(video_ids, channel_ids, recent_videos=True, handles=(), usernames=()):
+    """Estimate the quota units of a run before any call is made
+
+    Video IDs are resolved 50 per videos.list call, channels are fetched
+    50 per channels.list call (uploads playlist included) and recent videos
+    cost one playlistItems.list call per channel. Each @handle costs one
+    channels.list lookup returning the channel itself, a legacy username up
+    to two (forUsername, then forHandle). Every video may belong to a
+    different channel, so the result is an upper bound.
+    """
+    video_count = len(set(video_ids))
+    channel_count = len(set(channel_ids)) + video_count
+    handle_count = len(set(handles))
+    username_count = len(set(usernames))
+
+    calls = {
+        'videos': math.ceil(video_count / MAX_IDS_PER_REQUEST),
+        'channels': math.ceil(channel_count / MAX_IDS_PER_REQUEST) + handle_count + 2 * username_count,
+        'playlistItems': channel_count + handle_count + username_count if recent_videos else 0
+    }
+    return {
+        'calls': calls,
+        'units': sum(call_cost(endpoint, n) for endpoint, n in calls.items())
+    }
+
+
+class QuotaBudget:
+    """Thread-safe counter holding a run to a fixed number of quota units"""
+
+    def __init__(self, limit=DAILY_QUOTA):
+        self.limit = limit
+        self.spent = 0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return max(self.limit - self.spent, 0)
+
+    def charge(self, endpoint, calls=1):
+        """Reserve units for a call, raising QuotaBudgetExceeded when over budget"""
+        cost = call_cost(endpoint, calls)
+        with self._lock:
+            if self.spent + cost > self.limit:
+                self.exhausted = True
+                raise QuotaBudgetExceeded(
+                    f"Rozpočet {self.limit} jednotek kvóty by byl překročen ({self.spent} již spotřebováno)"
+                )
+            self.spent += cost
+        return cost
@@ -0,0 +1,214 @@
+"""On-disk Parquet store of result rows, one file per run, partitioned by run date
+
+    results/run_date=2024-01-31/20240131-142501-a3f9c2.parquet
+
+Rows are written batch by batch as row groups, so a run never has to hold
+all of its rows to store them. Sessions keep only a RunHandle; a run is
+read back when it is displayed and exported from the file in either
+Parquet (the file itself) or CSV (converted one row group at a time).
+Large runs are shown a page at a time: category_counts() and page() filter,
+sort and slice in Arrow and only the requested page becomes a DataFrame.
+history() queries all runs at once through pyarrow.dataset, reading only
+the columns it needs from the date partitions it needs.
+"""
+import glob
+import io
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from youtube_analyzer.defaults import DEFAULT_RESULTS_DIR
+from youtube_analyzer.pipeline import RESULT_COLUMNS
+
+SCHEMA = pa.schema([
+    ('URL', pa.string()),
+    ('Channel Title', pa.string()),
+    ('Subscribers', pa.int64()),
+    ('Videos', pa.int64()),
+    ('Views', pa.int64()),
+    ('Primary Category', pa.string()),
+    ('Kids %', pa.int64()),
+    ('Teen %', pa.int64()),
+    ('Serious %', pa.int64()),
+    ('Run ID', pa.string()),
+    ('Run At', pa.timestamp('s'))
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('run_date', pa.string())]), flavor='hive')
+
+HISTORY_COLUMNS = ['Run At', 'Run ID', 'Channel Title', 'URL', 'Primary Category', 'Kids %', 'Teen %', 'Serious %']
+
+# Rows per page of a displayed run
+PAGE_SIZE = 200
+
+# What a session keeps of a run instead of its rows
+RunHandle = namedtuple('RunHandle', ['run_id', 'path', 'rows', 'run_at'])
+
+
+class RunWriter:
+    """Append handle of one run; rows go to disk as one row group per write()"""
+
+    def __init__(self, store, run_id, run_at):
+        self.store = store
+        self.run_id = run_id
+        self.run_at = run_at
+        self.path = store.run_path(run_id, run_at)
+        self.rows = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Written next to the final file and renamed on close, so readers never see half a run;
+        # dataset discovery skips files starting with a dot
+        directory, name = os.path.split(self.path)
+        self._partial = os.path.join(directory, f".{name}.partial")
+        schema = SCHEMA.with_metadata({'run_id': run_id, 'run_at': run_at.isoformat()})
+        self._writer = pq.ParquetWriter(self._partial, schema, compression='zstd')
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = {column: [row.get(column) for row in rows] for column in RESULT_COLUMNS}
+        columns['Run ID'] = [self.run_id] * len(rows)
+        columns['Run At'] = [self.run_at] * len(rows)
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=SCHEMA))
+        self.rows += len(rows)
+
+    def close(self):
+        """Finish the file and return the run's handle"""
+        self._writer.close()
+        # A resumed run may have been stored on an earlier date
+        for path in self.store._existing(self.run_id):
+            if path != self.path:
+                os.remove(path)
+                try:
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass        # other runs of that day
+        os.replace(self._partial, self.path)
+        return RunHandle(self.run_id, self.path, self.rows, self.run_at)
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self._partial)
+
+
+class ResultsStore:
+    """Directory of Parquet runs, safe to share between sessions and threads"""
+
+    def __init__(self, root=DEFAULT_RESULTS_DIR):
+        self.root = root
+
+    def run_path(self, run_id, run_at):
+        return os.path.join(self.root, f"run_date={run_at.strftime('%Y-%m-%d')}", f"{run_id}.parquet")
+
+    def _existing(self, run_id):
+        return glob.glob(os.path.join(glob.escape(self.root), 'run_date=*', f"{glob.escape(run_id)}.parquet"))
+
+    def writer(self, run_id, run_at=None):
+        """RunWriter of a new run; writing a run ID again replaces the earlier run on close"""
+        return RunWriter(self, run_id, (run_at or datetime.now()).replace(microsecond=0))
+
+    def write_run(self, run_id, rows, run_at=None, batch_size=10000):
+        """Store all rows of a run and return its handle"""
+        writer = self.writer(run_id, run_at)
+        try:
+            for first in range(0, len(rows), batch_size):
+                writer.write(rows[first:first + batch_size])
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.close()
+
+    @staticmethod
+    def _handle(path):
+        # Only the footer is read
+        metadata = pq.read_metadata(path)
+        run = metadata.metadata
+        return RunHandle(run[b'run_id'].decode(), path, metadata.num_rows,
+                         datetime.fromisoformat(run[b'run_at'].decode()))
+
+    def handle(self, run_id):
+        """Handle of a stored run, or None"""
+        paths = self._existing(run_id)
+        return self._handle(max(paths)) if paths else None
+
+    def runs(self):
+        """Handles of all stored runs, newest first"""
+        handles = [self._handle(path)
+                   for path in glob.glob(os.path.join(glob.escape(self.root), 'run_date=*', '*.parquet'))]
+        return sorted(handles, key=lambda handle: handle.run_at, reverse=True)
+
+    def read(self, handle, columns=None):
+        """Rows of a run as a DataFrame, with the result columns only by default"""
+        return pq.read_table(handle.path, columns=columns or RESULT_COLUMNS).to_pandas()
+
+    def category_counts(self, handle):
+        """{primary category: rows} of a run, from one pass over that column only"""
+        column = pq.read_table(handle.path, columns=['Primary Category']).column(0)
+        return {item['values'].as_py(): item['counts'].as_py() for item in pc.value_counts(column)}
+
+    def page(self, handle, categories=None, search=None, sort_by=None, descending=False,
+             page=1, page_size=PAGE_SIZE):
+        """One page of a run's rows after filtering and sorting, and the number of matching rows
+
+        `categories` keeps rows of those primary categories (read with the
+        filter pushed down to the file), `search` keeps rows whose channel
+        title or URL contains it, ignoring case.
+        """
+        filters = None
+        if categories is not None:
+            filters = ds.field('Primary Category').isin(pa.array(list(categories), pa.string()))
+        table = pq.read_table(handle.path, columns=RESULT_COLUMNS, filters=filters)
+        if search:
+            table = table.filter(pc.or_(
+                pc.match_substring(table['Channel Title'], search, ignore_case=True),
+                pc.match_substring(table['URL'], search, ignore_case=True)
+            ))
+        if sort_by:
+            table = table.sort_by([(sort_by, 'descending' if descending else 'ascending')])
+        return table.slice((page - 1) * page_size, page_size).to_pandas(), table.num_rows
+
+    def parquet_bytes(self, handle):
+        with open(handle.path, 'rb') as f:
+            return f.read()
+
+    def export_csv(self, handle, sink):
+        """Write a run's result columns as CSV to a binary file, one row group at a time"""
+        parquet = pq.ParquetFile(handle.path)
+        writer = None
+        for batch in parquet.iter_batches(columns=RESULT_COLUMNS):
+            if writer is None:
+                writer = pa_csv.CSVWriter(sink, batch.schema)
+            writer.write_batch(batch)
+        if writer is None:
+            sink.write((','.join(f'"{column}"' for column in RESULT_COLUMNS) + '\n').encode('utf-8'))
+        else:
+            writer.close()
+
+    def csv_bytes(self, handle):
+        sink = io.BytesIO()
+        self.export_csv(handle, sink)
+        return sink.getvalue()
+
+    def history(self, channel=None, since=None, columns=HISTORY_COLUMNS):
+        """Result rows of all runs, oldest first, optionally of one channel and from a date on
+
+        `channel` matches the channel title or the URL exactly; `since` is a
+        date and skips the partitions of earlier days unread.
+        """
+        if not os.path.isdir(self.root):
+            return SCHEMA.empty_table().select(list(columns)).to_pandas()
+        dataset = ds.dataset(self.root, format='parquet', partitioning=PARTITIONING,
+                             schema=SCHEMA.append(pa.field('run_date', pa.string())))
+        condition = None
+        if since is not None:
+            condition = ds.field('run_date') >= since.strftime('%Y-%m-%d')
+        if channel:
+            matches = (ds.field('Channel Title') == channel) | (ds.field('URL') == channel)
+            condition = matches if condition is None else condition & matches
+        table = dataset.to_table(columns=list(columns), filter=condition)
+        return table.sort_by([('Run At', 'ascending'), ('Run ID', 'ascending')]).to_pandas()
@@ -0,0 +1,221 @@
+"""Retries of transient API failures and a circuit breaker pausing all calls
+
+RetryPolicy decides whether a failed call is sent again and how long to
+wait first: 5xx answers, 429 and the per-user rate limits (403
+rateLimitExceeded / userRateLimitExceeded) and connection errors are retried
+with exponential backoff and full jitter, never sooner than a Retry-After
+header asks. Every endpoint has a retry budget, so retries add at most a
+fixed share of extra calls during an outage instead of multiplying them.
+
+CircuitBreaker is shared by every caller of a Transport. When most recent
+calls failed transiently it opens and every call waits, pausing the whole
+pipeline, until a single probe call after the cool-down succeeds.
+"""
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from youtube_analyzer.defaults import DEFAULT_MAX_RETRIES
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# 403 reasons that are rate limits rather than permanent refusals; quotaExceeded is handled by KeyPool
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class TransientError(Exception):
+    """A call that still failed transiently once its retries were used up"""
+
+
+class CircuitOpen(TransientError):
+    """Raised to a call that waited longer than the breaker's `max_pause`"""
+
+
+def retry_reason(response):
+    """Reason to retry a response, such as 'http_503' or 'rateLimitExceeded', or None"""
+    if response.status_code in RETRYABLE_STATUSES:
+        return f"http_{response.status_code}"
+    if response.status_code == 403:
+        for reason in RATE_LIMIT_REASONS:
+            if reason in response.text:
+                return reason
+    return None
+
+
+def retry_after(response, now=None):
+    """Seconds a Retry-After header asks to wait, or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+
+class RetryBudget:
+    """Retries of one endpoint allowed as a share of its calls
+
+    Starts with `reserve` retries; every first attempt adds `ratio` of a
+    retry, every retry spends one.
+    """
+
+    def __init__(self, ratio=0.2, reserve=20):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.reserve)
+
+    def withdraw(self):
+        """Take one retry, or return False when the budget is spent"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def remaining(self):
+        with self._lock:
+            return int(self._tokens)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, Retry-After and per-endpoint retry budgets"""
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, base_delay=1.0, max_delay=30.0, max_retry_after=120.0,
+                 budget_ratio=0.2, budget_reserve=20, rng=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # A longer Retry-After is cut to this; the breaker handles longer outages
+        self.max_retry_after = max_retry_after
+        self.budget_ratio = budget_ratio
+        self.budget_reserve = budget_reserve
+        self._random = rng or random.Random()
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def budget(self, endpoint):
+        with self._lock:
+            budget = self._budgets.get(endpoint)
+            if budget is None:
+                budget = self._budgets[endpoint] = RetryBudget(self.budget_ratio, self.budget_reserve)
+            return budget
+
+    def delay(self, retry, wait_at_least=None):
+        """Seconds to wait before retry number `retry` (0 for the first)"""
+        backoff = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        if wait_at_least is not None:
+            backoff = max(backoff, min(wait_at_least, self.max_retry_after))
+        return backoff
+
+    def allows(self, endpoint, retry):
+        """Whether retry number `retry` of a call may be sent; spends the endpoint's budget"""
+        return retry < self.max_retries and self.budget(endpoint).withdraw()
+
+    def budgets(self):
+        """{endpoint: retries left in its budget}"""
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {endpoint: budget.remaining for endpoint, budget in budgets.items()}
+
+
+class CircuitBreaker:
+    """Opens after sustained transient failures and holds every call until a probe succeeds
+
+    It opens when at least `threshold` of the last `window` calls failed
+    transiently. While open, calls wait in before_call(); after `cooldown`
+    seconds one call goes out as a probe. Its success closes the breaker,
+    its failure opens it again for twice as long, up to `max_cooldown`. A
+    call waiting longer than `max_pause` gets CircuitOpen.
+    """
+
+    def __init__(self, threshold=10, window=20, cooldown=5.0, max_cooldown=120.0, max_pause=600.0):
+        self.threshold = threshold
+        self.window = window
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_pause = max_pause
+        self.state = CLOSED
+        self.trips = 0
+        self._cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._probe = None          # thread sending the probe call
+        self._lock = threading.Lock()
+
+    @property
+    def paused_for(self):
+        """Seconds until the next probe while open, else 0"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            return max(self._open_until - time.monotonic(), 0.0)
+
+    def before_call(self):
+        """Wait until a call may be sent; the first call after a cool-down is the probe"""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.state == CLOSED:
+                    return
+                if self.state == OPEN and now >= self._open_until:
+                    self.state = HALF_OPEN
+                    self._probe = threading.get_ident()
+                    return
+                if self.state == HALF_OPEN and self._probe == threading.get_ident():
+                    return
+                wait = self._open_until - now if self.state == OPEN else 0.05
+            if now - started + wait > self.max_pause:
+                raise CircuitOpen("API hlásí dlouhodobé chyby, volání bylo zastaveno")
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def after_call(self, ok):
+        """Outcome of a sent call: True, False for a transient failure, None when it tells nothing"""
+        with self._lock:
+            probe = self.state == HALF_OPEN and self._probe == threading.get_ident()
+            if probe:
+                self._probe = None
+                if ok:
+                    self.state = CLOSED
+                    self._cooldown = self.base_cooldown
+                    self._outcomes.clear()
+                elif ok is False:
+                    self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                    self._trip()
+                else:
+                    # Let the next caller probe
+                    self.state = OPEN
+                    self._open_until = time.monotonic()
+                return
+            if ok is None or self.state != CLOSED:
+                return
+            self._outcomes.append(ok)
+            if len(self._outcomes) - sum(self._outcomes) >= self.threshold:
+                self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.trips += 1
+        self._open_until = time.monotonic() + self._cooldown
+        self._outcomes.clear()
@@ -0,0 +1,102 @@
+"""Vectorized batch classification of many channel texts"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from youtube_analyzer.keywords import keyword_matcher
+
+CATEGORIES = ['kids', 'teen', 'serious']
+
+# A primary category needs more than this share of all keyword hits
+PRIMARY_THRESHOLD = 40
+
+# Sparse document x keyword matrix in coordinate form
+TermCounts = namedtuple('TermCounts', ['rows', 'cols', 'counts', 'shape'])
+
+
+def term_counts(texts, matcher):
+    """Count every keyword in every lowercased text into a sparse TermCounts matrix"""
+    rows, cols, counts = [], [], []
+    for row, text in enumerate(texts):
+        if text is None:
+            continue
+        for keyword_id, occurrences in matcher.keyword_counts(text).items():
+            rows.append(row)
+            cols.append(keyword_id)
+            counts.append(occurrences)
+    return TermCounts(
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(cols, dtype=np.int64),
+        np.asarray(counts, dtype=np.int64),
+        (len(texts), len(matcher.keywords))
+    )
+
+
+def category_weights(matcher, categories=CATEGORIES):
+    """Keyword x category matrix of how often each keyword is listed per category"""
+    weights = np.zeros((len(matcher.keywords), len(categories)), dtype=np.int64)
+    for keyword_id, keyword_weights in enumerate(matcher.weights):
+        for column, category in enumerate(categories):
+            weights[keyword_id, column] = keyword_weights.get(category, 0)
+    return weights
+
+
+def text_lengths(texts):
+    """Length of each text, -1 for a missing one"""
+    return np.array([len(text) if text is not None else -1 for text in texts], dtype=np.int64)
+
+
+def score_matrix(matrix, matcher, lengths, categories=CATEGORIES):
+    """Raw keyword hits per document and category (documents x categories)
+
+    `lengths` are the text lengths from text_lengths(), needed only for
+    empty keywords.
+    """
+    weights = category_weights(matcher, categories)
+    scores = np.zeros((matrix.shape[0], len(categories)), dtype=np.int64)
+    np.add.at(scores, matrix.rows, matrix.counts[:, None] * weights[matrix.cols])
+
+    if matcher.empty_weights and not matcher.word_boundary:
+        # re.findall('') matches at every position of the text
+        empty = np.array([matcher.empty_weights.get(category, 0) for category in categories], dtype=np.int64)
+        scores += (lengths + 1)[:, None] * empty
+    return scores
+
+
+def classify_scores(scores, known, categories=CATEGORIES):
+    """Normalize raw hits to percentages and pick primary categories like classify_channel"""
+    total = scores.sum(axis=1)
+    total[total == 0] = 1
+    normalized = np.round((scores / total[:, None]) * 100).astype(np.int64)
+
+    # argmax returns the first maximum, as max() over the category dict does
+    primary = np.array([category.title() for category in categories], dtype=object)[normalized.argmax(axis=1)]
+    primary[normalized.max(axis=1) <= PRIMARY_THRESHOLD] = 'Mixed'
+
+    normalized[~known] = 0
+    primary[~known] = 'Unknown'
+
+    result = pd.DataFrame(normalized, columns=categories)
+    result['primary_category'] = primary
+    return result
+
+
+def classify_texts(texts, classification_words, word_boundary=False, index=None):
+    """Classify N channel texts at once
+
+    `texts` are channel texts as built by channel_text() (None for a missing
+    channel). Returns a DataFrame with kids/teen/serious percentages and
+    primary_category, identical to calling classify_channel per channel.
+    """
+    texts = [text.lower() if text is not None else None for text in texts]
+    matcher = keyword_matcher(classification_words, word_boundary)
+
+    matrix = term_counts(texts, matcher)
+    scores = score_matrix(matrix, matcher, text_lengths(texts))
+    known = np.array([text is not None for text in texts], dtype=bool)
+
+    result = classify_scores(scores, known)
+    if index is not None:
+        result.index = index
+    return result
@@ -0,0 +1,144 @@
+"""Process-wide coalescing of identical API reads across sessions
+
+When several sessions analyze overlapping placement lists at once, they ask
+for the same popular channels at the same moment. SingleFlight lets the
+first caller of an ID fetch it; callers asking for it while that fetch is in
+flight wait for its result instead of sending their own request. Reads are
+batched, so one call may fetch some of its IDs and wait for the others.
+
+Finished results stay in a bounded in-memory LRU for `ttl` seconds. It also
+covers the moment between a fetch landing and its result reaching the
+response cache, when a caller would otherwise miss both.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 50000
+
+# The response cache keeps results for days; the LRU only bridges concurrent runs
+DEFAULT_TTL = 10 * 60
+
+# Result of an ID whose fetch failed; a waiting caller then fetches it itself
+FAILED = object()
+
+# Result of an ID the API doesn't know
+NOT_FOUND = object()
+
+
+class _Flight:
+    """One ID being fetched; `value` is set before `done`"""
+
+    __slots__ = ('done', 'value')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = FAILED
+
+
+class SingleFlight:
+    """In-flight table and LRU of recent results shared by all threads of the process"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._flights = {}              # {(namespace, id): _Flight}
+        self._recent = OrderedDict()    # {(namespace, id): (expires, value)}, least recently used first
+        self.fetched = 0                # IDs fetched by their caller
+        self.joined = 0                 # IDs taken from another caller's fetch in flight
+        self.hits = 0                   # IDs served from the LRU
+
+    def fetch_many(self, namespace, ids, fetch, metrics=None):
+        """Return {id: value} of the IDs found, fetching only IDs no other caller is fetching
+
+        fetch(ids) must return ({id: value} of the IDs found, IDs whose fetch
+        failed). IDs missing from both are not found and shared as such.
+        `namespace` separates IDs of different calls and starts with the
+        endpoint, e.g. ('channels', part).
+        When a fetch raises, its IDs fail for every waiting caller, who then
+        fetches them itself; the exception reaches only the fetching caller.
+        IDs answered without a call of this caller are recorded in `metrics`
+        as shared calls of the namespace's endpoint.
+        """
+        pending = list(dict.fromkeys(ids))
+        found = {}
+        shared = 0
+        while pending:
+            owned, waiting, hits = self._claim(namespace, pending, found)
+            shared += hits
+            if owned:
+                values, failed = {}, set(owned)
+                try:
+                    values, failed = fetch(owned)
+                finally:
+                    self._land(namespace, owned, values, failed)
+                found.update(values)
+
+            # IDs whose fetch failed in another caller are claimed again
+            pending = []
+            for entry_id, flight in waiting.items():
+                flight.done.wait()
+                if flight.value is FAILED:
+                    pending.append(entry_id)
+                    continue
+                shared += 1
+                if flight.value is not NOT_FOUND:
+                    found[entry_id] = flight.value
+        if metrics is not None and shared:
+            metrics.record_shared(namespace[0], shared)
+        return found
+
+    def _claim(self, namespace, ids, found):
+        """(IDs this caller fetches, {id: flight} it waits for, LRU hits); the hits go to `found`"""
+        owned, waiting, hits = [], {}, 0
+        now = time.monotonic()
+        with self._lock:
+            for entry_id in ids:
+                key = (namespace, entry_id)
+                recent = self._recent.get(key)
+                if recent is not None and recent[0] > now:
+                    self._recent.move_to_end(key)
+                    hits += 1
+                    if recent[1] is not NOT_FOUND:
+                        found[entry_id] = recent[1]
+                    continue
+                flight = self._flights.get(key)
+                if flight is None:
+                    self._flights[key] = _Flight()
+                    owned.append(entry_id)
+                else:
+                    waiting[entry_id] = flight
+            self.fetched += len(owned)
+            self.joined += len(waiting)
+            self.hits += hits
+        return owned, waiting, hits
+
+    def _land(self, namespace, owned, values, failed):
+        """Hand the results of a fetch to its waiting callers and keep them in the LRU"""
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for entry_id in owned:
+                key = (namespace, entry_id)
+                flight = self._flights.pop(key)
+                if entry_id not in failed:
+                    flight.value = values.get(entry_id, NOT_FOUND)
+                    self._recent[key] = (expires, flight.value)
+                    self._recent.move_to_end(key)
+                flight.done.set()
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._recent)
+
+    def clear(self):
+        """Forget the recent results; fetches in flight are unaffected"""
+        with self._lock:
+            self._recent.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'fetched': self.fetched, 'joined': self.joined, 'hits': self.hits,
+                    'in_flight': len(self._flights), 'entries': len(self._recent)}
@@ -0,0 +1,178 @@
+"""Pooled, compressed HTTP transport for the YouTube Data API"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from youtube_analyzer.concurrency import DEFAULT_MAX_WORKERS
+from youtube_analyzer.defaults import API_BASE_URL
+from youtube_analyzer.retry import retry_after, retry_reason
+
+# Fields the apps read from each part, used to build partial-response masks
+PART_FIELDS = {
+    'channels': {
+        'snippet': 'snippet(title,description)',
+        'statistics': 'statistics(subscriberCount,videoCount,viewCount)',
+        'contentDetails': 'contentDetails/relatedPlaylists/uploads'
+    },
+    'videos': {
+        'snippet': 'snippet/channelId'
+    },
+    'playlistItems': {
+        'snippet': 'snippet(title,description,publishedAt,resourceId/videoId)'
+    }
+}
+
+
+def fields_for(endpoint, part):
+    """Build the `fields` mask for a list call requesting the given parts, plus the response ETag"""
+    masks = [PART_FIELDS[endpoint][name] for name in part.split(',')]
+    return f"etag,items(id,{','.join(masks)})"
+
+
+class TransportStats:
+    """Thread-safe per-endpoint counters of calls, bytes and latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, wire_bytes, body_bytes, latency):
+        with self._lock:
+            stats = self._endpoints.setdefault(
+                endpoint, {'calls': 0, 'wire_bytes': 0, 'body_bytes': 0, 'latency': 0.0}
+            )
+            stats['calls'] += 1
+            stats['wire_bytes'] += wire_bytes
+            stats['body_bytes'] += body_bytes
+            stats['latency'] += latency
+
+    def snapshot(self):
+        """Return {endpoint: counters} plus a 'total' entry"""
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+        total = {'calls': 0, 'wire_bytes': 0, 'body_bytes': 0, 'latency': 0.0}
+        for stats in endpoints.values():
+            for key in total:
+                total[key] += stats[key]
+        endpoints['total'] = total
+        return endpoints
+
+
+def stats_delta(before, after):
+    """Difference of two TransportStats snapshots, e.g. the share of one run"""
+    delta = {}
+    for endpoint, stats in after.items():
+        previous = before.get(endpoint, {})
+        delta[endpoint] = {key: value - previous.get(key, 0) for key, value in stats.items()}
+    return delta
+
+
+def pooled_session(pool_size=DEFAULT_MAX_WORKERS):
+    """requests Session with a keep-alive pool of `pool_size` connections per host
+
+    Responses are requested gzip-compressed; Google APIs only compress
+    when the User-Agent also contains "gzip".
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip',
+        'User-Agent': 'youtube-channel-analyzer (gzip)'
+    })
+    return session
+
+
+class Transport:
+    """Keep-alive connection pool to googleapis.com shared by all threads"""
+
+    def __init__(self, base_url=API_BASE_URL, pool_size=DEFAULT_MAX_WORKERS, rate_limiter=None, timeout=30,
+                 retry=None, breaker=None):
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        # RetryPolicy for transient failures and CircuitBreaker pausing every caller; None disables either
+        self.retry = retry
+        self.breaker = breaker
+        self.stats = TransportStats()
+
+        self.session = pooled_session(pool_size)
+
+    def get(self, endpoint, params, keys=None, metrics=None, headers=None, budget=None):
+        """GET an API endpoint, waiting for the rate limiter first
+
+        With a KeyPool the request is sent with the key that has the most
+        headroom; a quotaExceeded answer sets that key aside and the same
+        request is sent again with the next key. QuotaExceeded is raised
+        once no key is left. With a RetryPolicy, transient failures (see
+        retry_reason) and connection errors are sent again after a backoff;
+        once the policy gives up, the last response is returned or the last
+        connection error raised. With a CircuitBreaker every call first waits
+        while it is open. Every call and retry is recorded in `metrics` and
+        every retry is charged to `budget`, a QuotaBudget, before it is sent.
+        `headers` are sent with the request, e.g. If-None-Match.
+        """
+        if self.retry is not None:
+            self.retry.budget(endpoint).deposit()
+        retry = 0
+        while True:
+            if keys is not None:
+                params = {**params, 'key': keys.acquire(endpoint)}
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                response = self._send(endpoint, params, metrics, headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._after_call(False)
+                if self.retry is None or not self.retry.allows(endpoint, retry):
+                    raise
+                reason, wait = type(e).__name__, None
+            except BaseException:
+                self._after_call(None)
+                raise
+            else:
+                if keys is not None and response.status_code == 403 and 'quotaExceeded' in response.text:
+                    self._after_call(None)
+                    keys.mark_exhausted(params['key'])
+                    if metrics is not None:
+                        metrics.record_retry(endpoint, 'quotaExceeded')
+                    continue
+                reason = retry_reason(response)
+                self._after_call(reason is None)
+                if reason is None or self.retry is None or not self.retry.allows(endpoint, retry):
+                    return response
+                wait = retry_after(response)
+
+            if budget is not None:
+                budget.charge(endpoint)
+            if metrics is not None:
+                metrics.record_retry(endpoint, reason)
+            time.sleep(self.retry.delay(retry, wait))
+            retry += 1
+
+    def _after_call(self, ok):
+        if self.breaker is not None:
+            self.breaker.after_call(ok)
+
+    def _send(self, endpoint, params, metrics=None, headers=None):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        start = time.perf_counter()
+        response = self.session.get(f"{self.base_url}/{endpoint}", params=params, headers=headers,
+                                    timeout=self.timeout)
+        latency = time.perf_counter() - start
+
+        body_bytes = len(response.content)
+        # Bytes pulled over the wire, before gzip decoding
+        wire_bytes = response.raw.tell() if response.raw is not None else 0
+        self.stats.record(endpoint, wire_bytes or body_bytes, body_bytes, latency)
+        if metrics is not None:
+            metrics.record_call(endpoint, response.status_code, latency, wire_bytes or body_bytes, body_bytes)
+        return response
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,124 @@
+"""Canonical forms of YouTube URLs and a deduplicating index of input rows"""
+import re
+from urllib.parse import parse_qs, unquote, urlsplit
+
+YOUTUBE_HOSTS = {
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+    'youtube-nocookie.com', 'www.youtube-nocookie.com'
+}
+SHORT_HOSTS = {'youtu.be', 'www.youtu.be'}
+
+_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+_HANDLE = re.compile(r'^[\w.·-]+$')
+
+# Path prefixes followed by a video ID (/video/ is used by Google Ads placement reports)
+VIDEO_PATHS = {'embed', 'shorts', 'live', 'v', 'e', 'video'}
+
+
+def _video(video_id):
+    if video_id and _ID.match(video_id):
+        return {'id': video_id, 'type': 'video'}
+    return None
+
+
+def canonicalize_url(url):
+    """Parse a YouTube URL into {'id', 'type'} in canonical form, or None
+
+    Types are 'channel' (UC… ID), 'video', 'handle' (lowercased, without @)
+    and 'username' (legacy /user/ and /c/ names). Scheme, host variants
+    (m., music., youtu.be, nocookie), trailing tabs like /videos and
+    tracking query strings (si, feature, t, utm_…) don't affect the result,
+    so every spelling of one entity maps to the same value.
+    """
+    if not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = 'https://' + url
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    host = (parts.hostname or '').lower()
+    segments = [unquote(segment) for segment in parts.path.split('/') if segment]
+
+    if host in SHORT_HOSTS:
+        return _video(segments[0]) if segments else None
+    if host not in YOUTUBE_HOSTS:
+        return None
+
+    query = parse_qs(parts.query)
+    if query.get('v') and (not segments or segments[0] in ('watch', 'watch_popup')):
+        return _video(query['v'][0])
+    if not segments:
+        return None
+
+    head = segments[0]
+    if head.startswith('@'):
+        handle = head[1:].lower()
+        return {'id': handle, 'type': 'handle'} if handle and _HANDLE.match(handle) else None
+    if len(segments) < 2:
+        return None
+
+    value = segments[1]
+    if head == 'channel' and _ID.match(value):
+        return {'id': value, 'type': 'channel'}
+    if head in ('user', 'c') and _HANDLE.match(value):
+        return {'id': value.lower(), 'type': 'username'}
+    if head in VIDEO_PATHS:
+        return _video(value)
+    return None
+
+
+def canonical_key(extracted):
+    """Hashable key of a parsed URL, e.g. 'video:dQw4w9WgXcQ'"""
+    return f"{extracted['type']}:{extracted['id']}"
+
+
+class UrlIndex:
+    """Input rows collapsed into unique entities, in first-seen order
+
+    Every input URL keeps its row, so results computed once per entity can
+    be fanned back out to all the rows that named it. With keep_rows=False
+    only the unique entities and the row count are kept, for a pass over an
+    input too large to hold.
+    """
+
+    def __init__(self, keep_rows=True):
+        self.keep_rows = keep_rows
+        self.rows = []          # (url, key or None) for every input row
+        self.entities = {}      # key -> {'id', 'type'}
+        self.count = 0          # input rows
+        self.invalid = 0        # input rows that aren't YouTube URLs
+
+    def add(self, url):
+        """Index one URL and return its parsed form, or None if it isn't a YouTube URL"""
+        extracted = canonicalize_url(url)
+        key = canonical_key(extracted) if extracted else None
+        self.count += 1
+        if key is None:
+            self.invalid += 1
+        if self.keep_rows:
+            self.rows.append((url, key))
+        if key is not None and key not in self.entities:
+            self.entities[key] = extracted
+        return extracted
+
+    def ids(self, type_name, exclude=()):
+        """Unique IDs of one type, leaving out entities whose keys are in `exclude`"""
+        return [
+            extracted['id'] for key, extracted in self.entities.items()
+            if extracted['type'] == type_name and key not in exclude
+        ]
+
+    @property
+    def duplicates(self):
+        """Number of rows that repeat an already indexed entity"""
+        return self.count - self.invalid - len(self.entities)
+
+    def fan_out(self, results_by_key):
+        """(url, result) for every row whose entity has a result, in input order"""
+        return [(url, results_by_key[key]) for url, key in self.rows if key in results_by_key]
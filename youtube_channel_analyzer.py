@@ -1,12 +1,25 @@
 
 import streamlit as st
 import pandas as pd
+import copy
 import json
-import re
 import os
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from youtube_analyzer.cache import (
+    CHANNEL_PARTS, NOT_MODIFIED, ResponseCache, cached_channels, cached_handles, conditional_read, read_through
+)
+from youtube_analyzer.gapi import build_client
+from youtube_analyzer.keywords import (
+    CLASSIFICATION_WORDS_PATH, invalidate_keyword_pack, keyword_matcher, load_keyword_pack
+)
+from youtube_analyzer.matcher import flatten_keywords
+from youtube_analyzer.quota import (
+    DAILY_QUOTA, MAX_IDS_PER_REQUEST, QuotaBudget, QuotaBudgetExceeded, estimate_run_cost
+)
+from youtube_analyzer.transport import fields_for
+from youtube_analyzer.urls import UrlIndex, canonicalize_url
+
 # Nastavení stránky
 st.set_page_config(
     page_title="YouTube Channel Analyzer",
@@ -15,6 +28,22 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Funkce pro rozdělení seznamu na dávky po maximálně `size` položkách
+def chunked(items, size=MAX_IDS_PER_REQUEST):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# Diskový cache odpovědí API sdílený všemi relacemi procesu
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+# Funkce pro klienta YouTube API: sestaví se jednou pro každý klíč z přibaleného popisu API
+# (bez stahování discovery dokumentu) a sdílí jedno vláknově bezpečné spojení se všemi relacemi
+@st.cache_resource
+def get_youtube_client(api_key):
+    return build_client(api_key)
+
 # Funkce pro načtení API klíče
 def load_api_key():
     # Zkusit načíst z secrets
@@ -31,100 +60,151 @@ def load_api_key():
             pass
     return None
 
+# Výchozí klasifikační slova, pokud soubor neexistuje
+DEFAULT_CLASSIFICATION_WORDS = {
+    "kids": {
+        "en": ["kids", "children", "toy", "cartoon", "animation", "disney"],
+        "cs": ["děti", "dětský", "dětská", "hračky", "pohádka"],
+        "sk": ["deti", "detský", "detská", "hračky", "rozprávka"]
+    },
+    "teen": {
+        "en": ["teen", "teenager", "gaming", "tiktok", "challenge"],
+        "cs": ["teen", "teenager", "hry", "výzva", "tiktok"],
+        "sk": ["teen", "teenager", "hry", "výzva", "tiktok"]
+    },
+    "serious": {
+        "en": ["news", "business", "science", "technology", "research"],
+        "cs": ["zprávy", "podnikání", "věda", "technologie"],
+        "sk": ["správy", "podnikanie", "veda", "technológia"]
+    }
+}
+
 # Funkce pro načtení klasifikačních slov
 def load_classification_words():
-    try:
-        with open('classification_words.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        # Výchozí klasifikační slova, pokud soubor neexistuje
-        return {
-            "kids": {
-                "en": ["kids", "children", "toy", "cartoon", "animation", "disney"],
-                "cs": ["děti", "dětský", "dětská", "hračky", "pohádka"],
-                "sk": ["deti", "detský", "detská", "hračky", "rozprávka"]
-            },
-            "teen": {
-                "en": ["teen", "teenager", "gaming", "tiktok", "challenge"],
-                "cs": ["teen", "teenager", "hry", "výzva", "tiktok"],
-                "sk": ["teen", "teenager", "hry", "výzva", "tiktok"]
-            },
-            "serious": {
-                "en": ["news", "business", "science", "technology", "research"],
-                "cs": ["zprávy", "podnikání", "věda", "technologie"],
-                "sk": ["správy", "podnikanie", "veda", "technológia"]
-            }
-        }
+    # Soubor se načte a zkompiluje jednou za proces, znovu jen po jeho změně.
+    # Sidebar slova upravuje na místě, proto se vrací kopie sdíleného balíčku.
+    return copy.deepcopy(load_keyword_pack(CLASSIFICATION_WORDS_PATH, DEFAULT_CLASSIFICATION_WORDS).words)
 
 # Funkce pro uložení klasifikačních slov
 def save_classification_words(words):
-    with open('classification_words.json', 'w', encoding='utf-8') as f:
+    with open(CLASSIFICATION_WORDS_PATH, 'w', encoding='utf-8') as f:
         json.dump(words, f, ensure_ascii=False, indent=4)
+    invalidate_keyword_pack(CLASSIFICATION_WORDS_PATH)
 
 # Funkce pro uložení API klíče
 def save_api_key(api_key):
     with open('api_key.txt', 'w') as f:
         f.write(api_key)
 
-# Funkce pro extrakci ID kanálu z URL
+# Funkce pro extrakci ID kanálu z URL (kanonický tvar, bez sledovacích parametrů)
 def extract_channel_id(url):
-    # Zkusit rozpoznat různé formáty URL
-    channel_id_patterns = [
-        r'youtube\.com\/channel\/([^\/\?]+)',  # https://www.youtube.com/channel/UC...
-        r'youtube\.com\/c\/([^\/\?]+)',        # https://www.youtube.com/c/...
-        r'youtube\.com\/user\/([^\/\?]+)',     # https://www.youtube.com/user/...
-        r'youtube\.com\/@([^\/\?]+)'           # https://www.youtube.com/@...
-    ]
-
-    for pattern in channel_id_patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    extracted = canonicalize_url(url)
+    if extracted and extracted['type'] == 'channel':
+        return extracted['id']
     return None
 
-# Funkce pro extrakci ID videa z URL
+# Funkce pro extrakci ID videa z URL (watch, youtu.be, embed, shorts, live)
 def extract_video_id(url):
-    # Zkusit rozpoznat různé formáty URL videa
-    video_id_patterns = [
-        r'youtube\.com\/watch\?v=([^&]+)',  # https://www.youtube.com/watch?v=...
-        r'youtu\.be\/([^\/\?]+)',           # https://youtu.be/...
-        r'youtube\.com\/embed\/([^\/\?]+)'  # https://www.youtube.com/embed/...
-    ]
-
-    for pattern in video_id_patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    extracted = canonicalize_url(url)
+    if extracted and extracted['type'] == 'video':
+        return extracted['id']
     return None
 
-# Funkce pro získání kanálu z ID videa
-def get_channel_from_video(youtube, video_id):
-    try:
-        video_response = youtube.videos().list(
-            part='snippet',
-            id=video_id
-        ).execute()
-
-        if video_response['items']:
-            channel_id = video_response['items'][0]['snippet']['channelId']
-            return channel_id
-        return None
-    except HttpError as e:
-        st.error(f"Chyba při získávání informací o videu: {e}")
-        return None
-
-# Funkce pro získání dat o kanálu
-def get_channel_data(youtube, channel_id):
+# Funkce pro zaúčtování volání do rozpočtu; False, pokud by ho překročilo
+def within_budget(budget, endpoint):
+    if budget is None:
+        return True
     try:
-        channel_response = youtube.channels().list(
-            part='snippet,statistics',
-            id=channel_id
-        ).execute()
+        budget.charge(endpoint)
+    except QuotaBudgetExceeded:
+        return False
+    return True
+
+# Funkce pro získání kanálů z ID videí (50 videí na jedno volání API)
+def get_channels_from_videos(youtube, video_ids, budget=None, cache=None):
+    def fetch(missing_ids):
+        video_channels = {}
+        for chunk in chunked(missing_ids):
+            # Při vyčerpání rozpočtu vrátit (a uložit do cache) videa načtená do té doby
+            if not within_budget(budget, 'videos'):
+                break
+            try:
+                video_response = youtube.videos().list(
+                    part='snippet',
+                    id=','.join(chunk),
+                    fields=fields_for('videos', 'snippet')
+                ).execute()
+
+                for item in video_response.get('items', []):
+                    video_channels[item['id']] = item['snippet']['channelId']
+            except HttpError as e:
+                st.error(f"Chyba při získávání informací o videu: {e}")
+        return video_channels
+
+    return read_through(cache, 'video_channel', video_ids, fetch)
+
+# Funkce pro převod @handle a uživatelských jmen na ID kanálů (1 jednotka za dotaz, nikdy search)
+def get_channels_from_handles(youtube, handle_keys, budget=None, cache=None):
+    def fetch(missing_keys):
+        items = {}
+        for key in missing_keys:
+            kind, name = key.split(':', 1)
+            # /c/ a /user/ jsou stará uživatelská jména, u novějších kanálů shodná s handle
+            lookups = ['forHandle'] if kind == 'handle' else ['forUsername', 'forHandle']
+            for lookup in lookups:
+                if not within_budget(budget, 'channels'):
+                    return items        # nalezené kanály do té doby
+                try:
+                    # Odpověď obsahuje celý kanál, není potřeba další volání
+                    response = youtube.channels().list(
+                        part=CHANNEL_PARTS,
+                        fields=fields_for('channels', CHANNEL_PARTS),
+                        **{lookup: name}
+                    ).execute()
+                except HttpError as e:
+                    st.error(f"Chyba při získávání informací o kanálu: {e}")
+                    break
+                if response.get('items'):
+                    items[key] = response['items'][0]
+                    break
+            else:
+                # Žádný dotaz kanál nenašel; uloží se jako neexistující, aby se znovu neplatil
+                items[key] = None
+        return items
 
-        if not channel_response['items']:
-            return None
+    mapping, _ = cached_handles(cache, handle_keys, fetch)
+    return mapping
 
-        channel_info = channel_response['items'][0]
+# Funkce pro získání kanálu z ID videa
+def get_channel_from_video(youtube, video_id):
+    return get_channels_from_videos(youtube, [video_id]).get(video_id)
+
+# Funkce pro získání dat o kanálech (50 kanálů na jedno volání API)
+def get_channels_data(youtube, channel_ids, budget=None, cache=None):
+    def fetch(missing_ids, part):
+        items = {}
+        for chunk in chunked(missing_ids):
+            if not within_budget(budget, 'channels'):
+                break
+            try:
+                # contentDetails obsahuje ID playlistu s nahranými videi, není potřeba další volání
+                channel_response = youtube.channels().list(
+                    part=part,
+                    id=','.join(chunk),
+                    fields=fields_for('channels', part)
+                ).execute()
+            except HttpError as e:
+                st.error(f"Chyba při získávání informací o kanálu: {e}")
+                continue
+
+            for channel_info in channel_response.get('items', []):
+                items[channel_info['id']] = channel_info
+        return items
+
+    channels = {}
+    channel_infos = cached_channels(cache, channel_ids, fetch)
+
+    for channel_id, channel_info in channel_infos.items():
         channel_data = {
             'id': channel_id,
             'title': channel_info['snippet']['title'],
@@ -136,39 +216,49 @@ def get_channel_data(youtube, channel_id):
         }
 
         # Získat poslední videa z kanálu
-        playlist_id = get_uploads_playlist_id(youtube, channel_id)
+        playlist_id = get_uploads_playlist_id(channel_info)
         if playlist_id:
-            videos = get_recent_videos(youtube, playlist_id, max_results=10)
+            videos = get_recent_videos(youtube, playlist_id, max_results=10, budget=budget, cache=cache)
+            # Kanál bez videí kvůli vyčerpanému rozpočtu se nevyhodnotí jen z názvu a popisu
+            if videos is None:
+                continue
             channel_data['recent_videos'] = videos
 
-        return channel_data
-    except HttpError as e:
-        st.error(f"Chyba při získávání informací o kanálu: {e}")
-        return None
+        channels[channel_id] = channel_data
+    return channels
 
-# Funkce pro získání ID playlistu s nahranými videi
-def get_uploads_playlist_id(youtube, channel_id):
-    try:
-        response = youtube.channels().list(
-            part='contentDetails',
-            id=channel_id
-        ).execute()
+# Funkce pro získání dat o kanálu
+def get_channel_data(youtube, channel_id, budget=None, cache=None):
+    return get_channels_data(youtube, [channel_id], budget, cache).get(channel_id)
 
-        if response['items']:
-            return response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
-        return None
-    except HttpError as e:
-        st.error(f"Chyba při získávání ID playlistu: {e}")
-        return None
+# Funkce pro získání ID playlistu s nahranými videi z odpovědi channels.list
+def get_uploads_playlist_id(channel_info):
+    return channel_info.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads')
 
-# Funkce pro získání posledních videí z playlistu
-def get_recent_videos(youtube, playlist_id, max_results=10):
-    try:
-        response = youtube.playlistItems().list(
+# Funkce pro získání posledních videí z playlistu; None, pokud na ně nezbyl rozpočet
+def get_recent_videos(youtube, playlist_id, max_results=10, budget=None, cache=None):
+    over_budget = []
+
+    def fetch(etag):
+        if not within_budget(budget, 'playlistItems'):
+            over_budget.append(playlist_id)
+            return None
+        request = youtube.playlistItems().list(
             part='snippet',
             playlistId=playlist_id,
-            maxResults=max_results
-        ).execute()
+            maxResults=max_results,
+            fields=fields_for('playlistItems', 'snippet')
+        )
+        # Prošlý záznam v mezipaměti se jen ověří, beze změny přijde 304 bez dat
+        if etag:
+            request.headers['If-None-Match'] = etag
+        try:
+            response = request.execute()
+        except HttpError as e:
+            if e.resp.status == 304:
+                return NOT_MODIFIED
+            st.error(f"Chyba při získávání videí: {e}")
+            return None
 
         videos = []
         for item in response.get('items', []):
@@ -180,10 +270,13 @@ def get_recent_videos(youtube, playlist_id, max_results=10):
             }
             videos.append(video_data)
 
-        return videos
-    except HttpError as e:
-        st.error(f"Chyba při získávání videí: {e}")
-        return []
+        return videos, response.get('etag')
+
+    key = f"{playlist_id}/{max_results}"
+    videos, _ = conditional_read(cache, 'playlist_items', key, fetch)
+    if over_budget:
+        return None
+    return videos or []
 
 # Funkce pro klasifikaci kanálu
 def classify_channel(channel_data, classification_words):
@@ -214,15 +307,13 @@ def classify_channel(channel_data, classification_words):
         'serious': 0
     }
 
-    # Projít všechny jazyky a klíčová slova
+    # Najít klíčová slova všech kategorií a jazyků jedním průchodem textem
+    matcher = keyword_matcher(classification_words)
+    present = matcher.count_present(text_to_analyze)
+    keywords = flatten_keywords(classification_words)
     for category in ['kids', 'teen', 'serious']:
-        for lang in ['en', 'cs', 'sk']:
-            keywords = classification_words[category][lang]
-            keyword_counts[category] += len(keywords)
-
-            for keyword in keywords:
-                if keyword.lower() in text_to_analyze:
-                    scores[category] += 1
+        keyword_counts[category] = len(keywords[category])
+        scores[category] = present[category]
 
     # Normalizovat skóre (převést na procenta)
     for category in scores:
@@ -243,41 +334,74 @@ def classify_channel(channel_data, classification_words):
     return result
 
 # Funkce pro zpracování URL nebo CSV souboru
-def process_urls(youtube, urls, classification_words):
+def process_urls(youtube, urls, classification_words, quota_budget=DAILY_QUOTA):
     results = []
+    budget = QuotaBudget(quota_budget)
+    cache = get_response_cache()
 
+    # Nejdřív převést URL na kanonický tvar, aby se každý kanál a video načetly jen jednou a po dávkách
+    index = UrlIndex()
     for url in urls:
-        if not url:
-            continue
-
-        channel_id = extract_channel_id(url)
-
-        # Pokud URL odkazuje na video, získat ID kanálu z videa
-        if not channel_id:
-            video_id = extract_video_id(url)
-            if video_id:
-                channel_id = get_channel_from_video(youtube, video_id)
-
-        if channel_id:
-            # Získat data o kanálu
-            channel_data = get_channel_data(youtube, channel_id)
-
-            if channel_data:
-                # Klasifikovat kanál
-                classification = classify_channel(channel_data, classification_words)
-
-                # Připravit výsledek
-                result = {
-                    'Channel Name': channel_data['title'],
-                    'URL': channel_data['url'],
-                    'Subscribers': channel_data['subscriberCount'],
-                    'Main Category': classification['main_category'].capitalize(),
-                    'Kids Score (%)': round(classification['kids_score'], 2),
-                    'Teen Score (%)': round(classification['teen_score'], 2),
-                    'Serious Score (%)': round(classification['serious_score'], 2)
-                }
-
-                results.append(result)
+        index.add(url)
+
+    # Odhad spotřeby kvóty ještě před prvním voláním API
+    video_ids = index.ids('video')
+    plan = estimate_run_cost(video_ids, index.ids('channel'),
+                             handles=index.ids('handle'), usernames=index.ids('username'))
+    st.info(f"📐 Odhad spotřeby kvóty: nejvýše {plan['units']} jednotek (rozpočet: {budget.limit}) · "
+            f"{len(index.entities)} unikátních kanálů a videí z {len(index.rows)} URL")
+
+    # Při vyčerpání rozpočtu vrátí každá fáze, co načetla do té doby, a další fáze pokračují s tím
+    # Pokud URL odkazuje na video, získat ID kanálu z videa (po dávkách)
+    video_channels = get_channels_from_videos(youtube, video_ids, budget, cache) if video_ids else {}
+
+    # @handle a uživatelská jména; nalezené kanály jsou už v cache, get_channels_data je znovu nenačítá
+    handle_keys = [key for key, extracted in index.entities.items() if extracted['type'] in ['handle', 'username']]
+    handle_channels = get_channels_from_handles(youtube, handle_keys, budget, cache) if handle_keys else {}
+
+    entity_channels = {}
+    for key, extracted in index.entities.items():
+        if extracted['type'] == 'video':
+            entity_channels[key] = video_channels.get(extracted['id'])
+        elif extracted['type'] == 'channel':
+            entity_channels[key] = extracted['id']
+        else:
+            entity_channels[key] = handle_channels.get(key)
+
+    # Získat data o všech kanálech (po dávkách)
+    channels = get_channels_data(youtube, [channel_id for channel_id in entity_channels.values() if channel_id], budget, cache)
+
+    # Výsledek pro každý řádek vstupu, i když se kanál opakuje
+    channel_ids = [entity_channels.get(key) for _, key in index.rows]
+
+    classifications = {}
+    for channel_id in channel_ids:
+        channel_data = channels.get(channel_id) if channel_id else None
+
+        if channel_data:
+            # Klasifikovat kanál (každý kanál jen jednou)
+            if channel_id not in classifications:
+                classifications[channel_id] = classify_channel(channel_data, classification_words)
+            classification = classifications[channel_id]
+
+            # Připravit výsledek
+            result = {
+                'Channel Name': channel_data['title'],
+                'URL': channel_data['url'],
+                'Subscribers': channel_data['subscriberCount'],
+                'Main Category': classification['main_category'].capitalize(),
+                'Kids Score (%)': round(classification['kids_score'], 2),
+                'Teen Score (%)': round(classification['teen_score'], 2),
+                'Serious Score (%)': round(classification['serious_score'], 2)
+            }
+
+            results.append(result)
+
+    # Až po načtení posledních videí, rozpočet mohla vyčerpat i ta
+    if budget.exhausted:
+        st.warning(f"⚠️ Rozpočet {budget.limit} jednotek kvóty byl vyčerpán ({budget.spent} spotřebováno): "
+                   f"{len(index.rows) - len(results)} z {len(index.rows)} URL zůstalo nevyhodnoceno. "
+                   f"Výsledky obsahují jen kanály načtené celé, včetně posledních videí.")
 
     return pd.DataFrame(results)
 
@@ -309,6 +433,15 @@ def main():
             api_key = new_api_key
             st.success("API klíč byl uložen!")
 
+        # Rozpočet kvóty pro jednu analýzu
+        quota_budget = st.number_input(
+            "Rozpočet kvóty na analýzu (jednotky)",
+            min_value=1,
+            value=DAILY_QUOTA,
+            step=100,
+            help="Analýza se zastaví před překročením rozpočtu"
+        )
+
         # Sekce pro úpravu klasifikačních slov
         st.subheader("Klasifikační slova")
 
@@ -343,8 +476,8 @@ def main():
         st.warning("⚠️ Prosím, zadejte YouTube Data API klíč v postranním panelu.")
         st.stop()
 
-    # Inicializace YouTube API klienta
-    youtube = build('youtube', 'v3', developerKey=api_key)
+    # YouTube API klient z cache, při dalších spuštěních skriptu se znovu nesestavuje
+    youtube = get_youtube_client(api_key)
 
     # Záložky pro různé možnosti vstupu
     tab1, tab2, tab3 = st.tabs(["🔗 URL Kanálu/Videa", "📁 CSV Soubor", "📊 Výsledky"])
@@ -361,7 +494,7 @@ def main():
         if st.button("Analyzovat URL", key="analyze_url"):
             if url_input:
                 with st.spinner("Analyzuji kanál..."):
-                    results_df = process_urls(youtube, [url_input], classification_words)
+                    results_df = process_urls(youtube, [url_input], classification_words, quota_budget)
 
                     if not results_df.empty:
                         st.session_state['results_df'] = results_df
@@ -397,7 +530,7 @@ def main():
 
                     if urls:
                         with st.spinner(f"Analyzuji {len(urls)} kanálů..."):
-                            results_df = process_urls(youtube, urls, classification_words)
+                            results_df = process_urls(youtube, urls, classification_words, quota_budget)
 
                             if not results_df.empty:
                                 st.session_state['results_df'] = results_df
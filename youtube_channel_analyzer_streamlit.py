@@ -1,11 +1,42 @@
 import streamlit as st
 import pandas as pd
-import requests
+import itertools
 import json
-import time
 import os
-from datetime import datetime
-import re
+import time
+
+from youtube_analyzer.analyzer import YouTubeAnalyzer
+from youtube_analyzer.cache import ResponseCache
+from youtube_analyzer.concurrency import DEFAULT_MAX_WORKERS, DEFAULT_REQUESTS_PER_SECOND, TokenBucket
+from youtube_analyzer.corpus import CorpusStore, rescore_rows
+from youtube_analyzer.ingest import read_column, sniff_csv
+from youtube_analyzer.keywords import (
+    CLASSIFICATION_WORDS_PATH, DEFAULT_CLASSIFICATION_WORDS, invalidate_keyword_pack, load_keyword_pack
+)
+from youtube_analyzer.jobs import CANCELLED, DONE, FAILED, PAUSED, QUEUED, RUNNING, Job, JobRunner
+from youtube_analyzer.journal import JobJournal, list_jobs
+from youtube_analyzer.keys import KeyPool, split_keys
+from youtube_analyzer.pipeline import RESULT_COLUMNS, analyze_job, parse_urls
+from youtube_analyzer.quota import DAILY_QUOTA, QuotaBudget, estimate_run_cost
+from youtube_analyzer.results_store import PAGE_SIZE, ResultsStore
+from youtube_analyzer.retry import CircuitBreaker, RetryPolicy
+from youtube_analyzer.singleflight import SingleFlight
+from youtube_analyzer.transport import Transport, stats_delta
+
+# Upper limit of the concurrency slider, also the size of the shared connection pool
+MAX_WORKERS = 32
+
+# Invalid URLs warned about one by one; the rest are only counted
+MAX_URL_WARNINGS = 20
+
+JOB_STATUS_LABELS = {
+    QUEUED: "⏳ Ve frontě",
+    RUNNING: "▶️ Běží",
+    DONE: "✅ Hotovo",
+    PAUSED: "⏸️ Pozastaveno (kvóta)",
+    CANCELLED: "⏹️ Zrušeno",
+    FAILED: "❌ Selhalo"
+}
 
 # Configuration
 st.set_page_config(
@@ -14,212 +45,86 @@ st.set_page_config(
     layout="wide"
 )
 
-class YouTubeAnalyzer:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.base_url = "https://www.googleapis.com/youtube/v3"
-
-    def extract_channel_info(self, url):
-        """Extract channel ID or video ID from various YouTube URL formats"""
-        patterns = [
-            (r'youtube\.com/channel/([a-zA-Z0-9_-]+)', 'channel'),
-            (r'youtube\.com/c/([a-zA-Z0-9_-]+)', 'username'),
-            (r'youtube\.com/user/([a-zA-Z0-9_-]+)', 'username'),
-            (r'youtube\.com/@([a-zA-Z0-9_-]+)', 'channel'),
-            (r'youtube\.com/watch\?v=([a-zA-Z0-9_-]+)', 'video'),
-            (r'youtu\.be/([a-zA-Z0-9_-]+)', 'video'),
-            (r'youtube\.com/embed/([a-zA-Z0-9_-]+)', 'video')
-        ]
-
-        for pattern, type_name in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return {'id': match.group(1), 'type': type_name}
-        return None
-
-    def get_channel_by_id(self, channel_id):
-        """Get channel data by channel ID"""
-        try:
-            url = f"{self.base_url}/channels"
-            params = {
-                'part': 'snippet,statistics',
-                'id': channel_id,
-                'key': self.api_key
-            }
-            response = requests.get(url, params=params)
-
-            # Check for API errors
-            if response.status_code == 403:
-                error_data = response.json()
-                if 'quotaExceeded' in str(error_data):
-                    st.error("🚨 **YouTube API kvóta byla vyčerpána!** Zkuste to zítra nebo použijte jiný API klíč.")
-                    return None
-                else:
-                    st.error(f"🚨 **API chyba 403:** {error_data.get('error', {}).get('message', 'Neznámá chyba')}")
-                    return None
-            elif response.status_code == 400:
-                error_data = response.json()
-                st.error(f"🚨 **Neplatná URL nebo parametry:** {error_data.get('error', {}).get('message', 'Zkontrolujte formát URL')}")
-                return None
-            elif response.status_code != 200:
-                st.error(f"🚨 **YouTube API chyba {response.status_code}:** Zkuste to později")
-                return None
-
-            data = response.json()
-            return data.get('items', [None])[0]
-        except requests.exceptions.RequestException as e:
-            st.error(f"🚨 **Chyba připojení:** {str(e)}")
-            return None
-        except Exception as e:
-            st.error(f"🚨 **Neočekávaná chyba:** {str(e)}")
-            return None
-
-    def get_video_info(self, video_id):
-        """Get video data and extract channel ID"""
-        try:
-            url = f"{self.base_url}/videos"
-            params = {
-                'part': 'snippet',
-                'id': video_id,
-                'key': self.api_key
-            }
-            response = requests.get(url, params=params)
-
-            # Check for API errors
-            if response.status_code == 403:
-                error_data = response.json()
-                if 'quotaExceeded' in str(error_data):
-                    st.error("🚨 **YouTube API kvóta byla vyčerpána!** Zkuste to zítra nebo použijte jiný API klíč.")
-                    return None
-                else:
-                    st.error(f"🚨 **API chyba 403:** {error_data.get('error', {}).get('message', 'Neznámá chyba')}")
-                    return None
-            elif response.status_code != 200:
-                st.error(f"🚨 **YouTube API chyba {response.status_code}:** Zkuste to později")
-                return None
-
-            data = response.json()
-            video = data.get('items', [None])[0]
-            if video:
-                return video['snippet']['channelId']
-            return None
-        except Exception as e:
-            st.error(f"🚨 **Chyba při získávání video dat:** {str(e)}")
-            return None
-
-    def get_channel_videos(self, channel_id, max_results=5):
-        """Get recent videos from channel"""
-        try:
-            url = f"{self.base_url}/search"
-            params = {
-                'part': 'snippet',
-                'channelId': channel_id,
-                'type': 'video',
-                'order': 'date',
-                'maxResults': max_results,
-                'key': self.api_key
-            }
-            response = requests.get(url, params=params)
-
-            if response.status_code == 403:
-                error_data = response.json()
-                if 'quotaExceeded' in str(error_data):
-                    st.error("🚨 **YouTube API kvóta byla vyčerpána!** Zkuste to zítra nebo použijte jiný API klíč.")
-                    return []
-            elif response.status_code != 200:
-                return []
-
-            data = response.json()
-            return data.get('items', [])
-        except Exception:
-            return []
-
-def load_api_key():
-    """Load API key from various sources"""
+@st.cache_resource
+def get_response_cache():
+    """On-disk API response cache shared by all sessions of this process"""
+    return ResponseCache()
+
+@st.cache_resource
+def get_corpus_store():
+    """Texts of analyzed channels, re-scored locally when the classification words change"""
+    return CorpusStore()
+
+@st.cache_resource
+def get_results_store():
+    """Parquet store of all runs' results, partitioned by run date"""
+    return ResultsStore()
+
+@st.cache_resource
+def get_transport():
+    """Pooled API transport, rate limiter, retries and circuit breaker shared by all sessions and background jobs"""
+    return Transport(pool_size=MAX_WORKERS, rate_limiter=TokenBucket(DEFAULT_REQUESTS_PER_SECOND),
+                     retry=RetryPolicy(), breaker=CircuitBreaker())
+
+@st.cache_resource
+def get_single_flight():
+    """In-flight API reads and recent results shared by all sessions, so no ID is fetched twice at once"""
+    return SingleFlight()
+
+@st.cache_resource
+def get_job_runner():
+    """Background job runner shared by all sessions, so reruns don't stop running analyses"""
+    return JobRunner()
+
+@st.cache_resource
+def get_key_pool(api_keys):
+    """Per-key quota accounting shared by all sessions using the same keys"""
+    return KeyPool(api_keys)
+
+def load_api_keys():
+    """Load API keys from various sources, one key per Google Cloud project"""
     # Try Streamlit secrets first
+    keys = []
+    if 'youtube_api_keys' in st.secrets:
+        configured = st.secrets['youtube_api_keys']
+        keys += split_keys(configured) if isinstance(configured, str) else list(configured)
     if 'youtube_api_key' in st.secrets:
-        return st.secrets['youtube_api_key']
+        keys.append(st.secrets['youtube_api_key'])
+    if keys:
+        return keys
 
-    # Try local file
+    # Try local file, one key per line
     if os.path.exists('api_key.txt'):
         try:
             with open('api_key.txt', 'r') as f:
-                key = f.read().strip()
-                if key and key != 'YOUR_YOUTUBE_DATA_API_KEY_HERE':
-                    return key
+                return [key for key in split_keys(f.read()) if key != 'YOUR_YOUTUBE_DATA_API_KEY_HERE']
         except:
             pass
 
-    return None
+    return []
 
-def load_classification_words():
-    """Load classification words from file or defaults"""
-    default_words = {
-        'kids': ['kids', 'children', 'toys', 'cartoon', 'animation', 'disney', 'nursery', 'děti', 'dětský', 'hračky', 'pohádky', 'animace', 'animovaný', 'kreslený', 'detský', 'rozprávky', 'detské'],
-        'teen': ['teen', 'gaming', 'minecraft', 'fortnite', 'tiktok', 'challenge', 'prank', 'vlog', 'youtuberi', 'youtuber', 'gaming', 'hry', 'challenge', 'výzva', 'teenage', 'teenageři', 'mladí', 'mládež'],
-        'serious': ['news', 'business', 'science', 'technology', 'education', 'documentary', 'research', 'university', 'zprávy', 'věda', 'technologie', 'vzdělávání', 'univerzita', 'výzkum', 'business', 'správy', 'veda', 'technológie', 'vzdelávanie', 'univerzita', 'výskum']
-    }
+def show_key_usage(usage):
+    """Table of today's estimated quota usage per API key"""
+    usage = pd.DataFrame(usage).rename(columns={
+        'key': 'Klíč', 'calls': 'Volání', 'spent': 'Spotřebováno', 'remaining': 'Zbývá', 'exhausted': 'Vyčerpán'
+    })
+    st.dataframe(usage, hide_index=True, use_container_width=True)
 
-    if os.path.exists('classification_words.json'):
-        try:
-            with open('classification_words.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            pass
-
-    return default_words
+def load_classification_words():
+    """Load classification words from file or defaults as a compiled keyword pack"""
+    # Parsed and compiled once per process, rebuilt only when the file changes
+    return load_keyword_pack(CLASSIFICATION_WORDS_PATH, DEFAULT_CLASSIFICATION_WORDS)
 
 def save_classification_words(words):
     """Save classification words to file"""
     try:
-        with open('classification_words.json', 'w', encoding='utf-8') as f:
+        with open(CLASSIFICATION_WORDS_PATH, 'w', encoding='utf-8') as f:
             json.dump(words, f, ensure_ascii=False, indent=2)
+        invalidate_keyword_pack(CLASSIFICATION_WORDS_PATH)
         return True
     except:
         return False
 
-def classify_channel(channel_data, videos, classification_words):
-    """Classify channel based on content"""
-    if not channel_data:
-        return {'kids': 0, 'teen': 0, 'serious': 0, 'primary_category': 'Unknown'}
-
-    # Combine text from channel and videos
-    text_parts = [
-        channel_data['snippet']['title'],
-        channel_data['snippet']['description']
-    ]
-
-    for video in videos:
-        text_parts.append(video['snippet']['title'])
-        text_parts.append(video['snippet']['description'])
-
-    text = ' '.join(text_parts).lower()
-
-    # Count keyword matches
-    scores = {'kids': 0, 'teen': 0, 'serious': 0}
-
-    for word in classification_words['kids']:
-        scores['kids'] += len(re.findall(re.escape(word.lower()), text))
-
-    for word in classification_words['teen']:
-        scores['teen'] += len(re.findall(re.escape(word.lower()), text))
-
-    for word in classification_words['serious']:
-        scores['serious'] += len(re.findall(re.escape(word.lower()), text))
-
-    # Normalize scores
-    total = sum(scores.values()) or 1
-    normalized_scores = {k: round((v / total) * 100) for k, v in scores.items()}
-
-    # Determine primary category
-    max_score = max(normalized_scores.values())
-    if max_score > 40:
-        primary_category = max(normalized_scores, key=normalized_scores.get).title()
-    else:
-        primary_category = 'Mixed'
-
-    return {**normalized_scores, 'primary_category': primary_category}
-
 # Main app
 def main():
     st.title("🎬 YouTube Channel Analyzer")
@@ -231,40 +136,63 @@ def main():
 
         # API Key section
         st.subheader("🔑 API Klíč")
-        saved_api_key = load_api_key()
+        saved_api_keys = load_api_keys()
 
-        if saved_api_key:
-            st.success("✅ API klíč načten automaticky")
-            api_key = saved_api_key
+        if saved_api_keys:
+            st.success(f"✅ Načteno API klíčů: {len(saved_api_keys)}")
+            api_keys = saved_api_keys
             if st.button("📝 Změnit API klíč"):
                 st.session_state.show_api_input = True
         else:
             st.session_state.show_api_input = True
 
-        if st.session_state.get('show_api_input', False) or not saved_api_key:
-            api_key = st.text_input("YouTube Data API klíč:", type="password", 
-                                   help="Získejte klíč z Google Cloud Console")
-            if api_key and st.button("💾 Uložit klíč"):
+        if st.session_state.get('show_api_input', False) or not saved_api_keys:
+            api_keys = split_keys(st.text_input("YouTube Data API klíč:", type="password",
+                                                help="Získejte klíč z Google Cloud Console. Klíče více "
+                                                     "projektů oddělte čárkou, kvóty se sčítají."))
+            if api_keys and st.button("💾 Uložit klíč"):
                 with open('api_key.txt', 'w') as f:
-                    f.write(api_key)
+                    f.write('\n'.join(api_keys))
                 st.success("✅ API klíč uložen!")
                 st.session_state.show_api_input = False
                 st.rerun()
 
+        if api_keys:
+            key_pool = get_key_pool(tuple(api_keys))
+            with st.expander("📊 Využití klíčů dnes"):
+                show_key_usage(key_pool.usage())
+
+        # Quota budget section
+        st.subheader("📐 Kvóta")
+        quota_budget = st.number_input("Rozpočet kvóty na analýzu (jednotky):",
+                                       min_value=1, value=DAILY_QUOTA, step=100,
+                                       help="Analýza se zastaví před překročením rozpočtu")
+
+        # Concurrency section
+        st.subheader("⚡ Souběžnost")
+        max_workers = st.slider("Souběžné požadavky:", min_value=1, max_value=MAX_WORKERS,
+                                value=DEFAULT_MAX_WORKERS)
+        requests_per_second = st.number_input("Limit požadavků za sekundu:", min_value=1,
+                                              max_value=100, value=DEFAULT_REQUESTS_PER_SECOND,
+                                              help="Sdílený všemi běžícími úlohami")
+
         # Classification words section
         st.subheader("🏷️ Klasifikační slova")
         classification_words = load_classification_words()
 
         kids_words = st.text_area("Dětské kanály:", 
-                                 value=', '.join(classification_words['kids']),
+                                 value=', '.join(classification_words.words['kids']),
                                  height=100)
         teen_words = st.text_area("Teen kanály:", 
-                                 value=', '.join(classification_words['teen']),
+                                 value=', '.join(classification_words.words['teen']),
                                  height=100)
         serious_words = st.text_area("Seriózní obsah:", 
-                                    value=', '.join(classification_words['serious']),
+                                    value=', '.join(classification_words.words['serious']),
                                     height=100)
 
+        word_boundary = st.checkbox("🔤 Počítat jen celá slova",
+                                    help="Např. „teen“ se pak nezapočítá ve slově „canteen“")
+
         if st.button("💾 Uložit klasifikační slova"):
             new_words = {
                 'kids': [w.strip() for w in kids_words.split(',') if w.strip()],
@@ -273,22 +201,31 @@ def main():
             }
             if save_classification_words(new_words):
                 st.success("✅ Slova uložena!")
+                rescore_corpus(word_boundary)
             else:
                 st.error("❌ Chyba při ukládání")
+        stored_channels = len(get_corpus_store())
+        if stored_channels:
+            st.caption(f"Po uložení se {stored_channels} již analyzovaných kanálů přepočítá bez volání API")
+
+    # Category changes after the last save of the classification words
+    if st.session_state.get('rescore'):
+        show_rescore(st.session_state.rescore)
 
     # Main content
-    if not locals().get('api_key'):
+    if not locals().get('api_keys'):
         st.error("⚠️ Zadejte YouTube Data API klíč v postranním panelu")
         return
 
     # Input tabs
-    tab1, tab2 = st.tabs(["📝 Ruční zadání URL", "📊 CSV soubor"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 Ruční zadání URL", "📊 CSV soubor", "⏳ Úlohy", "📚 Historie"])
 
     with tab1:
         st.subheader("YouTube URL (kanály nebo videa)")
         st.markdown("Zadejte URL oddělené novými řádky. Podporované formáty:")
         st.code("""https://www.youtube.com/@channel
 https://www.youtube.com/channel/UC...
+https://www.youtube.com/user/NAME
 https://www.youtube.com/watch?v=VIDEO_ID
 https://youtu.be/VIDEO_ID""")
 
@@ -301,7 +238,8 @@ https://youtu.be/VIDEO_ID""")
             if url_input:
                 urls = [url.strip() for url in url_input.split('\n') if url.strip()]
                 if urls:
-                    analyze_urls(urls, api_key, classification_words)
+                    analyze_urls(urls, key_pool, classification_words, quota_budget,
+                                 max_workers, requests_per_second, word_boundary)
                 else:
                     st.warning("⚠️ Zadejte alespoň jednu platnou URL")
             else:
@@ -309,124 +247,410 @@ https://youtu.be/VIDEO_ID""")
 
     with tab2:
         st.subheader("CSV soubor z Google Ads")
-        uploaded_file = st.file_uploader("Vyberte CSV soubor", type=['csv'])
+        uploaded_file = st.file_uploader("Vyberte CSV soubor", type=['csv', 'gz', 'zip'],
+                                         help="Také komprimovaný jako .csv.gz nebo .zip")
 
         if uploaded_file:
             try:
-                df = pd.read_csv(uploaded_file)
+                # Only the first block is parsed for the preview and the column picker; the upload
+                # is read in place (each read seeks back to its start), never copied whole
+                layout = sniff_csv(uploaded_file)
                 st.write("📋 Náhled dat:")
-                st.dataframe(df.head())
+                st.dataframe(layout.preview)
 
-                url_column = st.selectbox("Vyberte sloupec s YouTube URL:", df.columns)
+                url_column = st.selectbox("Vyberte sloupec s YouTube URL:", layout.columns)
 
                 if st.button("🚀 Analyzovat CSV", type="primary"):
-                    urls = df[url_column].dropna().astype(str).tolist()
-                    urls = [url.strip() for url in urls if url.strip() and url != 'nan']
-                    if urls:
-                        analyze_urls(urls, api_key, classification_words)
+                    # Only the chosen column is read, block by block, straight into the job's journal
+                    urls = read_column(uploaded_file, url_column, layout)
+                    first = next(urls, None)
+                    if first is not None:
+                        analyze_urls(itertools.chain([first], urls), key_pool, classification_words, quota_budget,
+                                     max_workers, requests_per_second, word_boundary,
+                                     source=uploaded_file.name)
                     else:
                         st.warning("⚠️ Ve vybraném sloupci nejsou žádné platné URL")
             except Exception as e:
                 st.error(f"❌ Chyba při načítání CSV: {str(e)}")
 
-def analyze_urls(urls, api_key, classification_words):
-    """Analyze list of URLs"""
-    analyzer = YouTubeAnalyzer(api_key)
-    results = []
-
-    # Progress tracking
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    for i, url in enumerate(urls):
-        progress = (i + 1) / len(urls)
-        progress_bar.progress(progress)
-        status_text.text(f"Analyzuji {i + 1}/{len(urls)}: {url[:50]}...")
-
+    with tab3:
+        st.subheader("Úlohy na pozadí")
+        st.markdown("Analýzy běží na pozadí, můžete je sledovat z libovolné relace.")
+        runner = get_job_runner()
+        jobs = runner.jobs()
+        for job in jobs:
+            col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+            with col1:
+                st.write(f"**{job.label}** · {job.id}")
+            with col2:
+                st.write(f"{JOB_STATUS_LABELS[job.status]} · {job.done}/{job.total} URL")
+            with col3:
+                if st.button("👁️ Zobrazit", key=f"show_{job.id}"):
+                    st.session_state.job_id = job.id
+            with col4:
+                if not job.is_finished and st.button("⏹️ Zrušit", key=f"cancel_{job.id}"):
+                    job.cancel()
+        if not jobs:
+            st.info("Žádné úlohy")
+
+        st.subheader("Pokračovat v přerušené analýze")
+        st.markdown("Hotová část úlohy se znovu neplatí, analýza pokračuje od první nedokončené URL.")
+        active = {job.id for job in jobs if not job.is_finished}
+        unfinished = [job for job in list_jobs() if job['status'] != 'done' and job.get('total')
+                      and job['id'] not in active]
+
+        if unfinished:
+            job_id = st.selectbox("ID úlohy:", [job['id'] for job in unfinished],
+                                  format_func=lambda job_id: next(
+                                      f"{job['id']} ({job['total']} URL, {job.get('source') or 'ruční zadání'})"
+                                      for job in unfinished if job['id'] == job_id
+                                  ))
+            if st.button("▶️ Pokračovat v úloze", type="primary"):
+                try:
+                    journal = JobJournal.open(job_id)
+                except FileNotFoundError:
+                    st.error(f"❌ Úloha {job_id} neexistuje")
+                else:
+                    analyze_urls(None, key_pool, classification_words, quota_budget,
+                                 max_workers, requests_per_second, word_boundary,
+                                 source=journal.header.get('source'), journal=journal)
+        else:
+            st.info("Žádné nedokončené úlohy")
+
+    with tab4:
+        show_history()
+
+    # Failed rows of a finished job, queued again by its retry button
+    retry = st.session_state.pop('retry', None)
+    if retry:
+        analyze_urls(retry['urls'], key_pool, classification_words, quota_budget,
+                     max_workers, requests_per_second, word_boundary, source=retry['source'])
+
+    # The job of this session, running or finished, or a stored run opened from the history
+    if st.session_state.get('job_id'):
+        show_job(st.session_state.job_id)
+    elif st.session_state.get('run'):
+        display_results(st.session_state.run)
+
+def analyze_urls(urls, key_pool, classification_words, quota_budget=DAILY_QUOTA,
+                 max_workers=DEFAULT_MAX_WORKERS, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 word_boundary=False, source=None, journal=None):
+    """Queue analysis of URLs as a background job, journaled so it can be resumed
+
+    `urls` may be any iterable, read once into the journal; the job reads
+    them back from there batch by batch. A resumed job passes its journal
+    and no URLs.
+    """
+    budget = QuotaBudget(quota_budget)
+    journal = journal or JobJournal.create(urls, source=source)
+    transport = get_transport()
+    transport.rate_limiter.set_rate(requests_per_second)
+
+    # One pass over all URLs keeping only the unique channels and videos, for the estimate
+    warnings = []
+
+    def warn(message):
+        if len(warnings) < MAX_URL_WARNINGS:
+            warnings.append(message)
+
+    index = parse_urls(journal.iter_urls(), warn, keep_rows=False)
+    for message in warnings:
+        st.warning(message)
+    if index.invalid > len(warnings):
+        st.warning(f"⚠️ … a dalších {index.invalid - len(warnings)} neplatných URL")
+
+    # Pre-flight quota estimate before any call is made; finished work of a resumed job is free
+    plan = estimate_run_cost(index.ids('video', journal.results), index.ids('channel', journal.results),
+                             handles=index.ids('handle', journal.results),
+                             usernames=index.ids('username', journal.results))
+    st.info(f"📐 Odhad spotřeby kvóty: nejvýše {plan['units']} jednotek (rozpočet běhu: {budget.limit}) · "
+            f"{len(index.entities)} unikátních kanálů a videí z {index.count} URL · "
+            f"úloha {journal.job_id}")
+    if plan['units'] > budget.limit:
+        st.warning("⚠️ Odhad překračuje rozpočet, analýza se zastaví po jeho vyčerpání")
+
+    job = Job(journal.job_id, label=source or "Ruční zadání", total=index.count)
+    store = get_results_store()
+    # Errors are collected on the job, the background thread can't draw Streamlit elements
+    analyzer = YouTubeAnalyzer(key_pool, transport=transport, budget=budget, cache=get_response_cache(),
+                               max_workers=max_workers, on_error=job.errors.append, corpus=get_corpus_store(),
+                               flights=get_single_flight())
+
+    def run(job):
+        stats_before = transport.stats.snapshot()
+        # Rows go to disk batch by batch as they are classified; the job keeps only counts and the latest rows
+        writer = store.writer(job.id)
         try:
-            # Extract channel info
-            extracted = analyzer.extract_channel_info(url)
-            if not extracted:
-                st.warning(f"⚠️ Neplatná URL: {url}")
-                continue
-
-            channel_id = extracted['id']
-
-            # If it's a video, get channel ID
-            if extracted['type'] == 'video':
-                channel_id = analyzer.get_video_info(extracted['id'])
-                if not channel_id:
-                    continue
-            elif extracted['type'] in ['username', 'handle']:
-                # For usernames and handles, we need to search
-                st.warning(f"⚠️ Nepodporovaný formát URL (použijte Channel ID): {url}")
-                continue
-
-            # Get channel data
-            channel_data = analyzer.get_channel_by_id(channel_id)
-            if not channel_data:
-                continue
-
-            # Get recent videos
-            videos = analyzer.get_channel_videos(channel_id)
-
-            # Classify
-            classification = classify_channel(channel_data, videos, classification_words)
-
-            # Store result
-            result = {
-                'URL': url,
-                'Channel Title': channel_data['snippet']['title'],
-                'Subscribers': int(channel_data['statistics'].get('subscriberCount', 0)),
-                'Videos': int(channel_data['statistics'].get('videoCount', 0)),
-                'Views': int(channel_data['statistics'].get('viewCount', 0)),
-                'Primary Category': classification['primary_category'],
-                'Kids %': classification['kids'],
-                'Teen %': classification['teen'],
-                'Serious %': classification['serious']
+            analyze_job(job, analyzer, journal.iter_urls(), classification_words, word_boundary, journal,
+                        sink=writer.write)
+        finally:
+            job.summary = {
+                'units': budget.spent,
+                'traffic': stats_delta(stats_before, transport.stats.snapshot())['total'],
+                'keys': key_pool.usage(),
+                'metrics': analyzer.metrics,
+                'run': None
             }
-            results.append(result)
-
-        except Exception as e:
-            st.error(f"❌ Chyba při analýze {url}: {str(e)}")
-
-        # Small delay to respect API limits
-        time.sleep(0.1)
+            # Sessions keep only the handle of the finished run
+            if writer.rows:
+                job.summary['run'] = writer.close()
+            else:
+                writer.abort()
+            job.results = []
+
+    get_job_runner().submit(job, run)
+    st.session_state.job_id = job.id
+    st.session_state.run = None
+
+def rescore_corpus(word_boundary):
+    """Re-score all stored channel texts with the saved words and refresh this session's results"""
+    corpus = get_corpus_store()
+    start = time.perf_counter()
+    classifications, changes = corpus.rescore(load_classification_words(), word_boundary)
+    job = get_job_runner().get(st.session_state.get('job_id')) if st.session_state.get('job_id') else None
+    handle = job.summary.get('run') if job is not None and job.is_finished else st.session_state.get('run')
+    if handle is not None:
+        store = get_results_store()
+        rows = rescore_rows(store.read(handle).to_dict('records'), classifications, corpus.entity_channels())
+        handle = store.write_run(handle.run_id, rows, run_at=handle.run_at)
+        if job is not None and job.is_finished:
+            job.summary['run'] = handle
+        else:
+            st.session_state.run = handle
+    st.session_state.rescore = {
+        'channels': len(classifications),
+        'changes': changes,
+        'seconds': time.perf_counter() - start
+    }
 
-    # Clear progress
-    progress_bar.empty()
-    status_text.empty()
+def show_rescore(rescore):
+    """Summary and diff of categories changed by the last re-scoring"""
+    changes = rescore['changes']
+    st.info(f"🔁 Přepočítáno {rescore['channels']} uložených kanálů za {rescore['seconds'] * 1000:.0f} ms "
+            f"bez volání API · kategorie se změnila u {len(changes)} kanálů")
+    if len(changes):
+        with st.expander("🔀 Kanály se změněnou kategorií", expanded=True):
+            st.dataframe(changes, hide_index=True, use_container_width=True)
+
+def show_job(job_id):
+    """Show a background job: live progress while it runs, results once it has finished"""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        # Forgotten by the runner; its results are still in the store
+        st.session_state.job_id = None
+        if st.session_state.get('run'):
+            display_results(st.session_state.run)
+        return
+    if job.is_finished:
+        st.session_state.run = job.summary.get('run')
+        display_job(job)
+    else:
+        job_progress(job_id)
+
+@st.fragment(run_every=1)
+def job_progress(job_id):
+    """Progress and partial results of a running job, refreshed every second"""
+    job = get_job_runner().get(job_id)
+    if job is None or job.is_finished:
+        # Rerun the whole page to show the final results
+        st.rerun()
+
+    st.progress(job.progress, text=f"{JOB_STATUS_LABELS[job.status]} · úloha {job.id} · "
+                                   f"{job.done}/{job.total} URL")
+    st.text(job.stage)
+    paused = get_transport().breaker.paused_for
+    if paused:
+        st.warning(f"⏸️ API hlásí opakované chyby, analýza je pozastavena a za {paused:.0f} s to zkusí znovu")
+    if st.button("⏹️ Zrušit analýzu", key=f"cancel_running_{job.id}"):
+        job.cancel()
+    if job.rows:
+        # Updated in place every second while batches stream in
+        show_category_metrics(job.categories)
+        recent = job.results
+        st.caption(f"Průběžné výsledky: {job.rows} kanálů, nejnovějších {len(recent)} nahoře")
+        st.dataframe(pd.DataFrame(recent, columns=RESULT_COLUMNS).iloc[::-1], hide_index=True,
+                     use_container_width=True, height=300)
+
+def display_job(job):
+    """Display the outcome of a finished job"""
+    # Errors collected from worker threads, each distinct message once
+    for message in dict.fromkeys(job.errors):
+        st.error(message)
+
+    if job.status == PAUSED:
+        st.warning(f"⏸️ Úloha {job.id} nebyla dokončena. Hotové výsledky jsou uložené, "
+                   f"pokračujte později na kartě „⏳ Úlohy“.")
+    elif job.status == CANCELLED:
+        st.warning(f"⏹️ Úloha {job.id} byla zrušena. Pokračovat v ní můžete na kartě „⏳ Úlohy“.")
+
+    if job.failed:
+        st.warning(f"🔁 {len(job.failed)} URL se nepodařilo načíst kvůli dočasným chybám API, "
+                   f"ostatní výsledky jsou kompletní.")
+        if st.button(f"🔁 Zkusit znovu jen neúspěšné URL ({len(job.failed)})", key=f"retry_{job.id}"):
+            st.session_state.retry = {'urls': job.failed, 'source': f"Opakování úlohy {job.id}"}
+            st.rerun()
+
+    if job.summary:
+        traffic = job.summary['traffic']
+        average_latency = traffic['latency'] / traffic['calls'] * 1000 if traffic['calls'] else 0
+        st.caption(f"Spotřebováno {job.summary['units']} jednotek kvóty · {traffic['calls']} volání API · "
+                   f"přeneseno {traffic['wire_bytes'] / 1024:.1f} kB "
+                   f"({traffic['body_bytes'] / 1024:.1f} kB po dekompresi) · "
+                   f"průměrná latence {average_latency:.0f} ms")
+        show_revalidation(job.summary['metrics'].snapshot())
+        if len(job.summary['keys']) > 1:
+            show_key_usage(job.summary['keys'])
 
     # Display results
-    if results:
-        display_results(results)
+    metrics = job.summary.get('metrics')
+    if job.summary.get('run'):
+        # Render is timed once per job; reruns from widget clicks mustn't change its metrics
+        if metrics is not None and not job.summary.get('render_timed'):
+            job.summary['render_timed'] = True
+            with metrics.stage('render'):
+                display_results(job.summary['run'])
+        else:
+            display_results(job.summary['run'])
     else:
         st.warning("⚠️ Žádné výsledky k zobrazení")
 
-def display_results(results):
-    """Display analysis results"""
-    st.success(f"✅ Analýza dokončena! Zpracováno {len(results)} kanálů")
-
-    # Summary statistics
-    df = pd.DataFrame(results)
-
+    if metrics is not None:
+        show_diagnostics(metrics, job.id)
+
+def show_revalidation(snapshot):
+    """Caption with how many channels were revalidated unchanged (304) versus changed"""
+    outcomes = snapshot['revalidation'].get('playlist_items', {})
+    if outcomes.get('revalidated') or outcomes.get('changed'):
+        st.caption(f"♻️ Videa kanálů: {outcomes.get('revalidated', 0)} ověřeno beze změny (304), "
+                   f"{outcomes.get('changed', 0)} změněno, {outcomes.get('new', 0)} nově načteno · "
+                   f"{snapshot['totals']['reused_scores']} kanálů bez nové klasifikace")
+
+def _milliseconds(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+def show_diagnostics(metrics, job_id):
+    """Collapsible panel with call, cache and stage metrics of a run, exportable as JSON and Prometheus"""
+    snapshot = metrics.snapshot()
+    totals = snapshot['totals']
+    with st.expander("🩺 Diagnostika běhu"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Volání API", totals['calls'], help=f"Chyb: {totals['errors']} · "
+                      f"{totals['shared']} ID převzato z volání jiných relací")
+        with col2:
+            st.metric("Jednotky kvóty (odhad)", totals['units'])
+        with col3:
+            st.metric("Opakovaná volání", totals['retries'])
+        with col4:
+            st.metric("Úspěšnost mezipaměti", f"{totals['cache_hit_ratio']:.0%}")
+
+        if snapshot['endpoints']:
+            st.markdown("**Volání podle endpointu**")
+            st.dataframe(pd.DataFrame([
+                {
+                    'Endpoint': endpoint,
+                    'Volání': counters['calls'],
+                    'Chyby': counters['errors'],
+                    'Opakování': sum(counters['retries'].values()),
+                    'Sdíleno': counters['shared'],
+                    'Jednotky': counters['units'],
+                    'kB (přenos)': round(counters['wire_bytes'] / 1024, 1),
+                    'kB (data)': round(counters['body_bytes'] / 1024, 1),
+                    'Průměr (ms)': round(counters['latency_seconds']['sum'] / counters['calls'] * 1000)
+                    if counters['calls'] else 0,
+                    'p50 (ms) ≤': _milliseconds(counters['p50_seconds']),
+                    'p95 (ms) ≤': _milliseconds(counters['p95_seconds'])
+                }
+                for endpoint, counters in snapshot['endpoints'].items()
+            ]), hide_index=True, use_container_width=True)
+
+            st.markdown("**Histogram latence (počet volání podle doby odezvy)**")
+            st.dataframe(pd.DataFrame([
+                {'Endpoint': endpoint, **{
+                    f"≤{float(bound) * 1000:g} ms" if bound != '+Inf' else "delší": count
+                    for bound, count in counters['latency_seconds']['buckets'].items()
+                }}
+                for endpoint, counters in snapshot['endpoints'].items()
+            ]), hide_index=True, use_container_width=True)
+
+        if snapshot['stages']:
+            st.markdown("**Fáze zpracování**")
+            st.dataframe(pd.DataFrame([
+                {'Fáze': stage, 'Počet': histogram['count'], 'Celkem (s)': round(histogram['sum'], 2)}
+                for stage, histogram in snapshot['stages'].items()
+            ]), hide_index=True, use_container_width=True)
+
+        if snapshot['revalidation']:
+            st.markdown("**Podmíněné dotazy (ETag)**")
+            st.dataframe(pd.DataFrame([
+                {'Zdroj': resource, 'Beze změny (304)': outcomes.get('revalidated', 0),
+                 'Změněno': outcomes.get('changed', 0), 'Nové': outcomes.get('new', 0)}
+                for resource, outcomes in snapshot['revalidation'].items()
+            ]), hide_index=True, use_container_width=True)
+
+        if snapshot['cache']:
+            st.markdown("**Mezipaměť**")
+            st.dataframe(pd.DataFrame([
+                {'Zdroj': resource, 'Zásahy': counters['hits'], 'Výpadky': counters['misses'],
+                 'Úspěšnost': f"{counters['hit_ratio']:.0%}"}
+                for resource, counters in snapshot['cache'].items()
+            ]), hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("📥 Export JSON", data=json.dumps(snapshot, indent=2),
+                               file_name=f"metrics_{job_id}.json", mime="application/json")
+        with col2:
+            st.download_button("📥 Export Prometheus", data=metrics.to_prometheus(),
+                               file_name=f"metrics_{job_id}.prom", mime="text/plain")
+
+def show_category_metrics(counts):
+    """Channels per primary category as four metrics"""
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        kids_count = len(df[df['Primary Category'] == 'Kids'])
-        st.metric("🧸 Dětské kanály", kids_count)
+        st.metric("🧸 Dětské kanály", counts.get('Kids', 0))
     with col2:
-        teen_count = len(df[df['Primary Category'] == 'Teen'])
-        st.metric("🎮 Teen kanály", teen_count)
+        st.metric("🎮 Teen kanály", counts.get('Teen', 0))
     with col3:
-        serious_count = len(df[df['Primary Category'] == 'Serious'])
-        st.metric("📰 Seriózní kanály", serious_count)
+        st.metric("📰 Seriózní kanály", counts.get('Serious', 0))
     with col4:
-        mixed_count = len(df[df['Primary Category'] == 'Mixed'])
-        st.metric("🔀 Smíšené kanály", mixed_count)
+        st.metric("🔀 Smíšené kanály", counts.get('Mixed', 0))
+
+def display_results(handle):
+    """Display analysis results: summary of the whole run, then one filtered and sorted page"""
+    store = get_results_store()
+    st.success(f"✅ Analýza dokončena! Zpracováno {handle.rows} kanálů")
+
+    # Summary statistics, one pass over the category column
+    counts = store.category_counts(handle)
+    show_category_metrics(counts)
 
     # Detailed results
     st.subheader("📊 Detailní výsledky")
 
+    # Filtered, sorted and paged here, the browser only gets the visible page
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+    with col1:
+        categories = st.multiselect("Kategorie:", sorted(counts), default=sorted(counts),
+                                    key=f"categories_{handle.run_id}")
+    with col2:
+        search = st.text_input("Hledat (název kanálu nebo URL):", key=f"search_{handle.run_id}")
+    with col3:
+        sort_by = st.selectbox("Řadit podle:", [None] + RESULT_COLUMNS, key=f"sort_{handle.run_id}",
+                               format_func=lambda column: column or "Pořadí analýzy")
+    with col4:
+        descending = st.checkbox("Sestupně", key=f"descending_{handle.run_id}")
+
+    page_key = f"page_{handle.run_id}"
+    view = (tuple(categories), search.strip(), sort_by, descending)
+    if st.session_state.get(f"view_{handle.run_id}") != view:
+        # Another filter or order starts from the first page
+        st.session_state[f"view_{handle.run_id}"] = view
+        st.session_state[page_key] = 1
+    page = st.session_state[page_key]
+    page_df, matched = store.page(handle, categories, search.strip(), sort_by, descending, page, PAGE_SIZE)
+    pages = max((matched + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+
     # Add color coding
     def color_category(val):
         colors = {
@@ -437,18 +661,65 @@ def display_results(results):
         }
         return colors.get(val, '')
 
-    styled_df = df.style.map(color_category, subset=['Primary Category'])
-    st.dataframe(styled_df, use_container_width=True)
-
-    # Export functionality
-    csv = df.to_csv(index=False)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    st.download_button(
-        label="📥 Stáhnout výsledky (CSV)",
-        data=csv,
-        file_name=f"youtube_analysis_{timestamp}.csv",
-        mime="text/csv"
-    )
+    styled_df = page_df.style.map(color_category, subset=['Primary Category'])
+    st.dataframe(styled_df, use_container_width=True, hide_index=True)
+
+    first = (page - 1) * PAGE_SIZE
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"Řádky {first + 1 if matched else 0}–{first + len(page_df)} z {matched} "
+                   f"(celkem {handle.rows})")
+    with col2:
+        if pages > 1:
+            st.number_input("Stránka:", min_value=1, max_value=pages, key=page_key)
+
+    # Export functionality, generated from the stored run only when clicked
+    store = get_results_store()
+    timestamp = handle.run_at.strftime("%Y%m%d_%H%M%S")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Stáhnout výsledky (CSV)",
+            data=lambda: store.csv_bytes(handle),
+            file_name=f"youtube_analysis_{timestamp}.csv",
+            mime="text/csv"
+        )
+    with col2:
+        st.download_button(
+            label="📥 Stáhnout výsledky (Parquet)",
+            data=lambda: store.parquet_bytes(handle),
+            file_name=f"youtube_analysis_{timestamp}.parquet",
+            mime="application/vnd.apache.parquet"
+        )
+
+def show_history():
+    """Stored runs to reopen, and one channel's category across all runs"""
+    store = get_results_store()
+    runs = store.runs()
+    st.subheader("Uložené běhy")
+    if not runs:
+        st.info("Zatím žádné uložené výsledky")
+        return
+
+    run_id = st.selectbox("Běh:", [handle.run_id for handle in runs],
+                          format_func=lambda run_id: next(
+                              f"{handle.run_at:%d.%m.%Y %H:%M} · {handle.run_id} ({handle.rows} řádků)"
+                              for handle in runs if handle.run_id == run_id
+                          ))
+    if st.button("📂 Otevřít výsledky běhu"):
+        st.session_state.job_id = None
+        st.session_state.run = next(handle for handle in runs if handle.run_id == run_id)
+
+    st.subheader("Kategorie kanálu v čase")
+    channel = st.text_input("Název kanálu nebo URL:", placeholder="Přesný název kanálu, jak je ve výsledcích")
+    if channel:
+        history = store.history(channel.strip())
+        if history.empty:
+            st.info("Kanál není v žádném uloženém běhu")
+        else:
+            st.dataframe(history, hide_index=True, use_container_width=True)
+            if history['Run At'].nunique() > 1:
+                st.line_chart(history.groupby('Run At')[['Kids %', 'Teen %', 'Serious %']].mean())
 
 if __name__ == "__main__":
     # Initialize session state